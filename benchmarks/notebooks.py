@@ -0,0 +1,80 @@
+import base64
+
+import nbformat
+from nbformat.v4 import new_notebook, new_code_cell, new_markdown_cell, new_output
+
+
+_TYPES = [
+    # type, default in the parameters cell, value in _context.json
+    ('int', '{i}', lambda i: i),
+    ('str', '"value {i}"', lambda i: 'context value %d' % i),
+    ('float', '{i}.5', lambda i: i + 0.25),
+    ('List', '[{i}, {i}, {i}]', lambda i: [i, i]),
+    ('Dict', '{{"key": {i}}}', lambda i: {'key': i, 'context': True}),
+]
+
+
+def parameters_source(n_params):
+    """
+    parameters cell with n_params parameters of every type, plus the hysds specs
+    :param n_params: int
+    :return: str
+    """
+    lines = ['from typing import List, Dict', '']
+    for i in range(n_params):
+        type_name, value, _ = _TYPES[i % len(_TYPES)]
+        if i % 2:
+            lines.append('param_%d: %s = %s' % (i, type_name, value.format(i=i)))
+        else:
+            lines.append('param_%d = %s  # type: %s' % (i, value.format(i=i), type_name))
+    lines += [
+        '',
+        '# hysds specs',
+        '_time_limit = 7200',
+        '_soft_time_limit = 7000',
+        '_disk_usage = "10GB"',
+        '_submission_type = "individual"',
+        '_required_queue = "benchmark-queue"',
+        '_label = "benchmark notebook"',
+    ]
+    return '\n'.join(lines)
+
+
+def make_notebook(path, n_params=10, n_cells=10, output_bytes=0):
+    """
+    writes a synthetic notebook PGE
+    :param path: str
+    :param n_params: int, number of parameters in the parameters cell
+    :param n_cells: int, number of cells after the parameters cell (half code, half markdown)
+    :param output_bytes: int, size of the (png) output embedded in every code cell
+    """
+    cells = [new_code_cell(parameters_source(n_params), metadata={'tags': ['parameters']})]
+    png = base64.b64encode(b'\x89PNG\r\n\x1a\n' + b'0' * output_bytes).decode() if output_bytes else None
+    for i in range(n_cells):
+        if i % 2:
+            cells.append(new_markdown_cell('## step %d\nsome documentation of the step' % i))
+            continue
+        outputs = [new_output('stream', name='stdout', text='step %d\n' % i)]
+        if png:
+            outputs.append(new_output('display_data', data={'image/png': png, 'text/plain': '<Figure>'}))
+        cells.append(new_code_cell('x_%d = %d\nprint("step %d")' % (i, i, i), outputs=outputs))
+
+    nb = new_notebook(cells=cells)
+    nb.metadata['kernelspec'] = {'name': 'python3', 'display_name': 'Python 3', 'language': 'python'}
+    nbformat.write(nb, path)
+
+
+def make_context(n_params):
+    """
+    _context.json of a job of the synthetic notebook, with values valid for the type of every parameter
+    :param n_params: int
+    :return: Dict[str, <any>]
+    """
+    ctx = {
+        '_command': 'notebook-pge-wrapper execute benchmark.ipynb',
+        '_disk_usage': '10GB',
+        'container_image_name': 'container-benchmark:latest',
+    }
+    for i in range(n_params):
+        ctx['param_%d' % i] = _TYPES[i % len(_TYPES)][2](i)
+    return ctx
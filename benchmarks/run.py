@@ -0,0 +1,205 @@
+"""
+benchmarks of the notebook inspection, spec generation and execution overhead on synthetic notebooks
+
+    python benchmarks/run.py                     # compares to benchmarks/baseline.json, exits 1 on regressions
+    python benchmarks/run.py --update-baseline   # stores the current timings as the baseline
+
+timings are stored relative to a calibration loop (pure python) timed right before every benchmark, so the baseline
+can be compared across machines and CPU throttling during the run doesn't show as a regression
+"""
+import os
+import sys
+import json
+import time
+import timeit
+import shutil
+import argparse
+import tempfile
+import contextlib
+
+from notebooks import make_notebook, make_context
+
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+DEFAULT_TOLERANCE = 2.0  # a benchmark regresses when it takes twice as long as the baseline
+MIN_REGRESSION = 0.005  # seconds (on the baseline machine), slowdowns smaller than this are noise
+
+NOTEBOOKS = {
+    # name: (parameters, cells, bytes of output per code cell)
+    'small': (10, 10, 0),
+    'many_params': (500, 10, 0),
+    'many_cells': (10, 2000, 0),
+    'large_outputs': (10, 40, 500000),
+}
+
+
+def _workload():
+    data = [{'name': 'param_%d' % i, 'value': list(range(i % 20))} for i in range(2000)]
+    json.loads(json.dumps(data))
+    sorted(str(d) for d in data)
+
+
+def calibrate():
+    """
+    :return: float, seconds of a fixed pure python workload, the unit of the stored timings
+    """
+    return _best(_workload, repeat=3)
+
+
+def _best(func, repeat=5):
+    """
+    :return: float, best time (secs) of a single call, calls are batched so a batch takes at least 0.2s
+    """
+    timer = timeit.Timer(func)
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat=repeat, number=number)) / number
+
+
+def _spec_benchmarks(name, nb_name, n_params):
+    from notebook_pge_wrapper.spec_generator import extract_hysds_specs, generate_hysdsio, generate_job_spec, \
+        generate_spec_files
+    from notebook_pge_wrapper.execute_notebook import _build_notebook_params
+
+    nb_path = os.path.join('notebook_pges', nb_name)
+    ctx = make_context(n_params)
+    return {
+        '%s.extract_hysds_specs' % name: lambda: extract_hysds_specs(nb_path),
+        '%s.generate_hysdsio' % name: lambda: generate_hysdsio(job_label='benchmark', sub_type='individual',
+                                                               nb_name=nb_path),
+        '%s.generate_job_spec' % name: lambda: generate_job_spec(required_queue='benchmark-queue', nb=nb_path),
+        '%s.generate_spec_files' % name: lambda: generate_spec_files(nb_name, 'ops'),
+        '%s._build_notebook_params' % name: lambda: _build_notebook_params(nb_path, ctx),
+    }
+
+
+def _execute_benchmarks(repeat):
+    """
+    execute on a trivial notebook, compared to papermill on its own to get the overhead of the wrapper
+    kernel startup dominates these so they're timed with a few single calls
+    """
+    import papermill
+    from notebook_pge_wrapper.execute_notebook import execute
+
+    make_notebook(os.path.join('notebook_pges', 'trivial.ipynb'), n_params=1, n_cells=1)
+    with open('_context.json', 'w') as f:
+        json.dump(make_context(1), f)
+
+    def run_papermill():
+        papermill.execute_notebook('notebook_pges/trivial.ipynb', 'trivial-output.ipynb', parameters={'param_0': 1},
+                                   progress_bar=False)
+
+    def run_execute():
+        execute('notebook_pges/trivial.ipynb', ctx_file='_context.json')
+
+    def run_execute_in_process():
+        execute('notebook_pges/trivial.ipynb', ctx_file='_context.json', in_process=True)
+
+    calibration = calibrate()
+    papermill_time = min(timeit.repeat(run_papermill, repeat=repeat, number=1))
+    execute_time = min(timeit.repeat(run_execute, repeat=repeat, number=1))
+    in_process_time = min(timeit.repeat(run_execute_in_process, repeat=repeat, number=1))
+    return {
+        'trivial.papermill': papermill_time / calibration,
+        'trivial.execute': execute_time / calibration,
+        'trivial.execute_overhead': max(execute_time - papermill_time, 0.0) / calibration,
+        'trivial.execute_in_process': in_process_time / calibration,
+    }
+
+
+def run_benchmarks(names=None, execution=True, repeat=5):
+    """
+    :param names: List[str], (optional) synthetic notebooks to benchmark, defaults to all of them
+    :param execution: bool, also benchmark execute (starts kernels)
+    :param repeat: int
+    :return: Dict[str, float], time of every benchmark relative to the calibration loop
+    """
+    os.environ.pop('NOTEBOOK_PGE_WRAPPER_CACHE', None)  # measuring the inspection itself
+
+    cwd = os.getcwd()
+    project = tempfile.mkdtemp(prefix='pge-benchmarks-')
+    results = {}
+    try:
+        os.chdir(project)
+        os.makedirs('notebook_pges')
+        os.makedirs('docker')
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            for name in names or NOTEBOOKS:
+                n_params, n_cells, output_bytes = NOTEBOOKS[name]
+                nb_name = '%s.ipynb' % name
+                make_notebook(os.path.join('notebook_pges', nb_name), n_params, n_cells, output_bytes)
+                for benchmark, func in _spec_benchmarks(name, nb_name, n_params).items():
+                    calibration = calibrate()
+                    results[benchmark] = _best(func, repeat=repeat) / calibration
+            if execution:
+                results.update(_execute_benchmarks(repeat=min(repeat, 3)))
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(project, ignore_errors=True)
+    return results
+
+
+def compare(results, baseline, tolerance=DEFAULT_TOLERANCE):
+    """
+    :param results: Dict[str, float], time of every benchmark relative to the calibration loop
+    :param baseline: Dict[str, <any>], baseline.json
+    :param tolerance: float, ratio to the baseline past which a benchmark regressed
+    :return: List[str], regressed benchmarks
+    """
+    regressions = []
+    min_regression = MIN_REGRESSION / baseline['calibration']
+    print('%-45s %12s %12s %8s' % ('benchmark', 'relative', 'baseline', 'ratio'))
+    for benchmark, relative in sorted(results.items()):
+        expected = baseline['benchmarks'].get(benchmark)
+        if expected is None:
+            print('%-45s %12.4f %12s %8s' % (benchmark, relative, '-', '-'))
+            continue
+
+        ratio = relative / expected if expected else float('inf')
+        regressed = ratio > tolerance and relative - expected > min_regression
+        print('%-45s %12.4f %12.4f %7.2fx%s' % (benchmark, relative, expected, ratio, ' REGRESSION' if regressed else ''))
+        if regressed:
+            regressions.append(benchmark)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='benchmarks of notebook-pge-wrapper on synthetic notebooks')
+    parser.add_argument('--update-baseline', action='store_true', help='store the timings in %s' % BASELINE)
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help='ratio to the baseline past which a benchmark fails (default %s)' % DEFAULT_TOLERANCE)
+    parser.add_argument('--notebook', action='append', choices=sorted(NOTEBOOKS),
+                        help='synthetic notebook to benchmark (repeatable, default all)')
+    parser.add_argument('--no-execution', action='store_true', help="skip the execute benchmarks (starts kernels)")
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    start = time.time()
+    results = run_benchmarks(args.notebook, execution=not args.no_execution, repeat=args.repeat)
+
+    if args.update_baseline:
+        with open(BASELINE, 'w') as f:
+            json.dump({
+                'calibration': calibrate(),  # seconds on the machine the baseline was recorded on
+                'benchmarks': dict(sorted(results.items())),
+            }, f, indent=2)
+            f.write('\n')
+        print('baseline written to %s' % BASELINE)
+        return 0
+
+    if not os.path.isfile(BASELINE):
+        print('no baseline found (%s), run with --update-baseline' % BASELINE)
+        return 1
+    with open(BASELINE, 'r') as f:
+        baseline = json.load(f)
+
+    regressions = compare(results, baseline, tolerance=args.tolerance)
+    print('%d benchmark(s) in %.1fs' % (len(results), time.time() - start))
+    if regressions:
+        print('%d regression(s) past %sx the baseline: %s' % (len(regressions), args.tolerance,
+                                                                ', '.join(regressions)))
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
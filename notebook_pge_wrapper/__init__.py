@@ -1,2 +1,13 @@
-from notebook_pge_wrapper.spec_generator import generate_job_spec, generate_hysdsio, extract_hysds_specs
-from .execute_notebook import execute
+# the public functions are imported lazily, importing papermill (through spec_generator and execute_notebook) takes
+# seconds and isn't needed by most of the CLI sub-commands
+__all__ = ['generate_job_spec', 'generate_hysdsio', 'extract_hysds_specs', 'execute']
+
+
+def __getattr__(name):
+    if name in ('generate_job_spec', 'generate_hysdsio', 'extract_hysds_specs'):
+        from notebook_pge_wrapper import spec_generator
+        return getattr(spec_generator, name)
+    if name == 'execute':
+        from notebook_pge_wrapper.execute_notebook import execute
+        return execute
+    raise AttributeError("module %r has no attribute %r" % (__name__, name))
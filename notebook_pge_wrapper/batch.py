@@ -0,0 +1,218 @@
+import os
+import json
+import time
+import logging
+from concurrent.futures import ProcessPoolExecutor
+
+from notebook_pge_wrapper.inspection import inspect
+from notebook_pge_wrapper.spec import OBJECT, ContextValidationError
+from notebook_pge_wrapper.execute_notebook import exec_wrapper, execute
+
+
+FANOUT_DIRS = 'fanout_dirs'  # parameter of the reducer notebook, directories of the chunks
+
+__BATCH_REPORT = 'batch_report.json'
+__PARAMS_FILE = '_params.json'
+__CONTEXT_FILE = '_context.json'
+__REDUCE_CONTEXT_FILE = '_reduce_context.json'
+
+
+def read_contexts(contexts):
+    """
+    reads the contexts of a batch, either:
+        a directory of .json files, the run id being the file name (without .json)
+        a JSON lines file, the run id being the line number
+    :param contexts: str, path of the directory or JSON lines file
+    :return: List[(str, Dict[str, <any>])], (run id, context)
+    """
+    runs = []
+    if os.path.isdir(contexts):
+        for f in sorted(os.listdir(contexts)):
+            if not f.endswith('.json'):
+                continue
+            with open(os.path.join(contexts, f), 'r') as fin:
+                runs.append((f[:-len('.json')], json.load(fin)))
+        return runs
+
+    with open(contexts, 'r') as f:
+        lines = [line for line in f if line.strip()]
+    width = len(str(len(lines)))
+    for i, line in enumerate(lines):
+        runs.append((str(i).zfill(width), json.loads(line)))
+    return runs
+
+
+def _execute_run(nb, run_dir, execute_kwargs=None):
+    """
+    executes one context of the batch in its own directory (runs in a worker process)
+    :param nb: str, absolute path of the notebook
+    :param run_dir: str, absolute path of the run's directory, holding its _context.json and _params.json
+    :param execute_kwargs: Dict[str, <any>], (optional) other arguments of execute (ie. limits, in_process)
+    :return: (str, float, str), status, duration (secs), error message or None
+    """
+    start = time.time()
+    os.chdir(run_dir)  # execute writes its output notebook and _alt_* files in the current directory
+    try:
+        execute(nb, ctx_file=__CONTEXT_FILE, params_file=__PARAMS_FILE, **(execute_kwargs or {}))
+    except (Exception, SystemExit) as e:
+        return 'failed', time.time() - start, '%s: %s' % (type(e).__name__, e)
+    return 'succeeded', time.time() - start, None
+
+
+def _execute_runs(nb, runs, out_dir, jobs=None, execute_kwargs=None):
+    """
+    :param nb: str, absolute path of the notebook
+    :param runs: List[(str, Dict[str, <any>])], (run id, context)
+    :param out_dir: str, absolute path of the directory of the runs and of batch_report.json
+    :param jobs: int, number of concurrent runs (defaults to the number of CPUs)
+    :param execute_kwargs: Dict[str, <any>], (optional) other arguments of execute
+    :return: Dict[str, <any>], the batch report
+    """
+    spec = inspect(nb).spec
+    # the parameters as inspected, the runs validate their context against the same types without inspecting
+    parameters = [p.parameter.to_dict() for p in spec.params] + [p.to_dict() for p in spec.spec_params]
+
+    os.makedirs(out_dir, exist_ok=True)
+    run_dirs, invalid = [], {}
+    for run_id, ctx in runs:
+        run_dir = os.path.join(out_dir, run_id)
+        os.makedirs(run_dir, exist_ok=True)
+        with open(os.path.join(run_dir, __CONTEXT_FILE), 'w') as f:
+            json.dump(ctx, f, indent=2)
+        with open(os.path.join(run_dir, __PARAMS_FILE), 'w') as f:
+            json.dump(parameters, f)
+        run_dirs.append(run_dir)
+        try:  # every context is checked before any run starts, an invalid one never starts a kernel
+            spec.validate_context(ctx)
+        except ContextValidationError as e:
+            invalid[run_id] = '%s: %s' % (type(e).__name__, e)
+
+    start = time.time()
+    results = []
+    valid = [(run_id, run_dir) for (run_id, _), run_dir in zip(runs, run_dirs) if run_id not in invalid]
+    if runs:
+        futures = {}
+        with ProcessPoolExecutor(max_workers=min(jobs or os.cpu_count() or 1, len(valid) or 1)) as executor:
+            for run_id, run_dir in valid:
+                futures[run_id] = executor.submit(_execute_run, nb, run_dir, execute_kwargs)
+            for (run_id, _), run_dir in zip(runs, run_dirs):
+                if run_id in invalid:
+                    status, duration, error = 'failed', None, invalid[run_id]
+                else:
+                    try:
+                        status, duration, error = futures[run_id].result()
+                    except Exception as e:  # worker process died
+                        status, duration, error = 'failed', None, '%s: %s' % (type(e).__name__, e)
+                if error:
+                    logging.error('run %s failed: %s' % (run_id, error))
+                results.append({
+                    'run_id': run_id,
+                    'status': status,
+                    'duration': duration,
+                    'directory': run_dir,
+                    'error': error,
+                })
+
+    report = {
+        'notebook': nb,
+        'total': len(results),
+        'succeeded': len([r for r in results if r['status'] == 'succeeded']),
+        'failed': len([r for r in results if r['status'] == 'failed']),
+        'duration': time.time() - start,
+        'runs': results,
+    }
+    with open(os.path.join(out_dir, __BATCH_REPORT), 'w') as f:
+        json.dump(report, f, indent=2)
+    return report
+
+
+def execute_batch(nb, contexts, out_dir='batch_runs', jobs=None):
+    """
+    executes a notebook once per context on a process pool, the notebook is only inspected once
+    every run gets its own directory (<out_dir>/<run id>/) with its output notebook and _alt_* files
+    :param nb: str, path of the notebook
+    :param contexts: str, directory of .json files or JSON lines file of contexts
+    :param out_dir: str, directory of the runs and of batch_report.json
+    :param jobs: int, number of concurrent runs (defaults to the number of CPUs)
+    :return: Dict[str, <any>], the batch report
+    """
+    return _execute_runs(os.path.abspath(nb), read_contexts(contexts), os.path.abspath(out_dir), jobs=jobs)
+
+
+def split_chunks(items, chunks=None, chunk_size=None):
+    """
+    splits a list in contiguous chunks, in order
+    :param items: List[<any>]
+    :param chunks: int, number of chunks of (almost) equal size, at most one per item
+    :param chunk_size: int, number of items per chunk, instead of chunks
+    :return: List[List[<any>]]
+    """
+    if chunk_size:
+        return [items[i:i + chunk_size] for i in range(0, len(items), chunk_size)]
+    n = min(chunks or 1, len(items))
+    return [items[i * len(items) // n:(i + 1) * len(items) // n] for i in range(n)]
+
+
+def _fanout_param(nb, ctx, param):
+    """
+    validates the whole context (raises ContextValidationError) before any chunk is started
+    :return: List[<any>], value of the list parameter to fan out, validated (and coerced) as the notebook parameter
+    """
+    spec = inspect(nb).spec
+    notebook_param = next((p for p in spec.params if p.name == param), None)
+    if notebook_param is None:
+        raise RuntimeError('%s is not a parameter of %s' % (param, nb))
+    if notebook_param.hysds_type != OBJECT:
+        raise RuntimeError('%s must be a list parameter to fan out, found type %s' %
+                           (param, notebook_param.hysds_type))
+    if ctx.get(param) is None:
+        raise RuntimeError('%s not found in _context.json' % param)
+    items = spec.validate_context(ctx)[param]
+    if not isinstance(items, list):
+        raise RuntimeError('%s must be a list to fan out, found %s' % (param, type(items).__name__))
+    return items
+
+
+@exec_wrapper
+def execute_fanout(nb, ctx_file, param, chunks=None, chunk_size=None, jobs=None, reducer=None, out_dir='fanout_runs',
+                   execute_kwargs=None):
+    """
+    splits the list parameter of _context.json in chunks and executes the notebook once per chunk on a process pool
+    (see execute_batch), then executes the reducer notebook with the directories of the chunks, in order, as its
+    "fanout_dirs" parameter
+    :param nb: str, path of the notebook
+    :param ctx_file: str, location of _context.json
+    :param param: str, list (object) parameter of the notebook to fan out
+    :param chunks: int, number of chunks (defaults to jobs)
+    :param chunk_size: int, number of items per chunk, instead of chunks
+    :param jobs: int, number of concurrent chunks (defaults to the number of CPUs)
+    :param reducer: str, (optional) path of the notebook merging the outputs of the chunks, executed in the current
+                    directory with _context.json + fanout_dirs
+    :param out_dir: str, directory of the chunks (<out_dir>/chunk_<n>/) and of batch_report.json
+    :param execute_kwargs: Dict[str, <any>], (optional) other arguments of execute (ie. limits, in_process) for the
+                           chunks and the reducer
+    :return: Dict[str, <any>], the batch report of the chunks
+    """
+    nb = os.path.abspath(nb)
+    out_dir = os.path.abspath(out_dir)
+    with open(ctx_file, 'r') as f:
+        ctx = json.load(f)
+
+    jobs = jobs or os.cpu_count() or 1
+    parts = split_chunks(_fanout_param(nb, ctx, param), chunks=chunks or jobs, chunk_size=chunk_size)
+    width = len(str(max(len(parts) - 1, 0)))
+    runs = [('chunk_%s' % str(i).zfill(width), dict(ctx, **{param: part})) for i, part in enumerate(parts)]
+    logging.info('fanning out %s in %d chunk(s) on %d process(es)' % (param, len(runs), min(jobs, len(runs) or 1)))
+
+    report = _execute_runs(nb, runs, out_dir, jobs=jobs, execute_kwargs=execute_kwargs)
+    if report['failed']:
+        failures = ['%s (%s)' % (r['run_id'], r['error']) for r in report['runs'] if r['error']]
+        raise RuntimeError('%d/%d chunk(s) of %s failed: %s' % (report['failed'], report['total'], param,
+                                                                  ', '.join(failures)))
+
+    if reducer:
+        reduce_ctx_file = os.path.join(out_dir, __REDUCE_CONTEXT_FILE)
+        with open(reduce_ctx_file, 'w') as f:
+            json.dump(dict(ctx, **{FANOUT_DIRS: [r['directory'] for r in report['runs']]}), f, indent=2)
+        execute(reducer, ctx_file=reduce_ctx_file, **(execute_kwargs or {}))
+    return report
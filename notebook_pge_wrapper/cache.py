@@ -0,0 +1,214 @@
+import os
+import json
+import time
+import hashlib
+import tempfile
+import contextlib
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+
+_CACHE_ENABLED_ENV = 'NOTEBOOK_PGE_WRAPPER_CACHE'
+_CACHE_SIZE_ENV = 'NOTEBOOK_PGE_WRAPPER_CACHE_SIZE'
+_CACHE_FILE = 'inspection-cache.json'
+_CACHE_VERSION = 2  # the cached parameters hold their line in the parameters cell
+_DEFAULT_MAX_ENTRIES = 256
+
+
+def cache_dir():
+    """
+    $XDG_CACHE_HOME/notebook-pge-wrapper, defaults to ~/.cache/notebook-pge-wrapper
+    :return: str
+    """
+    xdg_cache_home = os.environ.get('XDG_CACHE_HOME') or os.path.join(str(Path.home()), '.cache')
+    return os.path.join(xdg_cache_home, 'notebook-pge-wrapper')
+
+
+def cache_enabled():
+    """
+    the inspection cache is opt-in, enabled by setting NOTEBOOK_PGE_WRAPPER_CACHE=1
+    :return: bool
+    """
+    return os.environ.get(_CACHE_ENABLED_ENV, '').lower() in ('1', 'true', 'yes', 'on')
+
+
+def _file_hash(f):
+    sha256 = hashlib.sha256()
+    with open(f, 'rb') as fin:
+        for chunk in iter(lambda: fin.read(1 << 20), b''):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+class InspectionCache(object):
+    """
+    On-disk cache of notebook parameter tables, keyed by the notebook's path, mtime, size and content hash
+    The least recently used entries are evicted once the cache holds more than max_entries notebooks
+    A hit only appends a line to <cache_file>.hits, the cache file is rewritten (under a lock) on misses, which merge
+    the hits into the entries' last use
+    """
+    def __init__(self, cache_file=None, max_entries=None):
+        """
+        :param cache_file: str, defaults to <cache_dir>/inspection-cache.json
+        :param max_entries: int, defaults to $NOTEBOOK_PGE_WRAPPER_CACHE_SIZE or 256
+        """
+        self.cache_file = cache_file or os.path.join(cache_dir(), _CACHE_FILE)
+        self.hits_file = self.cache_file + '.hits'
+        if max_entries is None:
+            max_entries = int(os.environ.get(_CACHE_SIZE_ENV, _DEFAULT_MAX_ENTRIES))
+        self.max_entries = max_entries
+
+    def _load(self):
+        try:
+            with open(self.cache_file, 'r') as f:
+                data = json.load(f)
+            if data.get('version') == _CACHE_VERSION:
+                data.setdefault('entries', {})
+                return data
+        except (OSError, ValueError):  # missing or corrupted cache, starting over
+            pass
+        return {'version': _CACHE_VERSION, 'entries': {}, 'hits': 0, 'misses': 0}
+
+    def _save(self, data):
+        cache_directory = os.path.dirname(self.cache_file)
+        os.makedirs(cache_directory, exist_ok=True)
+
+        # writing to a temp file and renaming it so concurrent readers never see a partial cache
+        fd, tmp = tempfile.mkstemp(dir=cache_directory, prefix='.inspection-cache-')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(data, f)
+            os.replace(tmp, self.cache_file)
+        except Exception:
+            os.remove(tmp)
+            raise
+
+    @contextlib.contextmanager
+    def _lock(self):
+        """
+        exclusive lock on the cache, concurrent updates are applied one after the other
+        """
+        if fcntl is None:  # not available on windows, the renames are still atomic
+            yield
+            return
+        os.makedirs(os.path.dirname(self.cache_file), exist_ok=True)
+        with open(self.cache_file + '.lock', 'a') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _read_hits(self):
+        """
+        :return: List[(float, str)], (time, notebook path) of the hits not merged in the cache file yet
+        """
+        hits = []
+        try:
+            with open(self.hits_file, 'r') as f:
+                for line in f:
+                    try:
+                        last_used, key = json.loads(line)
+                    except ValueError:  # partial line
+                        continue
+                    hits.append((last_used, key))
+        except OSError:
+            pass
+        return hits
+
+    def _record_hit(self, key):
+        with self._lock(), open(self.hits_file, 'a') as f:
+            f.write(json.dumps([time.time(), key]) + '\n')
+
+    def _merge_hits(self, data):
+        """
+        counts the hits of the hits file and updates the last use of their entries, called under the lock
+        """
+        hits = self._read_hits()
+        entries = data['entries']
+        for last_used, key in hits:
+            if key in entries:
+                entries[key]['last_used'] = max(entries[key]['last_used'], last_used)
+        data['hits'] = data.get('hits', 0) + len(hits)
+
+    def _evict(self, data):
+        entries = data['entries']
+        if len(entries) <= self.max_entries:
+            return
+        lru = sorted(entries, key=lambda k: entries[k]['last_used'])
+        for key in lru[:len(entries) - self.max_entries]:
+            del entries[key]
+
+    def get_or_inspect(self, nb_path, inspect_func):
+        """
+        returns the cached parameters of the notebook, inspecting (and caching) it on a miss
+        :param nb_path: str, path + notebook name
+        :param inspect_func: function(nb_path) -> Dict[str, Dict[str, <any>]]
+        :return: Dict[str, Dict[str, <any>]]
+        """
+        key = os.path.abspath(nb_path)
+        st = os.stat(nb_path)
+        data = self._load()  # no lock needed to read, the cache file is only ever replaced whole
+        entries = data['entries']
+
+        entry = entries.get(key)
+        if entry is not None and entry['mtime'] == st.st_mtime_ns and entry['size'] == st.st_size:
+            self._record_hit(key)
+            return entry['params']
+
+        # stat changed (or new path), the notebook may still have the same content (ie. git checkout, touch)
+        content_hash = _file_hash(nb_path)
+        if entry is None or entry['sha256'] != content_hash:
+            entry = next((e for e in entries.values() if e['sha256'] == content_hash), None)
+        hit = entry is not None
+        params = entry['params'] if hit else inspect_func(nb_path)  # inspected without holding the lock
+
+        with self._lock():
+            data = self._load()  # other processes may have updated the cache since
+            self._merge_hits(data)
+            counter = 'hits' if hit else 'misses'
+            data[counter] = data.get(counter, 0) + 1
+            data['entries'][key] = {
+                'sha256': content_hash,
+                'params': params,
+                'mtime': st.st_mtime_ns,
+                'size': st.st_size,
+                'last_used': time.time(),
+            }
+            self._evict(data)
+            self._save(data)
+            if os.path.exists(self.hits_file):
+                os.remove(self.hits_file)
+        return params
+
+    def stats(self):
+        """
+        :return: Dict[str, <any>]
+        """
+        data = self._load()
+        size = os.path.getsize(self.cache_file) if os.path.isfile(self.cache_file) else 0
+        return {
+            'enabled': cache_enabled(),
+            'location': self.cache_file,
+            'entries': len(data['entries']),
+            'max_entries': self.max_entries,
+            'size_bytes': size,
+            'hits': data.get('hits', 0) + len(self._read_hits()),
+            'misses': data.get('misses', 0),
+        }
+
+    def clear(self):
+        """
+        deletes the cache file
+        :return: int, number of entries removed
+        """
+        with self._lock():
+            entries = len(self._load()['entries'])
+            for f in (self.cache_file, self.hits_file):
+                if os.path.isfile(f):
+                    os.remove(f)
+        return entries
@@ -0,0 +1,293 @@
+import os
+import ast
+import json
+import glob
+import hashlib
+import logging
+import tempfile
+
+import nbformat
+
+from notebook_pge_wrapper.cache import cache_dir
+from notebook_pge_wrapper.engines import CellObserver
+from notebook_pge_wrapper.parameters import parse_parameters
+from notebook_pge_wrapper.resources import parse_size
+
+
+CACHE_TAG = 'cache'
+CACHE_VARIABLES = 'cache_variables'  # cell metadata, names of the variables cached (defaults to the cell's assignments)
+
+_CELL_CACHE_SIZE_ENV = 'NOTEBOOK_PGE_WRAPPER_CELL_CACHE_SIZE'
+_DEFAULT_MAX_SIZE = '1GB'
+_PARAMETERS_TAGS = {'parameters', 'injected-parameters'}
+_PRELUDE_NODES = (ast.Import, ast.ImportFrom, ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)
+_SCOPE_NODES = (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef, ast.Lambda, ast.ListComp, ast.SetComp,
+                ast.DictComp, ast.GeneratorExp)
+
+# run in the kernel, the variables that can't be pickled (ie. open files, connections) are left out
+_SAVE_CODE = """
+import os as _pge_os, pickle as _pge_pickle
+_pge_state = {{_pge_k: globals()[_pge_k] for _pge_k in {names!r} if _pge_k in globals()}}
+try:
+    _pge_data = _pge_pickle.dumps(_pge_state)
+except Exception:
+    for _pge_k in list(_pge_state):
+        try:
+            _pge_pickle.dumps(_pge_state[_pge_k])
+        except Exception:
+            del _pge_state[_pge_k]
+    _pge_data = _pge_pickle.dumps(_pge_state)
+with open({tmp!r}, 'wb') as _pge_f:
+    _pge_f.write(_pge_data)
+_pge_os.replace({tmp!r}, {path!r})
+del _pge_os, _pge_pickle, _pge_state, _pge_data, _pge_f
+globals().pop('_pge_k', None)
+"""
+
+
+def cell_cache_dir():
+    """
+    <cache_dir>/cells, see notebook_pge_wrapper.cache.cache_dir
+    :return: str
+    """
+    return os.path.join(cache_dir(), 'cells')
+
+
+def _hash(*parts):
+    h = hashlib.sha256()
+    for part in parts:
+        h.update(part.encode('utf-8'))
+        h.update(b'\0')
+    return h.hexdigest()
+
+
+def _module_stores(node, names):
+    """
+    collects the names assigned at the module level, the function, class and comprehension scopes are skipped
+    """
+    if isinstance(node, _SCOPE_NODES):
+        return
+    if isinstance(node, ast.Name) and isinstance(node.ctx, ast.Store) and node.id not in names:
+        names.append(node.id)
+    for child in ast.iter_child_nodes(node):
+        _module_stores(child, names)
+
+
+class CellDependencies(object):
+    """
+    The names a code cell reads and assigns, and the statements re-run when it's restored from the cache (imports,
+    functions and classes, which can't be pickled by value)
+    """
+    __slots__ = ('loads', 'stores', 'defines', 'prelude')
+
+    def __init__(self, source):
+        """
+        :param source: str, source of the cell (raises SyntaxError)
+        """
+        tree = ast.parse(source)
+        lines = source.splitlines()
+        self.loads = {node.id for node in ast.walk(tree) if isinstance(node, ast.Name)
+                      and isinstance(node.ctx, ast.Load)}
+        self.stores = []  # variables, cached by value
+        self.defines = []  # every name bound by the cell
+        prelude = []
+        for node in tree.body:
+            if isinstance(node, (ast.Import, ast.ImportFrom)):
+                self.defines += [(alias.asname or alias.name).split('.')[0] for alias in node.names]
+            elif isinstance(node, _PRELUDE_NODES):
+                self.defines.append(node.name)
+            else:
+                _module_stores(node, self.stores)
+                continue
+            first = min([node.lineno] + [d.lineno for d in getattr(node, 'decorator_list', [])])
+            prelude.append('\n'.join(lines[first - 1:node.end_lineno]))
+        self.defines += self.stores
+        self.prelude = '\n'.join(prelude)
+
+
+def cell_keys(cells):
+    """
+    cache key of every code cell: hash of its source and of the keys of the names it reads
+    a name read by a cell resolves to the parameter's value (parameters cells) or to the key of the last cell using
+    it: a cell reading a name may also mutate it (cfg["t"] = x, obj.attr = x, lst.append(x)), so it counts as
+    redefining every name it reads as well as the ones it assigns
+    a cell's key changes when its source, a parameter it uses or any cell it depends on changes
+    :param cells: List[NotebookNode], cells of the (parameterized) notebook
+    :return: (Dict[int, str], Dict[int, CellDependencies]), by cell index (cells that don't parse have no key)
+    """
+    names = {}  # name -> key of its current definition
+    keys, dependencies = {}, {}
+    for index, cell in enumerate(cells):
+        if cell.cell_type != 'code':
+            continue
+        if _PARAMETERS_TAGS.intersection(cell.metadata.get('tags', [])):
+            try:
+                for p in parse_parameters(cell.source).values():
+                    names[p.name] = _hash('parameter', p.name, p.default)
+            except Exception:  # not parsable, the cells depending on it are never cached
+                pass
+            continue
+        try:
+            deps = CellDependencies(cell.source)
+        except SyntaxError:
+            continue
+        key = _hash(cell.source, *['%s=%s' % (n, names.get(n, '')) for n in sorted(deps.loads)])
+        keys[index], dependencies[index] = key, deps
+        for name in deps.defines + sorted(deps.loads):
+            names[name] = key
+    return keys, dependencies
+
+
+class CellCache(CellObserver):
+    """
+    Memoizes the cells tagged "cache": the variables assigned by the cell (or the ones listed in its "cache_variables"
+    metadata) are pickled by the kernel into the cell cache, keyed by cell_keys, along with the cell's outputs
+    a cell found in the cache isn't executed, its imports, functions and classes are re-run and its variables loaded
+    the cache is shared by all the executions on the machine, the oldest entries are evicted past max_size
+    """
+    def __init__(self, directory=None, max_size=None):
+        """
+        :param directory: str, defaults to <cache_dir>/cells
+        :param max_size: int or str, defaults to $NOTEBOOK_PGE_WRAPPER_CELL_CACHE_SIZE or 1GB
+        """
+        self.directory = os.path.abspath(directory or cell_cache_dir())
+        self.max_size = parse_size(max_size or os.environ.get(_CELL_CACHE_SIZE_ENV, _DEFAULT_MAX_SIZE))
+        self.hits = []  # indexes of the cells restored from the cache
+        self._keys = {}
+        self._dependencies = {}
+
+    def _paths(self, key):
+        path = os.path.join(self.directory, key)
+        return path + '.pickle', path + '.json'
+
+    def notebook_start(self, client):
+        if any(CACHE_TAG in c.metadata.get('tags', []) for c in client.nb.cells):
+            self._keys, self._dependencies = cell_keys(client.nb.cells)
+
+    def _variables(self, cell, index):
+        names = cell.metadata.get(CACHE_VARIABLES)
+        return list(names) if names is not None else self._dependencies[index].stores
+
+    def _restore(self, client, cell, index, key):
+        state, outputs = self._paths(key)
+        with open(outputs, 'r') as f:
+            cached = json.load(f)
+        prelude = self._dependencies[index].prelude
+        if prelude:
+            client.run_code(prelude)
+        client.run_code('\n'.join([
+            "import pickle as _pge_pickle",
+            "with open(%r, 'rb') as _pge_f:" % state,
+            "    globals().update(_pge_pickle.load(_pge_f))",
+            "del _pge_pickle, _pge_f",
+        ]))
+        cell.outputs = [nbformat.from_dict(output) for output in cached['outputs']]
+        cell.execution_count = cached.get('execution_count')
+        for path in (state, outputs):  # most recently used, evicted last
+            os.utime(path)
+
+    def skip_cell(self, client, cell, index):
+        key = self._keys.get(index)
+        if key is None or CACHE_TAG not in cell.metadata.get('tags', []):
+            return False
+        state, outputs = self._paths(key)
+        if not (os.path.isfile(state) and os.path.isfile(outputs)):
+            return False
+
+        client.nb_man.cell_start(cell, index)
+        try:
+            self._restore(client, cell, index, key)
+        except Exception as e:  # executed instead
+            logging.warning('unable to restore cell %d from the cache, executing it: %s' % (index, e))
+            self._discard(key)
+            return False
+        cell.metadata['cache_hit'] = True
+        client.nb_man.cell_complete(cell, index)
+        self.hits.append(index)
+        logging.info('cell %d restored from the cache (%s)' % (index, key[:12]))
+        return True
+
+    def cell_complete(self, client, cell, index):
+        key = self._keys.get(index)
+        if key is None or CACHE_TAG not in cell.metadata.get('tags', []) or index in self.hits:
+            return
+        if any(output.get('output_type') == 'error' for output in cell.get('outputs', [])):
+            return
+
+        state, outputs = self._paths(key)
+        os.makedirs(self.directory, exist_ok=True)
+        try:
+            client.run_code(_SAVE_CODE.format(names=self._variables(cell, index), tmp=state + '.tmp', path=state))
+        except Exception as e:  # ie. the disk is full, the cell is executed every time
+            logging.warning('unable to cache cell %d: %s' % (index, e))
+            self._discard(key)
+            return
+
+        fd, tmp = tempfile.mkstemp(dir=self.directory, prefix='.%s.' % key[:12])
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump({'outputs': cell.get('outputs', []), 'execution_count': cell.get('execution_count')}, f)
+            os.replace(tmp, outputs)
+        except Exception:
+            os.remove(tmp)
+            raise
+        logging.info('cell %d cached (%s)' % (index, key[:12]))
+        self.evict()
+
+    def _discard(self, key):
+        for path in self._paths(key):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def _entries(self):
+        """
+        :return: List[(str, float, int)], key, last use and size (pickle + outputs) of every entry
+        """
+        entries = []
+        for state in glob.glob(os.path.join(self.directory, '*.pickle')):
+            key = os.path.basename(state)[:-len('.pickle')]
+            try:
+                st = os.stat(state)
+                size = st.st_size + os.path.getsize(self._paths(key)[1])
+            except OSError:  # partially written or evicted by another execution
+                continue
+            entries.append((key, st.st_mtime, size))
+        return entries
+
+    def evict(self):
+        """
+        removes the least recently used entries until the cache fits in max_size
+        :return: int, number of entries removed
+        """
+        entries = sorted(self._entries(), key=lambda e: e[1])
+        total = sum(size for _, _, size in entries)
+        removed = 0
+        for key, _, size in entries:
+            if total <= self.max_size:
+                break
+            self._discard(key)
+            total -= size
+            removed += 1
+        return removed
+
+    def stats(self):
+        """
+        :return: Dict[str, <any>]
+        """
+        entries = self._entries()
+        return {
+            'location': self.directory,
+            'entries': len(entries),
+            'size_bytes': sum(size for _, _, size in entries),
+            'max_size_bytes': self.max_size,
+        }
+
+    def clear(self):
+        """
+        deletes every entry
+        :return: int, number of entries removed
+        """
+        entries = self._entries()
+        for key, _, _ in entries:
+            self._discard(key)
+        return len(entries)
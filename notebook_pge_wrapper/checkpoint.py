@@ -0,0 +1,221 @@
+import os
+import gzip
+import json
+import shutil
+import hashlib
+import logging
+import tempfile
+from datetime import datetime, timezone
+
+import nbformat
+
+from notebook_pge_wrapper.engines import CellObserver
+
+
+CHECKPOINT_TAG = 'checkpoint'
+RERUN_TAG = 'resume-rerun'
+CHECKPOINT_VARIABLES = 'checkpoint_variables'  # cell metadata, names of the variables saved by a checkpoint cell
+
+_RERUN_TAGS = {'parameters', 'injected-parameters', RERUN_TAG}
+_PAPERMILL_ERROR_TAG = 'papermill-error-cell-tag'  # cells added by papermill to the output of a failed notebook
+
+
+def checkpoint_hash(notebook, params):
+    """
+    hash of the notebook's code and parameters, a checkpoint is only resumed by an identical execution
+    :param notebook: NotebookNode, the executed notebook (ie. the client's)
+    :param params: Dict[str, <any>], notebook parameters
+    :return: str
+    """
+    h = hashlib.sha256()
+    for cell in notebook.cells:
+        if cell.cell_type == 'code':
+            h.update(cell.source.encode('utf-8'))
+            h.update(b'\0')
+    h.update(json.dumps(params, sort_keys=True, default=str).encode('utf-8'))
+    return h.hexdigest()
+
+
+def has_checkpoint_cells(nb):
+    """
+    looks for the "checkpoint" tag in the notebook's file without parsing it, a match may be a false positive (ie. the
+    tag printed in an output) but a notebook without a match has no checkpoint cell
+    :param nb: str, path of the notebook
+    :return: bool
+    """
+    tag = json.dumps(CHECKPOINT_TAG).encode('utf-8')
+    tail = b''
+    with open(nb, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            if tag in tail + chunk[:len(tag)] or tag in chunk:
+                return True
+            tail = chunk[-len(tag):]
+    return False
+
+
+def _read_output_notebook(out_nb):
+    """
+    reads the output notebook of the previous execution, (possibly gzipped)
+    :param out_nb: str
+    :return: NotebookNode (None if not found)
+    """
+    notebook = None
+    try:
+        if os.path.isfile(out_nb):
+            notebook = nbformat.read(out_nb, as_version=4)
+        elif os.path.isfile(out_nb + '.gz'):
+            with gzip.open(out_nb + '.gz', 'rt') as f:
+                notebook = nbformat.read(f, as_version=4)
+    except Exception as e:
+        logging.warning('unable to read the previous output notebook %s: %s' % (out_nb, e))
+    if notebook is not None:
+        notebook.cells = [c for c in notebook.cells if _PAPERMILL_ERROR_TAG not in c.metadata.get('tags', [])]
+    return notebook
+
+
+class Checkpointer(CellObserver):
+    """
+    Records the progress of the notebook after every successful cell tagged "checkpoint", the variables listed in the
+    cell's "checkpoint_variables" metadata are pickled by the kernel
+
+    when resuming, the cells up to the last checkpoint are skipped (their outputs are copied from the previous output
+    notebook) except for the parameters cells and the cells tagged "resume-rerun" (ie. imports), the pickled variables
+    are loaded back before the first cell after the checkpoint
+    the checkpoint is only read (and the notebook hashed) when the notebook starts, from the notebook being executed
+    """
+    def __init__(self, nb, out_nb, params, resume=False, checkpoint_file='_pge_checkpoint.json',
+                 state_dir='_pge_checkpoint'):
+        """
+        :param nb: str, path of the notebook
+        :param out_nb: str, path of the output notebook
+        :param params: Dict[str, <any>], notebook parameters
+        :param resume: bool, resume from the last checkpoint of a previous execution
+        :param checkpoint_file: str, progress of the execution
+        :param state_dir: str, directory of the pickled variables
+        """
+        self.nb = nb
+        self.params = params
+        self.checkpoint_file = checkpoint_file
+        self.state_dir = os.path.abspath(state_dir)
+        self.hash = None  # see checkpoint_hash, computed when the notebook starts
+        self.state = []  # pickled variables of the checkpoints reached, in order
+
+        self.resumed = None  # checkpoint the execution resumed from
+        self._checkpoint = None  # of the previous execution, resumed if its hash matches
+        self._previous_nb = None
+        self._restored = False
+        if resume:
+            self._load(out_nb)
+
+    def _load(self, out_nb):
+        # read before papermill starts, it overwrites the previous output notebook
+        if not os.path.isfile(self.checkpoint_file):
+            logging.warning('no checkpoint found (%s), executing the notebook from the start' % self.checkpoint_file)
+            return
+        with open(self.checkpoint_file, 'r') as f:
+            self._checkpoint = json.load(f)
+        self._previous_nb = _read_output_notebook(out_nb)
+
+    def _resume(self):
+        checkpoint, self._checkpoint = self._checkpoint, None
+        if checkpoint.get('hash') != self.hash:
+            logging.warning('the notebook or its parameters changed since the last checkpoint, '
+                            'executing the notebook from the start')
+            self._previous_nb = None
+            return
+
+        self.resumed = checkpoint
+        self.state = list(checkpoint['state'])
+        logging.info('resuming after checkpoint cell %d (%s)' % (checkpoint['cell'], checkpoint['time']))
+
+    def _save(self, index):
+        checkpoint = {
+            'notebook': self.nb,
+            'hash': self.hash,
+            'cell': index,
+            'state': self.state,
+            'time': datetime.now(timezone.utc).isoformat(),
+        }
+        checkpoint_dir = os.path.dirname(os.path.abspath(self.checkpoint_file))
+        fd, tmp = tempfile.mkstemp(dir=checkpoint_dir, prefix='.pge-checkpoint-')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(checkpoint, f, indent=2)
+            os.replace(tmp, self.checkpoint_file)
+        except Exception:
+            os.remove(tmp)
+            raise
+
+    def _save_variables(self, client, cell, index):
+        """
+        pickles the cell's checkpoint variables from the kernel
+        :return: str, path of the pickle (None if the cell has no checkpoint variables)
+        """
+        names = list(cell.metadata.get(CHECKPOINT_VARIABLES, []))
+        if not names:
+            return None
+        os.makedirs(self.state_dir, exist_ok=True)
+        path = os.path.join(self.state_dir, 'cell%d.pickle' % index)
+        client.run_code('\n'.join([
+            "import os as _pge_os, pickle as _pge_pickle",
+            "with open(%r, 'wb') as _pge_f:" % (path + '.tmp'),
+            "    _pge_pickle.dump({_pge_k: globals()[_pge_k] for _pge_k in %r}, _pge_f)" % names,
+            "_pge_os.replace(%r, %r)" % (path + '.tmp', path),
+            "del _pge_os, _pge_pickle, _pge_f",
+        ]))
+        return path
+
+    def _restore_variables(self, client):
+        for path in self.state:
+            client.run_code('\n'.join([
+                "import pickle as _pge_pickle",
+                "with open(%r, 'rb') as _pge_f:" % path,
+                "    globals().update(_pge_pickle.load(_pge_f))",
+                "del _pge_pickle, _pge_f",
+            ]))
+        self._restored = True
+
+    def notebook_start(self, client):
+        self.hash = checkpoint_hash(client.nb, self.params)
+        if self._checkpoint is not None:
+            self._resume()
+        if self.resumed is None:  # new execution, previous progress is discarded
+            if os.path.isfile(self.checkpoint_file):
+                os.remove(self.checkpoint_file)
+            shutil.rmtree(self.state_dir, ignore_errors=True)
+
+    def skip_cell(self, client, cell, index):
+        if self.resumed is None or index > self.resumed['cell']:
+            return False
+        if _RERUN_TAGS.intersection(cell.metadata.get('tags', [])):
+            return False
+
+        previous = self._previous_nb
+        if previous is not None and len(previous.cells) == len(client.nb.cells):
+            previous_cell = previous.cells[index]
+            if cell.cell_type == 'code':
+                cell.outputs = previous_cell.get('outputs', [])
+                cell.execution_count = previous_cell.get('execution_count')
+            if 'papermill' in previous_cell.metadata:
+                cell.metadata['papermill'] = previous_cell.metadata['papermill']
+        return True
+
+    def cell_start(self, client, cell, index):
+        if self.resumed is not None and not self._restored and index > self.resumed['cell']:
+            self._restore_variables(client)
+
+    def cell_complete(self, client, cell, index):
+        if CHECKPOINT_TAG not in cell.metadata.get('tags', []):
+            return
+        if any(output.get('output_type') == 'error' for output in cell.get('outputs', [])):
+            return
+
+        try:
+            path = self._save_variables(client, cell, index)
+        except Exception as e:  # the cell completed but its state couldn't be saved, the previous checkpoint stands
+            logging.warning('unable to save checkpoint cell %d: %s' % (index, e))
+            return
+        if path is not None and path not in self.state:
+            self.state.append(path)
+        self._save(index)
+        logging.info('checkpoint saved after cell %d' % index)
@@ -1,12 +1,10 @@
 import os
 from pathlib import Path
 from shutil import copyfile
-import yaml
 import click
-from jinja2 import Template
 
-from notebook_pge_wrapper.spec_generator import generate_spec_files
-from notebook_pge_wrapper.execute_notebook import execute as execute_notebook
+# NOTE: papermill (spec_generator, execute_notebook), jinja2 and yaml are imported by the sub-commands that need them,
+# importing them here would slow down every invocation of the CLI (ie. --help and every job launch)
 
 
 __SETTINGS = 'settings.yml'
@@ -50,6 +48,8 @@ def read_settings(f):
     :param f: file path to settings.yml
     :return: Dict[str, str]
     """
+    import yaml
+
     try:
         with open(f, 'r') as f:
             settings = yaml.safe_load(f)
@@ -77,137 +77,233 @@ def cli():
     """A CLI wrapper for notebook_pge_wrapper"""
 
 
-@cli.command()
-@click.argument('project')
-@click.option('--settings', '-s', default=None, help=__SETTINGS_DESCRIPTION)
-def create(project, settings=None):
+def read_projects_manifest(f):
     """
-    Creates the project root directory:\n
-    <project_root>\n
-    ├── README.md\n
-    ├── docker/\n
-    │   └── Dockerfile\n
-    ├── pge_create.ipynb/\n
-    ├── submit_job.ipynb/\n
-    ├── pele_setup.ipynb/\n
-    └── notebook_pges/\n
-        └── sample_pge.ipynb
+    reads the projects manifest (yaml) of create --from-manifest and dockerfile --from-manifest:
+        projects:
+          - my_pge                  # name (and directory) of the project
+          - name: other_pge
+            path: repos/other_pge   # (optional) directory of the project, defaults to its name
+            base_image: ...         # (optional) settings.yml values overridden for this project (base_image, user,
+            images: {...}           # images)
+    :param f: file path to the manifest
+    :return: List[Dict[str, <any>]], name, path and the settings overridden of every project
     """
-    if not project:
-        raise RuntimeError("project must be supplied, ie. notebook-pge-wrapper create <project_root>")
+    import yaml
+
+    with open(f, 'r') as fin:
+        manifest = yaml.safe_load(fin) or {}
+    entries = manifest.get('projects') if isinstance(manifest, dict) else manifest
+    if not isinstance(entries, list):
+        raise click.ClickException('%s must hold a list of projects ("projects: [...]")' % f)
+
+    projects = []
+    for entry in entries:
+        if isinstance(entry, str):
+            entry = {'name': entry}
+        if not isinstance(entry, dict) or not entry.get('name'):
+            raise click.ClickException('%s: every project needs a name, got %r' % (f, entry))
+        project = dict(entry)
+        project.setdefault('path', entry['name'])
+        projects.append(project)
+    return projects
+
+
+def _load_settings(settings):
+    if settings is None:
+        settings_check()
+        return read_settings(__SETTINGS_LOC)
+    return read_settings(settings)
 
-    project_root = os.path.dirname(os.path.abspath(__file__))
 
-    docker_directory = os.path.join(project, __DOCKER_DIR)
-    notebook_pges_directory = os.path.join(project, __NOTEBOOK_DIR)
+def _project_settings(settings_data, project):
+    """
+    :return: Dict[str, <any>], settings.yml with the values of the project's manifest entry
+    """
+    return dict(settings_data, **{k: v for k, v in project.items() if k not in ('name', 'path')})
 
-    templates = os.path.join(project_root, 'templates')
-    readme_file = os.path.join(templates, __README_FILE)
-    pge_create_notebook_file = os.path.join(templates, __PGE_CREATE_NOTEBOOK_FILE)
-    submit_job_notebook_file = os.path.join(templates, __SUBMIT_JOB_NOTEBOOK_FILE)
-    sample_pge_notebook_file = os.path.join(templates, __SAMPLE_PGE_NOTEBOOK_FILE)
-    pele_setup_notebook_file = os.path.join(templates, __PELE_SETUP_NOTEBOOK_FILE)
 
-    if settings is None:
-        settings_check()
-        settings_data = read_settings(__SETTINGS_LOC)
-    else:
-        settings_data = read_settings(settings)
+def _write_dockerfiles(settings_data, project, docker_directory, all_images=False):
+    """
+    renders Dockerfile.template to <docker_directory>/Dockerfile, and with all_images to Dockerfile.<name> for every
+    image of settings.yml ("images", name -> base image)
+    :param settings_data: Dict[str, <any>], settings.yml
+    :param project: str, name of the project
+    :param docker_directory: str
+    :param all_images: bool
+    """
+    from notebook_pge_wrapper.templating import write_template
 
-    if not os.path.exists(project):
-        os.mkdir(project)
+    user = settings_data['user']
+    dockerfiles = [(__DOCKERFILE, settings_data['base_image'])]
+    if all_images:
+        images = settings_data.get('images')
+        if not isinstance(images, dict) or not images:
+            raise click.ClickException('--all-images requires "images" (name: base image) in settings.yml')
+        dockerfiles += [('%s.%s' % (__DOCKERFILE, name), image) for name, image in sorted(images.items())]
 
-    # create docker directory
-    if not os.path.exists(docker_directory):
-        os.mkdir(docker_directory)
+    for dockerfile_name, base_image in dockerfiles:
+        location = os.path.join(docker_directory, dockerfile_name)
+        write_template(__DOCKERFILE_TEMPLATE, location, base_image=base_image, user=user, project=project)
+        print('generated %s' % location)
 
-    base_image = settings_data['base_image']
-    user = settings_data['user']
 
-    docker_template = read_docker_template(os.path.join(templates, __DOCKERFILE_TEMPLATE))
-    docker_template = Template(docker_template)
-    docker_template = docker_template.render(base_image=base_image, user=user, project=project)
+def _create_project(project, settings_data, path=None):
+    """
+    :param project: str, name of the project
+    :param settings_data: Dict[str, <any>], settings.yml
+    :param path: str, directory of the project, defaults to its name
+    """
+    from notebook_pge_wrapper.templating import TEMPLATES_DIR, write_template
+
+    path = path or project
+    docker_directory = os.path.join(path, __DOCKER_DIR)
+    notebook_pges_directory = os.path.join(path, __NOTEBOOK_DIR)
+
+    if not os.path.exists(path):
+        os.makedirs(path)
 
-    # create Dockerfile
-    with open(os.path.join(docker_directory, __DOCKERFILE), 'w') as f:
-        f.write(docker_template)
+    # create docker directory and Dockerfile
+    if not os.path.exists(docker_directory):
+        os.mkdir(docker_directory)
+    _write_dockerfiles(settings_data, project, docker_directory)
 
     # copy Dockerfile.template to project
     copyfile(
-        os.path.join(templates, __DOCKERFILE_TEMPLATE),
-        os.path.join(project, __DOCKERFILE_TEMPLATE)
+        os.path.join(TEMPLATES_DIR, __DOCKERFILE_TEMPLATE),
+        os.path.join(path, __DOCKERFILE_TEMPLATE)
     )
 
     # copy requirements.ipynb to project
     copyfile(
-        os.path.join(templates, __REQUIREMENTS),
-        os.path.join(project, __DOCKER_DIR, __REQUIREMENTS)
+        os.path.join(TEMPLATES_DIR, __REQUIREMENTS),
+        os.path.join(docker_directory, __REQUIREMENTS)
     )
 
     # create notebook_pges directory
     if not os.path.exists(notebook_pges_directory):
         os.mkdir(notebook_pges_directory)
 
-    # create pge_create notebook
-    pge_create_notebook_dest = os.path.join(project, __PGE_CREATE_NOTEBOOK_FILE)
-    with open(pge_create_notebook_file, 'r') as fin, \
-            open(pge_create_notebook_dest, 'w+') as fout:
-        templated_pge_create_content = fin.read().replace('PGE_NAME_PLACEHOLDER', project)
-        fout.write(templated_pge_create_content)
-
-    # create submit_job notebook
-    submit_job_notebook_dest = os.path.join(project, __SUBMIT_JOB_NOTEBOOK_FILE)
-    with open(submit_job_notebook_file, 'r') as fin, \
-            open(submit_job_notebook_dest, 'w+') as fout:
-        templated_submit_job_content = fin.read().replace('PGE_NAME_PLACEHOLDER', project)
-        fout.write(templated_submit_job_content)
+    # create pge_create and submit_job notebooks
+    write_template(__PGE_CREATE_NOTEBOOK_FILE, os.path.join(path, __PGE_CREATE_NOTEBOOK_FILE), project=project)
+    write_template(__SUBMIT_JOB_NOTEBOOK_FILE, os.path.join(path, __SUBMIT_JOB_NOTEBOOK_FILE), project=project)
 
     # create pele_setup notebook
-    copyfile(pele_setup_notebook_file, os.path.join(project, __PELE_SETUP_NOTEBOOK_FILE))
-        
+    copyfile(os.path.join(TEMPLATES_DIR, __PELE_SETUP_NOTEBOOK_FILE), os.path.join(path, __PELE_SETUP_NOTEBOOK_FILE))
+
     # create sample pge notebook
-    copyfile(sample_pge_notebook_file, os.path.join(notebook_pges_directory, f'{project}_{__SAMPLE_PGE_NOTEBOOK_FILE}'))
+    copyfile(os.path.join(TEMPLATES_DIR, __SAMPLE_PGE_NOTEBOOK_FILE),
+             os.path.join(notebook_pges_directory, f'{project}_{__SAMPLE_PGE_NOTEBOOK_FILE}'))
 
     # create README.md
-    copyfile(readme_file, os.path.join(project, __README_FILE))
+    copyfile(os.path.join(TEMPLATES_DIR, __README_FILE), os.path.join(path, __README_FILE))
 
 
 @cli.command()
+@click.argument('project', required=False)
 @click.option('--settings', '-s', default=None, help=__SETTINGS_DESCRIPTION)
-def dockerfile(settings=None):
+@click.option('--from-manifest', 'manifest', default=None, type=click.Path(exists=True, dir_okay=False),
+              help='yaml manifest of the projects to create instead of PROJECT, "projects:" followed by a list of '
+                   'names or of {name, path, base_image, user, images}')
+def create(project, settings=None, manifest=None):
+    """
+    Creates the project root directory:\n
+    <project_root>\n
+    ├── README.md\n
+    ├── docker/\n
+    │   └── Dockerfile\n
+    ├── pge_create.ipynb/\n
+    ├── submit_job.ipynb/\n
+    ├── pele_setup.ipynb/\n
+    └── notebook_pges/\n
+        └── sample_pge.ipynb\n
+    or every project of a manifest: notebook-pge-wrapper create --from-manifest projects.yml
+    """
+    if bool(project) == bool(manifest):
+        raise click.UsageError("project or --from-manifest must be supplied, ie. notebook-pge-wrapper create "
+                               "<project_root>")
+
+    settings_data = _load_settings(settings)
+    if project:
+        _create_project(project, settings_data)
+        return
+
+    projects = read_projects_manifest(manifest)
+    for p in projects:
+        print('creating project %s in %s' % (p['name'], p['path']))
+        _create_project(p['name'], _project_settings(settings_data, p), path=p['path'])
+    print('created %d project(s)' % len(projects))
+
+
+@cli.command()
+@click.option('--settings', '-s', default=None, help=__SETTINGS_DESCRIPTION)
+@click.option('--all-images', is_flag=True, default=False,
+              help='also generate docker/Dockerfile.<name> for every image of settings.yml ("images", name: base '
+                   'image)')
+@click.option('--from-manifest', 'manifest', default=None, type=click.Path(exists=True, dir_okay=False),
+              help='update the Dockerfile of every project of a yaml manifest (see create --from-manifest) instead '
+                   'of the current project')
+def dockerfile(settings=None, all_images=False, manifest=None):
     """
     updates the Dockerfile template with values from settings.yml
     """
-    base, project_root = os.path.split(os.getcwd())
+    settings_data = _load_settings(settings)
+    if manifest is None:
+        base, project_root = os.path.split(os.getcwd())
+        _write_dockerfiles(settings_data, project_root, __DOCKER_DIR, all_images=all_images)
+        return
 
-    if settings is None:
-        settings_check()
-        settings_data = read_settings(__SETTINGS_LOC)
-    else:
-        settings_data = read_settings(settings)
-    base_image = settings_data['base_image']
-    user = settings_data['user']
+    for p in read_projects_manifest(manifest):
+        _write_dockerfiles(_project_settings(settings_data, p), p['name'], os.path.join(p['path'], __DOCKER_DIR),
+                           all_images=all_images)
+
+
+def _print_specs_results(results):
+    """
+    :param results: List[(str, str, str)], see generate_all_spec_files
+    :return: List[(str, str)], notebook and error message of the failed notebooks
+    """
+    from notebook_pge_wrapper.spec_generator import GENERATED, SKIPPED, FAILED
 
-    file_root = os.path.dirname(os.path.abspath(__file__))
-    templates = os.path.join(file_root, 'templates')
-    docker_template = read_docker_template(os.path.join(templates, __DOCKERFILE_TEMPLATE))
-    docker_template = Template(docker_template)
-    docker_template = docker_template.render(base_image=base_image, user=user, project=project_root)
+    generated = [nb for nb, status, _ in results if status == GENERATED]
+    skipped = [nb for nb, status, _ in results if status == SKIPPED]
+    failures = [(nb, error) for nb, status, error in results if status == FAILED]
 
-    # updating Dockerfile
-    with open(os.path.join(__DOCKER_DIR, __DOCKERFILE), 'w') as f:
-        f.write(docker_template)
+    print('\ngenerated spec files for %d notebook(s), %d unchanged, %d failed' %
+          (len(generated), len(skipped), len(failures)))
+    for nb, error in failures:
+        print('FAILED %s: %s' % (nb, error))
+    return failures
 
 
 @cli.command()
 @click.argument('notebook_path')
 @click.option('--settings', '-s', default=None, help=__SETTINGS_DESCRIPTION)
-def specs(notebook_path, settings=None):
+@click.option('--jobs', '-j', default=1, type=click.IntRange(min=1),
+              help='number of notebooks to inspect in parallel when generating all spec files (default 1)')
+@click.option('--force', '-f', is_flag=True, default=False,
+              help='regenerate the spec files even if the notebook is unchanged since the last run')
+@click.option('--bundle', default=None, is_flag=False, flag_value=os.path.join(__DOCKER_DIR, 'specs-bundle.jsonl'),
+              help='with "all", also write the specs of every notebook in a single JSON lines file '
+                   '(default docker/specs-bundle.jsonl)')
+@click.option('--watch', '-w', is_flag=True, default=False,
+              help='keep running, regenerating the spec files of a notebook when it is saved with a different '
+                   'parameters cell')
+@click.option('--poll', is_flag=True, default=False,
+              help='with --watch, poll notebook_pges/ even if watchdog (inotify) is installed')
+def specs(notebook_path, settings=None, jobs=1, force=False, bundle=None, watch=False, poll=False):
     """
     Generates the hysdsio and job specs for json files (in the docker directory) for a notebook \n
     enter "all" to generate all spec files in notebook_pges/ \n
-    ie. notebook-pge-wrapper specs <notebook_path or all>
+    ie. notebook-pge-wrapper specs <notebook_path or all> [--jobs N] [--force] [--bundle [PATH]] [--watch]
     """
+    from notebook_pge_wrapper.spec_generator import generate_all_spec_files, write_specs_bundle, FAILED
+
+    if bundle and notebook_path != 'all':
+        raise click.UsageError('--bundle requires "all", the bundle holds the specs of every notebook')
+    if bundle and watch:
+        raise click.UsageError('--bundle and --watch are mutually exclusive')
+
     if settings is None:
         settings_check()
         settings_data = read_settings(__SETTINGS_LOC)
@@ -216,12 +312,13 @@ def specs(notebook_path, settings=None):
     user = settings_data['user']
 
     if notebook_path == "all":
-        for nb in os.listdir('notebook_pges'):  # iterate through notebook_pges/ directory
+        notebooks = []
+        for nb in sorted(os.listdir(__NOTEBOOK_DIR)):  # iterate through notebook_pges/ directory
             if not nb.endswith('.ipynb'):
                 print('%s is not a notebook, skipping...' % nb)
                 continue
             print('inspecting notebook: %s' % nb)
-            generate_spec_files(nb, user)
+            notebooks.append(nb)
     else:
         if not os.path.isfile(notebook_path):
             raise RuntimeError("notebook %s not found" % notebook_path)
@@ -229,21 +326,221 @@ def specs(notebook_path, settings=None):
         nb = notebook_path.split('/')
         nb = nb[1]
         print('inspecting notebook: %s' % nb)
-        generate_spec_files(nb, user)
+        notebooks = [nb]
+
+    results = generate_all_spec_files(notebooks, user, jobs=jobs, force=force)
+    failures = _print_specs_results(results)
+
+    if watch:
+        from notebook_pge_wrapper.watch import watch_spec_files, Observer
+
+        print('\nwatching %s/ (%s), press Ctrl-C to stop' %
+              (__NOTEBOOK_DIR, 'polling' if poll or Observer is None else 'watchdog'))
+        try:
+            watch_spec_files(user, notebooks=None if notebook_path == 'all' else notebooks,
+                             on_results=_print_specs_results, polling=poll)
+        except KeyboardInterrupt:
+            pass
+        return
+
+    if bundle:
+        bundled = [nb for nb, status, _ in results if status != FAILED]
+        write_specs_bundle(bundled, bundle)
+        print('wrote the specs of %d notebook(s) to %s%s' %
+              (len(bundled), bundle, ' (failed notebooks left out)' if failures else ''))
+    if failures:
+        raise click.ClickException('spec generation failed for %d notebook(s)' % len(failures))
 
 
 @cli.command()
 @click.argument('notebook_path')
 @click.option('--context', 'context')
-def execute(notebook_path, context=None):
+@click.option('--params', 'params', default=None,
+              help='(optional) generated hysds-io (or job-spec, or json list of parameter names) to read the notebook '
+                   'parameters from instead of inspecting the notebook')
+@click.option('--daemon-socket', 'daemon_socket', default=None, envvar='NOTEBOOK_PGE_WRAPPER_DAEMON_SOCKET',
+              help='(optional) unix socket of the kernel pool daemon (notebook-pge-wrapper daemon) to execute the '
+                   'notebook on, a new kernel is started if not supplied or if the daemon is not running')
+@click.option('--max-output-bytes', default=None, type=click.IntRange(min=0),
+              help='(optional) maximum size of the outputs of a cell in the output notebook, extra outputs are removed')
+@click.option('--stream-output', default='keep', type=click.Choice(['keep', 'truncate', 'drop']),
+              help='keep, truncate (to --max-stream-bytes) or drop the stdout/stderr outputs in the output notebook, '
+                   'they are still written to _alt_info.txt (default keep)')
+@click.option('--max-stream-bytes', default=10000, type=click.IntRange(min=0),
+              help='size of the end of a stream output kept with --stream-output truncate (default 10000)')
+@click.option('--externalize-bytes', default=None, type=click.IntRange(min=0),
+              help='(optional) move binary outputs (images, pdf) larger than this to <name>-output_files/')
+@click.option('--compress', is_flag=True, default=False, help='gzip the output notebook (<name>-output.ipynb.gz)')
+@click.option('--cell-timeout', default=None, type=click.IntRange(min=1),
+              help='(optional) wall clock seconds a single cell may run, the notebook is stopped past it '
+                   '(the whole notebook is limited to soft_time_limit from _context.json)')
+@click.option('--max-rss', default=None, help='(optional) resident memory limit of the kernel, ie. 4GB')
+@click.option('--max-cpu', default=None, type=click.IntRange(min=1),
+              help='(optional) cpu seconds limit of the kernel')
+@click.option('--resume', is_flag=True, default=False,
+              help='resume from the last cell tagged "checkpoint" completed by a previous execution of the notebook '
+                   'with the same _context.json')
+@click.option('--in-process', is_flag=True, default=False,
+              help='execute the cells in this process instead of starting a kernel, for pure python notebooks '
+                   '(no magics, shell commands or widgets)')
+@click.option('--no-cell-cache', 'cell_cache', is_flag=True, default=True, flag_value=False,
+              help='execute the cells tagged "cache" instead of restoring them from the cell cache')
+@click.option('--fan-out', 'fan_out', default=None,
+              help='(optional) list parameter to split in chunks, the notebook is executed once per chunk in '
+                   '<fan-out-dir>/chunk_<n>/ on a process pool')
+@click.option('--fan-out-jobs', default=None, type=click.IntRange(min=1),
+              help='number of chunks executed concurrently with --fan-out (default number of CPUs)')
+@click.option('--chunk-size', default=None, type=click.IntRange(min=1),
+              help='number of items per chunk with --fan-out (default one chunk per --fan-out-jobs)')
+@click.option('--reducer', default=None,
+              help='(optional) notebook merging the chunks with --fan-out, executed with their directories as its '
+                   '"fanout_dirs" parameter')
+@click.option('--fan-out-dir', default='fanout_runs', help='directory of the chunks (default fanout_runs)')
+def execute(notebook_path, context=None, params=None, daemon_socket=None, max_output_bytes=None, stream_output='keep',
+            max_stream_bytes=10000, externalize_bytes=None, compress=False, cell_timeout=None, max_rss=None,
+            max_cpu=None, resume=False, in_process=False, cell_cache=True, fan_out=None, fan_out_jobs=None,
+            chunk_size=None, reducer=None, fan_out_dir='fanout_runs'):
     """
     Execute a .ipynb notebook
     :param notebook_path: path to the .ipynb file
     :param context: path to the _context.json file, default to _context.json in current directory if not supplied
+    :param params: path to the hysds-io json with the notebook parameters, inspects the notebook if not supplied
     """
     if not notebook_path.endswith('.ipynb'):
         raise RuntimeError('%s is not a .ipynb file' % notebook_path)
+    ctx = click.get_current_context()
+    if fan_out:
+        # given on the command line, NOTEBOOK_PGE_WRAPPER_DAEMON_SOCKET set for the worker's other jobs is just unused
+        ignored = ['--%s' % name.replace('_', '-') for name in ('params', 'daemon_socket', 'resume')
+                   if ctx.get_parameter_source(name) == click.core.ParameterSource.COMMANDLINE]
+        if ignored:
+            raise click.UsageError('%s not supported with --fan-out, every chunk is a new execution of its own '
+                                   'context' % ', '.join(ignored))
+    else:
+        ignored = ['--%s' % name.replace('_', '-') for name in ('fan_out_jobs', 'chunk_size', 'reducer', 'fan_out_dir')
+                   if ctx.get_parameter_source(name) == click.core.ParameterSource.COMMANDLINE]
+        if ignored:
+            raise click.UsageError('%s only supported with --fan-out' % ', '.join(ignored))
+    if in_process and (max_rss is not None or max_cpu is not None):
+        raise click.UsageError('--max-rss and --max-cpu are not supported with --in-process, they would limit the '
+                               'notebook-pge-wrapper process itself')
+
+    from notebook_pge_wrapper.execute_notebook import execute as execute_notebook
 
     if context is None:
         context = '_context.json'
-    execute_notebook(notebook_path, ctx_file=context)
+    output_limits = None
+    if max_output_bytes is not None or stream_output != 'keep' or externalize_bytes is not None:
+        output_limits = {
+            'max_output_bytes': max_output_bytes,
+            'stream_mode': stream_output,
+            'max_stream_bytes': max_stream_bytes,
+            'externalize_bytes': externalize_bytes,
+        }
+    limits = {
+        'cell_timeout': cell_timeout,
+        'max_rss': max_rss,
+        'max_cpu': max_cpu,
+    }
+    if fan_out:
+        from notebook_pge_wrapper.batch import execute_fanout
+
+        report = execute_fanout(notebook_path, context, fan_out, chunk_size=chunk_size, jobs=fan_out_jobs,
+                                reducer=reducer, out_dir=fan_out_dir,
+                                execute_kwargs={'output_limits': output_limits, 'compress': compress, 'limits': limits,
+                                                'in_process': in_process, 'cell_cache': cell_cache})
+        print('%d chunk(s) of %s executed in %.1fs, report: %s' % (report['total'], fan_out, report['duration'],
+                                                                  os.path.join(fan_out_dir, 'batch_report.json')))
+        return
+
+    execute_notebook(notebook_path, ctx_file=context, params_file=params, daemon_socket=daemon_socket,
+                     output_limits=output_limits, compress=compress, limits=limits, resume=resume,
+                     in_process=in_process, cell_cache=cell_cache)
+
+
+@cli.command('execute-batch')
+@click.argument('notebook_path')
+@click.argument('contexts')
+@click.option('--out-dir', '-o', default='batch_runs', help='directory of the runs and batch report (default batch_runs)')
+@click.option('--jobs', '-j', default=None, type=click.IntRange(min=1),
+              help='number of concurrent runs (default number of CPUs)')
+def execute_batch(notebook_path, contexts, out_dir='batch_runs', jobs=None):
+    """
+    Execute a .ipynb notebook once per context \n
+    CONTEXTS is a directory of _context.json files or a JSON lines file with one context per line, every run gets its
+    own directory (<out_dir>/<run id>/) with its output notebook and _alt_* files \n
+    ie. notebook-pge-wrapper execute-batch <notebook_path> <contexts> [--jobs N]
+    """
+    if not notebook_path.endswith('.ipynb'):
+        raise RuntimeError('%s is not a .ipynb file' % notebook_path)
+
+    from notebook_pge_wrapper.batch import execute_batch as run_batch
+
+    report = run_batch(notebook_path, contexts, out_dir=out_dir, jobs=jobs)
+    print('%d/%d run(s) succeeded in %.1fs, report: %s' % (report['succeeded'], report['total'], report['duration'],
+                                                          os.path.join(out_dir, 'batch_report.json')))
+    for run in report['runs']:
+        if run['error']:
+            print('FAILED %s: %s' % (run['run_id'], run['error']))
+    if report['failed']:
+        raise click.ClickException('%d run(s) failed' % report['failed'])
+
+
+@cli.command()
+@click.option('--socket', 'socket_path', default=None, help='unix socket to listen on (default $XDG_RUNTIME_DIR or '
+                                                             '/tmp/notebook-pge-wrapper.sock)')
+@click.option('--size', '-n', default=1, type=click.IntRange(min=1), help='number of pre-warmed kernels (default 1)')
+@click.option('--preload', '-p', multiple=True, help='module imported in every kernel when it starts (repeatable)')
+@click.option('--max-reuse', default=20, type=click.IntRange(min=1),
+              help='number of jobs a kernel runs before it is replaced (default 20)')
+@click.option('--kernel-name', default='python3', help='kernel to start (default python3)')
+def daemon(socket_path=None, size=1, preload=(), max_reuse=20, kernel_name='python3'):
+    """
+    Serves a pool of pre-warmed kernels on a unix socket for back to back notebook executions \n
+    ie. notebook-pge-wrapper daemon --size 2 --preload numpy --preload pandas \n
+        notebook-pge-wrapper execute <notebook_path> --daemon-socket <socket>
+    """
+    from notebook_pge_wrapper.kernel_pool import serve, DEFAULT_SOCKET
+
+    serve(socket_path or DEFAULT_SOCKET, size=size, preload=preload, max_reuse=max_reuse, kernel_name=kernel_name)
+
+
+@cli.group()
+def cache():
+    """
+    Manage the notebook inspection cache (enabled with NOTEBOOK_PGE_WRAPPER_CACHE=1) and the cell cache (--cells)
+    """
+
+
+@cache.command()
+@click.option('--cells', is_flag=True, default=False, help='the cell cache (cells tagged "cache") instead')
+def stats(cells=False):
+    """
+    Prints the location, size and hit rate of the inspection cache
+    """
+    if cells:
+        from notebook_pge_wrapper.cell_cache import CellCache
+        cache_stats = CellCache().stats()
+    else:
+        from notebook_pge_wrapper.cache import InspectionCache
+        cache_stats = InspectionCache().stats()
+
+    for k, v in cache_stats.items():
+        print('%s: %s' % (k, v))
+
+
+@cache.command()
+@click.option('--cells', is_flag=True, default=False, help='the cell cache (cells tagged "cache") instead')
+def clear(cells=False):
+    """
+    Deletes every entry of the inspection cache
+    """
+    if cells:
+        from notebook_pge_wrapper.cell_cache import CellCache
+        print('removed %d cached cell(s)' % CellCache().clear())
+        return
+
+    from notebook_pge_wrapper.cache import InspectionCache
+
+    entries = InspectionCache().clear()
+    print('removed %d cached notebook inspection(s)' % entries)
@@ -0,0 +1,285 @@
+import os
+import ast
+import sys
+import ctypes
+import signal
+import builtins
+import platform
+import linecache
+import threading
+import traceback
+
+from nbclient.exceptions import CellExecutionError
+from nbformat.v4 import new_output
+from papermill.clientwrap import PapermillNotebookClient
+from papermill.engines import Engine, NBClientEngine, papermill_engines
+from papermill.log import logger
+from papermill.utils import merge_kwargs, remove_args
+
+
+PGE_ENGINE = 'pge'
+IN_PROCESS_ENGINE = 'pge-in-process'
+
+
+class CellObserver(object):
+    """
+    Notified by PGENotebookClient when the notebook and each of its cells start and complete
+    """
+    def notebook_start(self, client):
+        pass
+
+    def skip_cell(self, client, cell, index):
+        """
+        :return: bool, True if the cell must not be executed (ie. already executed by a previous run)
+        """
+        return False
+
+    def cell_start(self, client, cell, index):
+        pass
+
+    def cell_complete(self, client, cell, index):
+        pass
+
+    def notebook_complete(self, client):
+        pass
+
+
+class PGENotebookClient(PapermillNotebookClient):
+    """
+    Papermill's notebook client, notifying CellObservers when the notebook and each of its cells start and complete
+    """
+    def __init__(self, nb_man, observers=None, **kw):
+        super().__init__(nb_man, **kw)
+        self.observers = list(observers or [])
+
+    @property
+    def kernel_pid(self):
+        """
+        :return: int, pid of the kernel process (None if the kernel isn't a local process)
+        """
+        provisioner = getattr(self.km, 'provisioner', None)
+        process = getattr(provisioner, 'process', None)
+        return getattr(process, 'pid', None)
+
+    def kill_kernel(self):
+        """
+        kills the kernel process, the cell being executed fails
+        """
+        pid = self.kernel_pid
+        if pid is not None:
+            os.kill(pid, signal.SIGKILL)
+
+    def execute(self, **kwargs):
+        """
+        same as PapermillNotebookClient.execute, stopping the kernel client's channels when the kernel manager was
+        supplied (ie. the kernel pool's), nbclient only cleans up the clients of the kernels it started
+        """
+        try:
+            return super().execute(**kwargs)
+        finally:
+            if not self.owns_km and self.kc is not None:
+                self.kc.stop_channels()
+                self.kc = None
+
+    def _notify(self, event, *args):
+        for observer in self.observers:
+            getattr(observer, event)(self, *args)
+
+    def run_code(self, code):
+        """
+        executes code in the notebook's kernel without adding it to the notebook or to the kernel's history
+        its outputs are discarded, raises RuntimeError if the code fails
+        :param code: str
+        """
+        reply = self.wait_for_reply(self.kc.execute(code, store_history=False))
+        content = reply['content'] if reply else {'status': 'timeout'}
+        if content['status'] != 'ok':
+            raise RuntimeError('%s: %s' % (content.get('ename', content['status']), content.get('evalue', '')))
+
+    def papermill_execute_cells(self):
+        """
+        same as PapermillNotebookClient.papermill_execute_cells, notifying the observers
+        the observers get the completed cell before it's saved to the output notebook, a cell skipped by an observer
+        isn't executed (nor offered to the next observers)
+        """
+        self._notify('notebook_start')
+        try:
+            for index, cell in enumerate(self.nb.cells):
+                if any(observer.skip_cell(self, cell, index) for observer in self.observers):
+                    continue
+                try:
+                    self.nb_man.cell_start(cell, index)
+                    self._notify('cell_start', cell, index)
+                    self.execute_cell(cell, index)
+                except CellExecutionError as ex:
+                    self.nb_man.cell_exception(self.nb.cells[index], cell_index=index, exception=ex)
+                    break
+                finally:
+                    self._notify('cell_complete', self.nb.cells[index], index)
+                    self.nb_man.cell_complete(self.nb.cells[index], cell_index=index)
+        finally:
+            self._notify('notebook_complete')
+
+
+class PGEEngine(NBClientEngine):
+    """
+    Papermill engine executing the notebook with PGENotebookClient, registered as "pge"
+    """
+    @classmethod
+    def execute_managed_notebook(cls, nb_man, kernel_name, log_output=False, stdout_file=None, stderr_file=None,
+                                 start_timeout=60, execution_timeout=None, observers=None, **kwargs):
+        # same as NBClientEngine.execute_managed_notebook, with PGENotebookClient
+        kwargs = remove_args(['input_path'], **kwargs)
+        safe_kwargs = remove_args(['timeout', 'startup_timeout'], **kwargs)
+        final_kwargs = merge_kwargs(
+            safe_kwargs,
+            timeout=execution_timeout if execution_timeout else kwargs.get('timeout'),
+            startup_timeout=start_timeout,
+            kernel_name=kernel_name,
+            log=logger,
+            log_output=log_output,
+            stdout_file=stdout_file,
+            stderr_file=stderr_file,
+        )
+        return PGENotebookClient(nb_man, observers=observers, **final_kwargs).execute()
+
+
+class _CellStream(object):
+    """
+    sys.stdout/sys.stderr while an in-process cell runs, writes are added to the cell's outputs as stream outputs
+    """
+    def __init__(self, client, cell, name):
+        self.client = client
+        self.cell = cell
+        self.name = name
+
+    def write(self, text):
+        if not text:
+            return 0
+        outputs = self.cell.outputs
+        if outputs and outputs[-1].output_type == 'stream' and outputs[-1].name == self.name:
+            outputs[-1].text += text
+        else:
+            outputs.append(new_output('stream', name=self.name, text=text))
+        self.client.log_output_message(new_output('stream', name=self.name, text=text))
+        return len(text)
+
+    def flush(self):
+        pass
+
+    def isatty(self):
+        return False
+
+
+class InProcessNotebookClient(PGENotebookClient):
+    """
+    Executes the code cells with exec in the current process, sharing a single namespace, instead of a kernel
+    only for pure python notebooks (no magics, shell escapes or rich display), stdout and stderr are captured as stream
+    outputs and the value of a cell's last expression as its execute_result, same as the ipython kernel
+    """
+    def __init__(self, nb_man, observers=None, **kw):
+        super().__init__(nb_man, observers=observers, **kw)
+        self.namespace = {'__name__': '__main__', '__builtins__': builtins}
+        self._execution_count = 0
+        self._thread_id = None
+
+    @property
+    def kernel_pid(self):
+        """
+        :return: int, pid of the current process, the "kernel" of the notebook
+        """
+        return os.getpid()
+
+    def kill_kernel(self):
+        """
+        interrupts the cell being executed (KeyboardInterrupt), the process itself is left running
+        on the main thread the cell is sent SIGINT (which also interrupts sleeps and blocking calls), on other threads
+        it's only interrupted once it runs python code again
+        """
+        thread_id = self._thread_id
+        if thread_id is None:
+            return
+        if thread_id == threading.main_thread().ident and \
+                signal.getsignal(signal.SIGINT) is signal.default_int_handler:
+            signal.pthread_kill(thread_id, signal.SIGINT)
+        else:
+            ctypes.pythonapi.PyThreadState_SetAsyncExc(ctypes.c_ulong(thread_id), ctypes.py_object(KeyboardInterrupt))
+
+    def run_code(self, code):
+        """
+        executes code in the notebook's namespace, raises RuntimeError if the code fails
+        :param code: str
+        """
+        try:
+            exec(compile(code, '<pge>', 'exec'), self.namespace)
+        except Exception as e:
+            raise RuntimeError('%s: %s' % (type(e).__name__, e)) from e
+
+    def _run_cell(self, cell, filename):
+        tree = ast.parse(cell.source, filename)
+        last = tree.body.pop() if tree.body and isinstance(tree.body[-1], ast.Expr) else None
+        exec(compile(tree, filename, 'exec'), self.namespace)
+        if last is not None:
+            value = eval(compile(ast.Expression(last.value), filename, 'eval'), self.namespace)
+            if value is not None:
+                self.namespace['_'] = value
+                output = new_output('execute_result', data={'text/plain': repr(value)},
+                                    execution_count=cell.execution_count)
+                cell.outputs.append(output)
+                self.log_output_message(output)
+
+    def execute_cell(self, cell, cell_index, **kwargs):
+        if cell.cell_type != 'code' or not cell.source.strip():
+            return cell
+
+        self._execution_count += 1
+        cell.execution_count = self._execution_count
+        cell.outputs = []
+        filename = '<In [%d]>' % cell.execution_count
+        lines = cell.source.splitlines(True)
+        linecache.cache[filename] = (len(cell.source), None, lines, filename)  # source lines in the tracebacks
+
+        stdout, stderr = sys.stdout, sys.stderr
+        sys.stdout, sys.stderr = _CellStream(self, cell, 'stdout'), _CellStream(self, cell, 'stderr')
+        self._thread_id = threading.get_ident()
+        try:
+            self._run_cell(cell, filename)
+        except BaseException as e:  # same as a kernel, SystemExit and KeyboardInterrupt fail the cell
+            frames = e.__traceback__
+            while frames is not None and frames.tb_frame.f_code.co_filename != filename:
+                frames = frames.tb_next  # starts the traceback at the cell, not in this module
+            tb = [line.rstrip('\n') for line in traceback.format_exception(type(e), e, frames)]
+            cell.outputs.append(new_output('error', ename=type(e).__name__, evalue=str(e), traceback=tb))
+            raise CellExecutionError('\n'.join(tb), type(e).__name__, str(e))
+        finally:
+            self._thread_id = None
+            sys.stdout, sys.stderr = stdout, stderr
+            linecache.cache.pop(filename, None)
+        return cell
+
+    def execute(self, **kwargs):
+        self.papermill_execute_cells()
+        self.nb.metadata['language_info'] = {
+            'name': 'python',
+            'version': platform.python_version(),
+            'mimetype': 'text/x-python',
+            'file_extension': '.py',
+        }
+        return self.nb
+
+
+class InProcessEngine(Engine):
+    """
+    Papermill engine executing pure python notebooks in the current process with InProcessNotebookClient, registered
+    as "pge-in-process", no kernel is started
+    """
+    @classmethod
+    def execute_managed_notebook(cls, nb_man, kernel_name, log_output=False, stdout_file=None, stderr_file=None,
+                                 observers=None, **kwargs):
+        return InProcessNotebookClient(nb_man, observers=observers, kernel_name=kernel_name, log=logger,
+                                       log_output=log_output, stdout_file=stdout_file,
+                                       stderr_file=stderr_file).execute()
+
+
+papermill_engines.register(PGE_ENGINE, PGEEngine)
+papermill_engines.register(IN_PROCESS_ENGINE, InProcessEngine)
@@ -1,22 +1,53 @@
+import os
 import sys
 import json
+import time
+import asyncio
 import logging
+import tempfile
+import functools
 import traceback
+from collections import OrderedDict
 
 import papermill
 
+from notebook_pge_wrapper.inspection import inspect
+from notebook_pge_wrapper.spec import NUMBER, NotebookSpec
+from notebook_pge_wrapper.parameters import Parameter
+from notebook_pge_wrapper.engines import PGE_ENGINE, IN_PROCESS_ENGINE
+from notebook_pge_wrapper.metrics import CellMetricsRecorder
+from notebook_pge_wrapper.outputs import OutputLimiter, compress_notebook
+from notebook_pge_wrapper.resources import ExecutionWatchdog
+from notebook_pge_wrapper.checkpoint import Checkpointer, has_checkpoint_cells
+from notebook_pge_wrapper.cell_cache import CellCache
+
 logging.basicConfig(level='INFO', format="%(asctime)s [%(levelname)s] %(message)s", datefmt='%Y-%m-%d %H:%M:%S')
 
+# files written in the working directory of an execution, see ExecutionResult.paths
+RUN_FILES = {
+    'info': '_alt_info.txt',
+    'error': '_alt_error.txt',
+    'traceback': '_alt_traceback.txt',
+    'metrics': '_pge_metrics.jsonl',
+    'metrics_summary': '_pge_metrics.json',
+    'resources': '_pge_resources.jsonl',
+    'checkpoint': '_pge_checkpoint.json',
+}
+
+__CONTEXT_FILE = '_context.json'
+
 
 def exec_wrapper(func):
-    """Execution wrapper to dump alternate errors and tracebacks."""
+    """Execution wrapper to dump alternate errors and tracebacks (in the workdir keyword argument, if any)."""
     def wrapper(*args, **kwargs):
         try:
-            func(*args, **kwargs)
+            return func(*args, **kwargs)
         except (Exception, SystemExit) as e:
-            with open("_alt_error.txt", "w") as f:
+            workdir = kwargs.get('workdir') or '.'
+            os.makedirs(workdir, exist_ok=True)
+            with open(os.path.join(workdir, RUN_FILES['error']), "w") as f:
                 f.write("%s\n" % str(e))
-            with open("_alt_traceback.txt", "w") as f:
+            with open(os.path.join(workdir, RUN_FILES['traceback']), "w") as f:
                 f.write("%s\n" % traceback.format_exc())
             raise
     return wrapper
@@ -32,6 +63,16 @@ def _create_nb_output_file_name(nb):
     return output_nb
 
 
+def _output_nb_path(nb, out_nb, workdir):
+    """
+    :param nb: str, path of the notebook
+    :param out_nb: str, path of the output notebook (None for <name>-output.ipynb), relative to workdir
+    :param workdir: str, absolute path of the working directory
+    :return: str, absolute path of the output notebook
+    """
+    return os.path.join(workdir, out_nb or _create_nb_output_file_name(nb))
+
+
 def _read_context(ctx_file):
     """
     reads _context.json file and returns dictionary arguments
@@ -43,34 +84,261 @@ def _read_context(ctx_file):
         return ctx
 
 
-def _build_notebook_params(nb, ctx):
-    nb_params = papermill.inspect_notebook(nb)
+def _params_manifest_entry(entry):
+    """
+    :param entry: str or Dict[str, <any>], parameter of a params manifest (see _read_params_file)
+    :return: Parameter
+    """
+    if not isinstance(entry, dict):
+        return Parameter(entry)
+    if 'inferred_type_name' in entry:
+        return Parameter.from_dict(entry)
+    if 'type' in entry:  # hysds-io, enums carry their values
+        default = repr(entry['enumerables']) if entry.get('enumerables') is not None else ''
+        type_name = 'num' if entry['type'] == NUMBER else entry['type']  # the other hysds-io types map to themselves
+        return Parameter(entry['name'], inferred_type_name=type_name, default=default,
+                         help=entry.get('description') or '')
+    return Parameter(entry['name'])
+
+
+def _read_params_file(params_file):
+    """
+    reads the notebook's parameters from a precomputed manifest, either:
+        the generated hysds-io json, ie. docker/hysds-io.json.<name>: {"params": [{"name": ..., "type": ...}, ...]}
+        a list of parameters as inspected (Parameter.to_dict), written by execute-batch
+        the generated job-spec json, ie. docker/job-spec.json.<name>: {"params": [{"name": ...}, ...]}
+        a sidecar json list of parameter names: ["a", "b", ...]
+    the values of _context.json are validated against the types of the first two, the others are untyped
+    :param params_file: str, location of the manifest
+    :return: Dict[str, Parameter]
+    """
+    with open(params_file, 'r') as f:
+        manifest = json.load(f)
+
+    if isinstance(manifest, dict):
+        manifest = manifest.get('params')
+    if not isinstance(manifest, list):
+        raise RuntimeError("%s is not a hysds-io, a job-spec or a list of parameter names" % params_file)
+    parameters = OrderedDict()
+    for entry in manifest:
+        parameter = _params_manifest_entry(entry)
+        parameters[parameter.name] = parameter
+    return parameters
 
-    params = {}
-    for k, p in nb_params.items():
-        if k.startswith('hysds_') or k.startswith('_'):
-            continue
-        if ctx.get(k) is not None:  # if key is found in _context.json then populate params dict with value
-            params[k] = ctx[k]
-    return params
+
+def _time_budget(ctx):
+    """
+    wall clock budget of the notebook, HySDS sends SIGTERM at soft_time_limit and kills the job at time_limit
+    :param ctx: Dict[str, <any>], _context.json
+    :return: int, seconds (None if the job has no time limit)
+    """
+    return ctx.get('soft_time_limit') or ctx.get('time_limit')
+
+
+def _build_notebook_params(nb, ctx, parameters=None):
+    """
+    filters _context.json down to the notebook's parameters, validated and coerced to their hysds-io type
+    (raises ContextValidationError before any kernel is started)
+    :param nb: str, path of the notebook
+    :param ctx: Dict[str, <any>], _context.json
+    :param parameters: Dict[str, Parameter], (optional) precomputed parameters (see _read_params_file), skips the
+                       notebook inspection if supplied
+    :return: Dict[str, <any>]
+    """
+    spec = inspect(nb).spec if parameters is None else NotebookSpec(nb, parameters)
+    return spec.validate_context(ctx)
+
+
+def _build_observers(nb, out_nb, params, workdir, output_limits=None, limits=None, resume=False, cell_cache=True):
+    """
+    the observers of an execution, shared by execute and the kernel pool daemon, their files are written in workdir
+    (see RUN_FILES):
+        per cell timing, memory and output size, written to _pge_metrics.jsonl (+ _pge_metrics.json summary)
+        time, memory and cpu budgets, resource samples are written to _pge_resources.jsonl
+        checkpoints, only if the notebook has cells tagged "checkpoint" (or resumes)
+        the cell cache and the output limits, if enabled
+    :param nb: str, path of the notebook
+    :param out_nb: str, path of the output notebook
+    :param params: Dict[str, <any>], notebook parameters
+    :param workdir: str, working directory of the execution
+    :param output_limits: Dict[str, <any>], (optional) OutputLimiter keyword arguments
+    :param limits: Dict[str, <any>], (optional) ExecutionWatchdog keyword arguments
+    :param resume: bool, resume from the last checkpoint
+    :param cell_cache: bool, restore the cells tagged "cache" from the cell cache
+    :return: (List[CellObserver], ExecutionWatchdog), the observers and the watchdog (one of them)
+    """
+    watchdog = ExecutionWatchdog(samples_file=os.path.join(workdir, RUN_FILES['resources']),
+                                 error_file=os.path.join(workdir, RUN_FILES['error']), **(limits or {}))
+    observers = [CellMetricsRecorder(nb_path=nb, metrics_file=os.path.join(workdir, RUN_FILES['metrics']),
+                                     summary_file=os.path.join(workdir, RUN_FILES['metrics_summary'])),
+                 watchdog]
+    if resume or has_checkpoint_cells(nb):
+        observers.append(Checkpointer(nb, out_nb, params, resume=resume,
+                                      checkpoint_file=os.path.join(workdir, RUN_FILES['checkpoint']),
+                                      state_dir=os.path.join(workdir, '_pge_checkpoint')))
+    if cell_cache:
+        observers.append(CellCache())
+    if output_limits:
+        observers.append(OutputLimiter(out_nb, **output_limits))
+    return observers, watchdog
 
 
 @exec_wrapper
-def execute(nb, out_nb=None, ctx_file=None):
+def execute(nb, out_nb=None, ctx_file=None, params_file=None, daemon_socket=None, output_limits=None, compress=False,
+            limits=None, resume=False, in_process=False, cell_cache=True, workdir=None):
+    """
+    executes the notebook with the parameters found in _context.json
+    :param nb: str, path of the notebook
+    :param out_nb: str, (optional) path of the output notebook relative to workdir, defaults to <name>-output.ipynb
+    :param ctx_file: str, location of _context.json
+    :param params_file: str, (optional) hysds-io, job-spec or list of parameter names, skips the notebook
+                        inspection (see _read_params_file)
+    :param daemon_socket: str, (optional) unix socket of the kernel pool daemon to execute the notebook on,
+                          executes the notebook on a new kernel if the daemon isn't running
+    :param output_limits: Dict[str, <any>], (optional) OutputLimiter keyword arguments to shrink the cell outputs
+                          (max_output_bytes, stream_mode, max_stream_bytes, externalize_bytes)
+    :param compress: bool, gzip the output notebook (<name>-output.ipynb.gz)
+    :param limits: Dict[str, <any>], (optional) ExecutionWatchdog keyword arguments (cell_timeout, max_rss, max_cpu),
+                   the notebook's wall clock budget is soft_time_limit (or time_limit) from _context.json
+    :param resume: bool, resume from the last cell tagged "checkpoint" completed by a previous execution with the same
+                   notebook and _context.json
+    :param in_process: bool, execute the cells in this process instead of a kernel (pure python notebooks only, see
+                       InProcessNotebookClient), the kernel pool daemon isn't used, nor the limits max_rss and max_cpu
+    :param cell_cache: bool, restore the cells tagged "cache" from the cell cache when their inputs are unchanged (see
+                       CellCache), False executes them (and doesn't cache them)
+    :param workdir: str, (optional) working directory of the kernel, where the output notebook, _alt_* and _pge_*
+                    files are written, defaults to the current directory (which isn't changed, so executions with
+                    their own workdir can run concurrently in one process), not supported in_process
+    """
     if ctx_file is None:
         raise RuntimeError("ctx_file must be supplied")
+    workdir = os.path.abspath(workdir or os.getcwd())
+    if in_process and workdir != os.getcwd():
+        raise RuntimeError("in-process execution runs in the current directory, workdir isn't supported")
+    if in_process and any((limits or {}).get(limit) is not None for limit in ('max_rss', 'max_cpu')):
+        raise RuntimeError("in-process execution runs in this process, the memory and cpu limits aren't supported")
+    os.makedirs(workdir, exist_ok=True)
 
     ctx = _read_context(ctx_file)
-    params = _build_notebook_params(nb, ctx)
-    time_limit = ctx.get('soft_time_limit', 3600)
+    parameters = _read_params_file(params_file) if params_file else None
+    params = _build_notebook_params(nb, ctx, parameters=parameters)
+    limits = dict(limits or {}, total_timeout=_time_budget(ctx))
+    out_nb = _output_nb_path(nb, out_nb, workdir)
 
-    f_info = open('_alt_info.txt', 'w')
+    if daemon_socket and not in_process:
+        if os.path.exists(daemon_socket):
+            from notebook_pge_wrapper.kernel_pool import submit
+            submit(daemon_socket, nb, out_nb, params, cwd=workdir, output_limits=output_limits, compress=compress,
+                   limits=limits, resume=resume, cell_cache=cell_cache)
+            return
+        logging.warning('kernel pool daemon not found at %s, starting a new kernel' % daemon_socket)
+
+    observers, watchdog = _build_observers(nb, out_nb, params, workdir, output_limits=output_limits, limits=limits,
+                                           resume=resume, cell_cache=cell_cache)
+
+    try:
+        # the kernel is started in workdir (nbclient's resources path), papermill's cwd would chdir the whole process
+        with open(os.path.join(workdir, RUN_FILES['info']), 'w') as f_info:
+            papermill.execute_notebook(nb, out_nb, parameters=params, log_output=True, stdout_file=f_info,
+                                       engine_name=IN_PROCESS_ENGINE if in_process else PGE_ENGINE,
+                                       observers=observers, resources={'metadata': {'path': workdir}})
+    except Exception as e:
+        watchdog.raise_for_breach(e)
+        raise
+    finally:
+        if compress and os.path.isfile(out_nb):  # the output notebook is also written when the notebook fails
+            compress_notebook(out_nb)
+
+
+class ExecutionResult(object):
+    """
+    Outcome of execute_async, failures are reported here instead of raised
+    """
+    __slots__ = ('nb', 'workdir', 'output_nb', 'status', 'error', 'started', 'finished')
+
+    def __init__(self, nb, workdir, output_nb):
+        """
+        :param nb: str, path of the notebook
+        :param workdir: str, absolute path of the working directory of the execution
+        :param output_nb: str, absolute path of the output notebook
+        """
+        self.nb = nb
+        self.workdir = workdir
+        self.output_nb = output_nb
+        self.status = 'running'  # then succeeded or failed
+        self.error = None  # '<exception type>: <message>' if the execution failed
+        self.started = time.time()
+        self.finished = None
+
+    @property
+    def duration(self):
+        """
+        :return: float, seconds (None while running)
+        """
+        return None if self.finished is None else self.finished - self.started
+
+    @property
+    def paths(self):
+        """
+        the files written by the execution, the output notebook (output_nb, or its .gz if compressed) and RUN_FILES
+        :return: Dict[str, str], name -> absolute path, only the files that exist
+        """
+        candidates = [('output_nb', self.output_nb), ('output_nb', self.output_nb + '.gz')]
+        candidates += [(name, os.path.join(self.workdir, f)) for name, f in RUN_FILES.items()]
+        return {name: path for name, path in candidates if os.path.isfile(path)}
+
+    def to_dict(self):
+        """
+        :return: Dict[str, <any>]
+        """
+        return {
+            'notebook': self.nb,
+            'status': self.status,
+            'started': self.started,
+            'finished': self.finished,
+            'duration': self.duration,
+            'workdir': self.workdir,
+            'error': self.error,
+            'paths': self.paths,
+        }
+
+    def __repr__(self):
+        return '%s(%r, %r, %r)' % (self.__class__.__name__, self.nb, self.status, self.workdir)
+
+
+async def execute_async(nb, ctx, workdir=None, **kwargs):
+    """
+    executes the notebook without blocking the event loop, every execution runs in its own working directory so any
+    number of them can be awaited concurrently (ie. with asyncio.gather)
+    the execution runs in a thread of the loop's default executor, cancelling the task doesn't stop it
+    :param nb: str, path of the notebook
+    :param ctx: str or Dict[str, <any>], location of _context.json, or the context itself (written to
+                <workdir>/_context.json)
+    :param workdir: str, (optional) working directory of the execution, defaults to a new temporary directory
+    :param kwargs: other arguments of execute (ie. out_nb, limits, compress), in_process isn't supported
+    :return: ExecutionResult
+    """
+    workdir = os.path.abspath(workdir or tempfile.mkdtemp(prefix='pge-run-'))
+    os.makedirs(workdir, exist_ok=True)
+    result = ExecutionResult(nb, workdir, _output_nb_path(nb, kwargs.get('out_nb'), workdir))
 
-    if out_nb is None:
-        out_nb = _create_nb_output_file_name(nb)
+    if isinstance(ctx, dict):
+        ctx_file = os.path.join(workdir, __CONTEXT_FILE)
+        with open(ctx_file, 'w') as f:
+            json.dump(ctx, f, indent=2)
+    else:
+        ctx_file = os.path.abspath(ctx)
 
-    papermill.execute_notebook(nb, out_nb, parameters=params, log_output=True, stdout_file=f_info,
-                               start_timeout=time_limit)
+    loop = asyncio.get_running_loop()
+    try:
+        await loop.run_in_executor(None, functools.partial(execute, nb, ctx_file=ctx_file, workdir=workdir, **kwargs))
+        result.status = 'succeeded'
+    except (Exception, SystemExit) as e:  # _alt_error.txt and _alt_traceback.txt are in the workdir
+        result.status = 'failed'
+        result.error = '%s: %s' % (type(e).__name__, e)
+    finally:
+        result.finished = time.time()
+    return result
 
 
 if __name__ == '__main__':
@@ -0,0 +1,138 @@
+import json
+from collections import OrderedDict
+
+from notebook_pge_wrapper.cache import InspectionCache, cache_enabled
+from notebook_pge_wrapper.parameters import Parameter, parse_parameters
+from notebook_pge_wrapper.spec import NotebookSpec
+
+try:
+    import ijson  # optional, streams the notebook instead of loading it (and its outputs) in memory
+except ImportError:
+    ijson = None
+
+
+class NotebookInspection(object):
+    """
+    Parameters of a notebook, parsed once and shared across the spec generators and execution
+        params: Dict[str, Dict[str, str]], same format as papermill.inspect_notebook
+        parameters: Dict[str, Parameter], the same parameters as objects, evaluating their defaults
+        spec: NotebookSpec, the user parameters and hysds specs
+    """
+    def __init__(self, nb_path):
+        """
+        :param nb_path: str, path + notebook name
+        """
+        self.nb_path = nb_path
+        self._params = None  # built on first use, most callers only need the parameters
+        if cache_enabled():
+            params = InspectionCache().get_or_inspect(nb_path, _inspect_notebook)
+            self.parameters = OrderedDict((k, Parameter.from_dict(p)) for k, p in params.items())
+        else:
+            self.parameters = parse_parameters(read_parameters_cell(nb_path))
+        self._spec = None
+
+    @property
+    def params(self):
+        """
+        :return: Dict[str, Dict[str, str]], same format as papermill.inspect_notebook
+        """
+        if self._params is None:
+            self._params = {k: p.to_dict() for k, p in self.parameters.items()}
+        return self._params
+
+    @property
+    def spec(self):
+        """
+        :return: NotebookSpec, built on first use
+        """
+        if self._spec is None:
+            self._spec = NotebookSpec(self.nb_path, self.parameters)
+        return self._spec
+
+    def __repr__(self):
+        return '%s(%r)' % (self.__class__.__name__, self.nb_path)
+
+
+def inspect(nb):
+    """
+    returns the inspection of a notebook, parsing it only if needed
+    :param nb: str (path + notebook name) or NotebookInspection
+    :return: NotebookInspection
+    """
+    if isinstance(nb, NotebookInspection):
+        return nb
+    return NotebookInspection(nb)
+
+
+def inspect_parameters_cell(source):
+    """
+    infers the parameters of a (python) parameters cell, same output as papermill.inspect_notebook
+    :param source: str, source of the cell tagged "parameters"
+    :return: Dict[str, Dict[str, str]], keys: name, default, inferred_type_name, help
+    """
+    return {k: p.to_dict() for k, p in parse_parameters(source).items()}
+
+
+def _inspect_notebook(nb_path):
+    """
+    :return: Dict[str, Dict[str, <any>]], the parameters as cached, papermill's keys plus the line of the parameter
+    """
+    parameters = parse_parameters(read_parameters_cell(nb_path))
+    return {k: dict(p.to_dict(), lineno=p.lineno) for k, p in parameters.items()}
+
+
+def _join_source(source):
+    return ''.join(source) if isinstance(source, list) else source
+
+
+def _stream_parameters_cell(f):
+    """
+    scans the notebook's cells with ijson, stopping at the first cell tagged "parameters"
+    only the tags and source of each cell are kept, the outputs before it are still tokenized by the parser but never
+    held in memory
+    :param f: file object (binary)
+    :return: str or None
+    """
+    tags = []
+    source = []
+    for prefix, event, value in ijson.parse(f):
+        if prefix == 'cells.item' and event == 'start_map':
+            tags = []
+            source = []
+        elif prefix == 'cells.item.metadata.tags.item':
+            tags.append(value)
+        elif prefix in ('cells.item.source', 'cells.item.source.item') and event == 'string':
+            source.append(value)
+        elif prefix == 'cells.item' and event == 'end_map':
+            if 'parameters' in tags:
+                return ''.join(source)
+        elif prefix == 'cells' and event == 'end_array':
+            break
+    return None
+
+
+def _load_parameters_cell(f):
+    """
+    loads the whole notebook, used when ijson is not installed
+    :param f: file object (binary)
+    :return: str or None
+    """
+    nb = json.load(f)
+    for cell in nb.get('cells', []):
+        if 'parameters' in cell.get('metadata', {}).get('tags', []):
+            return _join_source(cell.get('source', ''))
+    return None
+
+
+def read_parameters_cell(nb_path):
+    """
+    reads the source of the cell tagged "parameters" in the notebook
+    :param nb_path: str, path + notebook name
+    :return: str, cell source (empty string if the notebook has no parameters cell)
+    """
+    with open(nb_path, 'rb') as f:
+        if ijson is not None:
+            source = _stream_parameters_cell(f)
+        else:
+            source = _load_parameters_cell(f)
+    return source or ''
@@ -0,0 +1,308 @@
+import os
+import json
+import queue
+import socket
+import logging
+import traceback
+import socketserver
+from concurrent.futures import ThreadPoolExecutor
+
+from jupyter_client import KernelManager
+
+
+logger = logging.getLogger(__name__)
+
+_DEFAULT_KERNEL = 'python3'
+_DEFAULT_MAX_REUSE = 20
+_HEALTH_CHECK_TIMEOUT = 10
+
+
+def _default_socket():
+    return os.path.join(os.environ.get('XDG_RUNTIME_DIR') or '/tmp', 'notebook-pge-wrapper.sock')
+
+
+DEFAULT_SOCKET = _default_socket()
+
+
+class PooledKernel(object):
+    """
+    A running kernel of the pool
+    """
+    def __init__(self, kernel_name, preload, startup_timeout):
+        self.preload = preload
+        self.uses = 0
+        self.km = KernelManager(kernel_name=kernel_name)
+        self.km.start_kernel()
+        try:
+            self.run(self._preload_code(), timeout=startup_timeout)
+        except Exception:
+            self.shutdown()
+            raise
+
+    @property
+    def pid(self):
+        provisioner = getattr(self.km, 'provisioner', None)
+        process = getattr(provisioner, 'process', None)
+        return getattr(process, 'pid', None)
+
+    def _preload_code(self):
+        return '\n'.join('import %s' % module for module in self.preload)
+
+    def run(self, code, timeout=None):
+        """
+        executes code in the kernel, raising if it fails
+        :param code: str
+        :param timeout: int, seconds
+        """
+        # a new client for every call, the event loop the client is bound to doesn't outlive a papermill execution
+        kc = self.km.client()
+        kc.start_channels()
+        try:
+            kc.wait_for_ready(timeout=timeout)
+            reply = kc.execute_interactive(code or 'pass', store_history=False, timeout=timeout,
+                                           output_hook=lambda msg: None)
+        finally:
+            kc.stop_channels()
+        content = reply['content']
+        if content['status'] != 'ok':
+            raise RuntimeError('%s: %s' % (content.get('ename'), content.get('evalue')))
+
+    def is_healthy(self):
+        try:
+            if not self.km.is_alive():
+                return False
+            self.run('pass', timeout=_HEALTH_CHECK_TIMEOUT)
+            return True
+        except Exception as e:
+            logger.warning('kernel %s failed its health check: %r' % (self.pid, e))
+            return False
+
+    def prepare(self, cwd):
+        """
+        resets the kernel's namespace from the previous job and moves it to the job's working directory
+        :param cwd: str
+        """
+        self.run('\n'.join([
+            "get_ipython().run_line_magic('reset', '-f')",
+            "import os as _pge_os; _pge_os.chdir(%r); del _pge_os" % cwd,
+            self._preload_code(),  # modules are still loaded, only their names need to be re-bound
+        ]), timeout=_HEALTH_CHECK_TIMEOUT)
+
+    def shutdown(self):
+        try:
+            self.km.shutdown_kernel(now=True)
+        except Exception as e:
+            logger.warning('unable to shutdown kernel %s: %s' % (self.pid, e))
+
+
+class KernelPool(object):
+    """
+    Pool of pre-warmed kernels
+    kernels are reset between jobs, health checked before each job and recycled after max_reuse jobs
+    """
+    def __init__(self, size=1, kernel_name=_DEFAULT_KERNEL, preload=None, max_reuse=_DEFAULT_MAX_REUSE,
+                 startup_timeout=60):
+        """
+        :param size: int, number of kernels
+        :param kernel_name: str
+        :param preload: List[str], modules imported in every kernel when it starts
+        :param max_reuse: int, number of jobs a kernel runs before it's replaced by a new one
+        :param startup_timeout: int, seconds to wait for a kernel to start
+        """
+        if size < 1:
+            raise RuntimeError("the kernel pool needs at least 1 kernel")
+        self.size = size
+        self.kernel_name = kernel_name
+        self.preload = list(preload or [])
+        self.max_reuse = max_reuse
+        self.startup_timeout = startup_timeout
+        self._kernels = queue.Queue()
+
+    def _start_kernel(self):
+        kernel = PooledKernel(self.kernel_name, self.preload, self.startup_timeout)
+        logger.info('started kernel %s' % kernel.pid)
+        return kernel
+
+    def start(self):
+        for _ in range(self.size):
+            self._kernels.put(self._start_kernel())
+
+    def acquire(self, cwd, timeout=None):
+        """
+        waits for an idle kernel, replacing it if it's unhealthy
+        :param cwd: str, working directory of the job
+        :param timeout: int, seconds to wait for an idle kernel
+        :return: PooledKernel
+        """
+        kernel = self._kernels.get(timeout=timeout)
+        try:
+            if not kernel.is_healthy():
+                kernel.shutdown()
+                kernel = self._start_kernel()
+            kernel.prepare(cwd)
+        except Exception:
+            self._kernels.put(self._start_kernel())
+            raise
+        return kernel
+
+    def release(self, kernel):
+        """
+        hands the kernel back to the pool, recycling it if it reached max_reuse or died during the job
+        :param kernel: PooledKernel
+        """
+        kernel.uses += 1
+        if kernel.uses >= self.max_reuse or not kernel.km.is_alive():
+            logger.info('recycling kernel %s after %d job(s)' % (kernel.pid, kernel.uses))
+            kernel.shutdown()
+            kernel = self._start_kernel()
+        self._kernels.put(kernel)
+
+    def shutdown(self):
+        while True:
+            try:
+                self._kernels.get_nowait().shutdown()
+            except queue.Empty:
+                break
+
+
+def _run_job(kernel, request):
+    """
+    executes a notebook on a pooled kernel
+    :param kernel: PooledKernel, prepared for the job
+    :param request: Dict[str, <any>], keys: notebook, output, parameters, cwd, output_limits, compress, limits, resume,
+                    cell_cache
+    """
+    import papermill
+    from notebook_pge_wrapper.engines import PGE_ENGINE
+    from notebook_pge_wrapper.outputs import compress_notebook
+    from notebook_pge_wrapper.execute_notebook import RUN_FILES, _build_observers
+
+    cwd = request['cwd']
+    out_nb = request['output']
+    observers, watchdog = _build_observers(request['notebook'], out_nb, request['parameters'], cwd,
+                                           output_limits=request.get('output_limits'), limits=request.get('limits'),
+                                           resume=request.get('resume'), cell_cache=request.get('cell_cache', True))
+
+    try:
+        with open(os.path.join(cwd, RUN_FILES['info']), 'w') as f_info:
+            papermill.execute_notebook(request['notebook'], out_nb, parameters=request['parameters'],
+                                       log_output=True, stdout_file=f_info, km=kernel.km,
+                                       kernel_name=kernel.km.kernel_name, engine_name=PGE_ENGINE,
+                                       observers=observers)
+    except Exception as e:
+        watchdog.raise_for_breach(e)  # the killed kernel is replaced when it's released
+        raise
+    finally:
+        if request.get('compress') and os.path.isfile(out_nb):
+            compress_notebook(out_nb)
+
+
+class _JobHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        pool = self.server.pool
+        kernel = None
+        try:
+            request = json.loads(self.rfile.readline().decode('utf-8'))
+            kernel = pool.acquire(request['cwd'])
+            _run_job(kernel, request)
+            response = {'status': 'ok'}
+        except Exception as e:
+            logger.error(traceback.format_exc())
+            response = {'status': 'error', 'error': str(e), 'traceback': traceback.format_exc()}
+
+        # responding before handing the kernel back, recycling it shouldn't delay the job
+        self.wfile.write((json.dumps(response) + '\n').encode('utf-8'))
+        if kernel is not None:
+            pool.release(kernel)
+
+
+class KernelPoolServer(socketserver.UnixStreamServer):
+    """
+    serves the jobs on a fixed set of threads, one per kernel: every thread executing notebooks keeps an event loop
+    (and jupyter_core a task runner thread), a new thread per job would leak them
+    """
+    def __init__(self, socket_path, pool):
+        """
+        :param socket_path: str, location of the unix socket
+        :param pool: KernelPool, started
+        """
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        self.pool = pool
+        self._executor = ThreadPoolExecutor(max_workers=pool.size, thread_name_prefix='pge-job')
+        super().__init__(socket_path, _JobHandler)
+
+    def process_request(self, request, client_address):
+        self._executor.submit(self._process_request, request, client_address)
+
+    def _process_request(self, request, client_address):
+        # same as socketserver.ThreadingMixIn.process_request_thread
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def server_close(self):
+        super().server_close()
+        self._executor.shutdown(wait=False)
+        if os.path.exists(self.server_address):
+            os.remove(self.server_address)
+
+
+def serve(socket_path=DEFAULT_SOCKET, **pool_kwargs):
+    """
+    starts the kernel pool and serves jobs on the unix socket until interrupted
+    :param socket_path: str
+    :param pool_kwargs: see KernelPool
+    """
+    pool = KernelPool(**pool_kwargs)
+    pool.start()
+    server = KernelPoolServer(socket_path, pool)
+    logger.info('serving %d kernel(s) on %s' % (pool.size, socket_path))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        pool.shutdown()
+
+
+def submit(socket_path, nb, out_nb, params, cwd=None, output_limits=None, compress=False, limits=None,
+           resume=False, cell_cache=True):
+    """
+    hands a notebook execution to the kernel pool daemon and waits for it to complete
+    :param socket_path: str, location of the daemon's unix socket
+    :param nb: str, path of the notebook
+    :param out_nb: str, path of the output notebook
+    :param params: Dict[str, <any>], notebook parameters
+    :param cwd: str, working directory of the job (defaults to the current directory)
+    :param output_limits: Dict[str, <any>], (optional) OutputLimiter keyword arguments
+    :param compress: bool, gzip the output notebook
+    :param limits: Dict[str, <any>], (optional) ExecutionWatchdog keyword arguments
+    :param resume: bool, resume from the last checkpoint of a previous execution
+    :param cell_cache: bool, restore the cells tagged "cache" from the cell cache
+    """
+    cwd = os.path.abspath(cwd or os.getcwd())
+    request = {
+        'notebook': os.path.abspath(nb),
+        'output': os.path.join(cwd, out_nb),
+        'parameters': params,
+        'cwd': cwd,
+        'output_limits': output_limits,
+        'compress': compress,
+        'limits': limits,
+        'resume': resume,
+        'cell_cache': cell_cache,
+    }
+
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+        s.connect(socket_path)
+        s.sendall((json.dumps(request) + '\n').encode('utf-8'))
+        response = json.loads(s.makefile('r').readline())
+
+    if response['status'] != 'ok':
+        raise RuntimeError('notebook execution failed in the kernel pool: %s\n%s' %
+                           (response['error'], response.get('traceback', '')))
@@ -0,0 +1,137 @@
+import json
+import time
+from datetime import datetime, timezone
+
+from notebook_pge_wrapper.engines import CellObserver
+
+
+_SLOWEST_CELLS = 5
+
+
+def process_memory(pid):
+    """
+    reads the current and peak resident memory of a process from /proc (linux only)
+    :param pid: int
+    :return: (int, int), rss and peak rss in bytes, (None, None) if unavailable
+    """
+    rss, peak_rss = None, None
+    try:
+        with open('/proc/%d/status' % pid, 'r') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    rss = int(line.split()[1]) * 1024
+                elif line.startswith('VmHWM:'):
+                    peak_rss = int(line.split()[1]) * 1024
+    except (OSError, TypeError, ValueError):
+        pass
+    return rss, peak_rss
+
+
+def reset_peak_memory(pid):
+    """
+    resets the peak resident memory (VmHWM) of a process to its current rss by writing 5 to /proc/<pid>/clear_refs
+    (linux >= 4.0, same user as the process)
+    :param pid: int
+    :return: bool, False if it couldn't be reset
+    """
+    try:
+        with open('/proc/%d/clear_refs' % pid, 'w') as f:
+            f.write('5')
+    except (OSError, TypeError):
+        return False
+    return True
+
+
+def _isoformat(t):
+    return datetime.fromtimestamp(t, tz=timezone.utc).isoformat()
+
+
+class CellMetricsRecorder(CellObserver):
+    """
+    Records the timing, memory and output size of every executed cell
+    each cell is appended to a JSON lines file as soon as it completes, a summary is written once the notebook is done
+    the kernel's peak rss is reset when a cell starts, so the peak_rss of a cell is its own (None if it can't be reset)
+    """
+    def __init__(self, nb_path=None, metrics_file='_pge_metrics.jsonl', summary_file='_pge_metrics.json'):
+        """
+        :param nb_path: str, path of the executed notebook (reported in the summary)
+        :param metrics_file: str, JSON lines file with one record per executed cell
+        :param summary_file: str, summary of the execution
+        """
+        self.nb_path = nb_path
+        self.metrics_file = metrics_file
+        self.summary_file = summary_file
+        self.cells = []
+        self.start = None
+        self._f = None
+        self._cell_start = None
+        self._peak_reset = False
+        self._peak_rss = None  # of the whole execution
+
+    def notebook_start(self, client):
+        self.start = time.time()
+        self._f = open(self.metrics_file, 'w')
+
+    def cell_start(self, client, cell, index):
+        if cell.cell_type == 'code':
+            self._record_peak(client)  # of the cells run before, ie. skipped or cached
+            self._peak_reset = reset_peak_memory(client.kernel_pid)
+        self._cell_start = time.time()
+
+    def _record_peak(self, client):
+        """
+        :return: (int, int), current and peak rss of the kernel, since the start of the cell if it was reset
+        """
+        rss, peak_rss = process_memory(client.kernel_pid)
+        if peak_rss is not None:
+            self._peak_rss = max(self._peak_rss or 0, peak_rss)
+        return rss, peak_rss
+
+    def cell_complete(self, client, cell, index):
+        if cell.cell_type != 'code' or self._cell_start is None:
+            return
+        end = time.time()
+        rss, peak_rss = self._record_peak(client)
+        if not self._peak_reset:
+            peak_rss = None  # the peak of the kernel's whole life, not of the cell
+        status = 'ok'
+        if any(output.get('output_type') == 'error' for output in cell.get('outputs', [])):
+            status = 'error'
+
+        record = {
+            'index': index,
+            'tags': list(cell.metadata.get('tags', [])),
+            'status': status,
+            'start': _isoformat(self._cell_start),
+            'end': _isoformat(end),
+            'duration': end - self._cell_start,
+            'rss': rss,
+            'peak_rss': peak_rss,
+            'output_size': len(json.dumps(cell.get('outputs', []))),
+        }
+        self._cell_start = None
+        self.cells.append(record)
+        self._f.write(json.dumps(record) + '\n')
+        self._f.flush()
+
+    def notebook_complete(self, client):
+        if self._f is None:
+            return
+        self._f.close()
+        self._f = None
+
+        end = time.time()
+        slowest = sorted(self.cells, key=lambda c: c['duration'], reverse=True)[:_SLOWEST_CELLS]
+        summary = {
+            'notebook': self.nb_path,
+            'start': _isoformat(self.start),
+            'end': _isoformat(end),
+            'duration': end - self.start,
+            'executed_cells': len(self.cells),
+            'failed_cells': [c['index'] for c in self.cells if c['status'] == 'error'],
+            'peak_rss': self._peak_rss,
+            'output_size': sum(c['output_size'] for c in self.cells),
+            'slowest_cells': [{'index': c['index'], 'tags': c['tags'], 'duration': c['duration']} for c in slowest],
+        }
+        with open(self.summary_file, 'w') as f:
+            json.dump(summary, f, indent=2)
@@ -0,0 +1,140 @@
+import os
+import gzip
+import json
+import base64
+import shutil
+
+from nbformat.v4 import new_output
+
+from notebook_pge_wrapper.engines import CellObserver
+
+
+STREAM_KEEP = 'keep'
+STREAM_TRUNCATE = 'truncate'
+STREAM_DROP = 'drop'
+STREAM_MODES = (STREAM_KEEP, STREAM_TRUNCATE, STREAM_DROP)
+
+_BINARY_EXTENSIONS = {
+    'image/png': 'png',
+    'image/jpeg': 'jpg',
+    'image/gif': 'gif',
+    'image/bmp': 'bmp',
+    'image/tiff': 'tiff',
+    'application/pdf': 'pdf',
+}
+
+
+def _text(value):
+    return ''.join(value) if isinstance(value, list) else value
+
+
+class OutputLimiter(CellObserver):
+    """
+    Shrinks the outputs of every executed cell before it's written to the output notebook:
+        stream outputs (stdout/stderr) are kept, truncated (keeping their tail) or dropped
+        binary outputs (images, pdf) larger than externalize_bytes are moved to sidecar files referenced by the notebook
+        outputs past max_output_bytes per cell are removed, except the errors
+    """
+    def __init__(self, out_nb, max_output_bytes=None, stream_mode=STREAM_KEEP, max_stream_bytes=10000,
+                 externalize_bytes=None):
+        """
+        :param out_nb: str, path of the output notebook, sidecar files are written to <out_nb root>_files/
+        :param max_output_bytes: int, (optional) maximum size of the outputs of a cell
+        :param stream_mode: str, keep, truncate or drop the stream outputs
+        :param max_stream_bytes: int, size of a stream output kept when truncating
+        :param externalize_bytes: int, (optional) size above which binary outputs are moved to sidecar files
+        """
+        if stream_mode not in STREAM_MODES:
+            raise RuntimeError("stream_mode must be one of %s" % ', '.join(STREAM_MODES))
+        self.out_nb = out_nb
+        self.max_output_bytes = max_output_bytes
+        self.stream_mode = stream_mode
+        self.max_stream_bytes = max_stream_bytes
+        self.externalize_bytes = externalize_bytes
+
+        out_dir, out_name = os.path.split(out_nb)
+        self.sidecar_name = '%s_files' % out_name.split('.')[0]
+        self.sidecar_dir = os.path.join(out_dir, self.sidecar_name)
+
+    def _limit_stream(self, output):
+        if self.stream_mode == STREAM_DROP:
+            return None
+        text = _text(output.get('text', ''))
+        if self.stream_mode == STREAM_TRUNCATE and len(text) > self.max_stream_bytes:
+            dropped = len(text) - self.max_stream_bytes
+            output['text'] = '[... %d characters truncated ...]\n%s' % (dropped, text[-self.max_stream_bytes:])
+        return output
+
+    def _externalize(self, output, cell_index, output_index):
+        data = output.get('data', {})
+        for mime, ext in _BINARY_EXTENSIONS.items():
+            value = data.get(mime)
+            if value is None:
+                continue
+            value = base64.b64decode(_text(value))
+            if len(value) <= self.externalize_bytes:  # the decoded size, the notebook stores a third more
+                continue
+
+            os.makedirs(self.sidecar_dir, exist_ok=True)
+            file_name = 'cell%d_output%d.%s' % (cell_index, output_index, ext)
+            with open(os.path.join(self.sidecar_dir, file_name), 'wb') as f:
+                f.write(value)
+
+            reference = '%s/%s' % (self.sidecar_name, file_name)
+            del data[mime]
+            if mime.startswith('image/'):
+                data['text/markdown'] = '![%s](%s)' % (file_name, reference)
+            data['text/plain'] = '<%s moved to %s>' % (mime, reference)
+        return output
+
+    def _limit_size(self, outputs):
+        """
+        removes the outputs past max_output_bytes, the error outputs are always kept (and don't count), the error and
+        traceback of a failed cell are what _alt_error.txt and _alt_traceback.txt are written from
+        """
+        limited, size, removed = [], 0, 0
+        for output in outputs:
+            if output.get('output_type') != 'error':
+                size += len(json.dumps(output))
+                if size > self.max_output_bytes:
+                    if not removed:  # where the outputs were removed
+                        limited.append(None)
+                    removed += 1
+                    continue
+            limited.append(output)
+        if not removed:
+            return limited
+        note = new_output('stream', name='stderr',
+                          text='[%d output(s) removed, the cell exceeded %d bytes of outputs]\n' %
+                               (removed, self.max_output_bytes))
+        return [note if output is None else output for output in limited]
+
+    def cell_complete(self, client, cell, index):
+        if cell.cell_type != 'code' or not cell.get('outputs'):
+            return
+
+        outputs = []
+        for i, output in enumerate(cell.outputs):
+            if output.get('output_type') == 'stream':
+                output = self._limit_stream(output)
+            elif self.externalize_bytes is not None and 'data' in output:
+                output = self._externalize(output, index, i)
+            if output is not None:
+                outputs.append(output)
+
+        if self.max_output_bytes is not None:
+            outputs = self._limit_size(outputs)
+        cell.outputs = outputs
+
+
+def compress_notebook(nb_path):
+    """
+    gzips the notebook (<nb_path>.gz) and removes the uncompressed one
+    :param nb_path: str
+    :return: str, path of the compressed notebook
+    """
+    gz_path = nb_path + '.gz'
+    with open(nb_path, 'rb') as fin, gzip.open(gz_path, 'wb') as fout:
+        shutil.copyfileobj(fin, fout)
+    os.remove(nb_path)
+    return gz_path
@@ -0,0 +1,258 @@
+import re
+import ast
+import keyword
+from collections import OrderedDict
+
+
+_COMMENT_RE = re.compile(r'^#\s*(type:\s*(?P<type_comment>[^\s]*)\s*)?(?P<help>.*)$')
+
+# a literal: number, string (without escapes), True, False, None
+_LITERAL = rb"""(?:[-+]?(?:\d+\.\d*|\.\d+|0|[1-9]\d*)(?:[eE][-+]?\d+)?|'[^'\\\n]*'|"[^"\\\n]*"|True|False|None)"""
+_LITERALS = rb'(?:%s(?:\s*,\s*%s)*\s*,?)?' % (_LITERAL, _LITERAL)
+_TUPLE_ITEMS = rb'(?:%s\s*,(?:\s*%s)?)?' % (_LITERAL, _LITERALS)  # (1) isn't a tuple, ast reads it as 1
+_ITEMS = rb'(?:%s\s*:\s*%s(?:\s*,\s*%s\s*:\s*%s)*\s*,?)?' % (_LITERAL, _LITERAL, _LITERAL, _LITERAL)
+# a whole line assigning a literal, or a flat list, tuple or dict of literals, to a name (a: int = 1  # help)
+_SIMPLE_ASSIGNMENT_RE = re.compile(
+    rb'(?P<name>[A-Za-z_]\w*)\s*'
+    rb"""(?::\s*(?P<annotation>[A-Za-z_]\w*(?:\.[A-Za-z_]\w*)*|'[^'\\\n]*'|"[^"\\\n]*")\s*)?"""
+    rb'=\s*(?P<default>%s|\[\s*%s\s*\]|\(\s*%s\s*\)|\{\s*%s\s*\})\s*(?P<comment>#.*)?' % (
+        _LITERAL, _LITERALS, _TUPLE_ITEMS, _ITEMS))
+_SPEC_PREFIXES = ('hysds_', '_')
+
+
+class ParameterParseError(RuntimeError):
+    """
+    raised when the parameters cell (or one of its defaults) can't be parsed, lineno is the line in the cell
+    """
+    def __init__(self, message, lineno=None):
+        self.lineno = lineno
+        if lineno is not None:
+            message = 'parameters cell, line %d: %s' % (lineno, message)
+        super().__init__(message)
+
+
+class Parameter(object):
+    """
+    A parameter of the notebook, as assigned in its parameters cell
+    """
+    _NOT_EVALUATED = object()
+
+    def __init__(self, name, inferred_type_name='None', default='', help='', lineno=None):
+        """
+        :param name: str
+        :param inferred_type_name: str, annotation or type comment ('None' if untyped, same as papermill)
+        :param default: str, source of the default value
+        :param help: str, trailing comment
+        :param lineno: int, line of the assignment in the parameters cell
+        """
+        self.name = name
+        self.inferred_type_name = inferred_type_name
+        self.default = default
+        self.help = help
+        self.lineno = lineno
+        self._value = self._NOT_EVALUATED
+
+    @property
+    def type_name(self):
+        """
+        :return: str, annotation or type comment, None if untyped
+        """
+        return None if self.inferred_type_name == 'None' else self.inferred_type_name
+
+    @property
+    def value(self):
+        """
+        the default value, evaluated as a python literal
+        :return: <any>
+        """
+        if self._value is self._NOT_EVALUATED:
+            try:
+                self._value = ast.literal_eval(self.default)
+            except (ValueError, SyntaxError, TypeError, MemoryError, RecursionError):
+                raise ParameterParseError('default value of %s is not a literal: %s' % (self.name, self.default),
+                                          lineno=self.lineno) from None
+        return self._value
+
+    @property
+    def is_spec(self):
+        """
+        :return: bool, True for the hysds specs (parameters prefixed with '_' or 'hysds_')
+        """
+        return self.name.startswith(_SPEC_PREFIXES)
+
+    @property
+    def spec_key(self):
+        """
+        :return: str, name of the hysds spec without its prefix (ie. _time_limit -> time_limit)
+        """
+        for prefix in _SPEC_PREFIXES:
+            if self.name.startswith(prefix):
+                return self.name[len(prefix):]
+        return self.name
+
+    def to_dict(self):
+        """
+        :return: Dict[str, str], same keys as papermill.inspect_notebook (name, inferred_type_name, default, help)
+        """
+        return {
+            'name': self.name,
+            'inferred_type_name': self.inferred_type_name,
+            'default': self.default,
+            'help': self.help,
+        }
+
+    @classmethod
+    def from_dict(cls, param):
+        """
+        :param param: Dict[str, <any>], see to_dict, plus its (optional) lineno
+        :return: Parameter
+        """
+        return cls(param['name'], param['inferred_type_name'], param['default'], param['help'],
+                   lineno=param.get('lineno'))
+
+    def __repr__(self):
+        return '%s(%r, %r, %r)' % (self.__class__.__name__, self.name, self.inferred_type_name, self.default)
+
+
+def _trailing_comment(lines, node):
+    """
+    :param lines: List[bytes], lines of the source
+    :param node: ast.AST, a statement
+    :return: str, the comment following the statement on its last line (None if there's none)
+    """
+    rest = lines[node.end_lineno - 1][node.end_col_offset:].lstrip()
+    if rest.startswith(b'#'):
+        return rest.decode('utf-8').rstrip()
+    return None
+
+
+def _source_segment(lines, node):
+    """
+    same as ast.get_source_segment, which splits the whole source on every call (quadratic on large cells)
+    :param lines: List[bytes], lines of the source (utf-8, the col offsets are byte offsets)
+    :param node: ast.AST
+    :return: str
+    """
+    first, last = node.lineno - 1, node.end_lineno - 1
+    if first == last:
+        return lines[first][node.col_offset:node.end_col_offset].decode('utf-8')
+    segment = [lines[first][node.col_offset:]] + lines[first + 1:last] + [lines[last][:node.end_col_offset]]
+    return b'\n'.join(segment).decode('utf-8')
+
+
+def _annotation(lines, node):
+    if isinstance(node, ast.Constant) and isinstance(node.value, str):
+        return node.value  # g: "enum" = [...]
+    return _source_segment(lines, node)
+
+
+def _add_parameters(params, lines, first, last):
+    """
+    parses the statements of lines[first:last] with ast, adding their assignments to params
+    :param params: Dict[str, Parameter]
+    :param lines: List[bytes], lines of the source
+    :param first: int, index of the first line of the statements
+    :param last: int, index past their last line
+    """
+    tree = ast.parse(b'\n'.join(lines[first:last]))
+    if first:
+        ast.increment_lineno(tree, first)  # the linenos of the source, lines is indexed with them
+
+    for node in tree.body:
+        annotation = None
+        if isinstance(node, ast.Assign) and len(node.targets) == 1 and isinstance(node.targets[0], ast.Name):
+            target = node.targets[0]
+        elif isinstance(node, ast.AnnAssign) and node.value is not None and isinstance(node.target, ast.Name):
+            target = node.target
+            annotation = _annotation(lines, node.annotation)
+        else:
+            continue  # imports, unpacking, statements...
+
+        type_comment, help_text = None, ''
+        comment = _trailing_comment(lines, node)
+        if comment:
+            type_comment, help_text = _parse_comment(comment)
+
+        params[target.id] = Parameter(
+            name=target.id,
+            inferred_type_name=str(annotation or type_comment or None).strip(),
+            default=_source_segment(lines, node.value).strip(),
+            help=help_text,
+            lineno=node.lineno,
+        )
+
+
+def _parse_comment(comment):
+    """
+    :param comment: str, trailing comment of an assignment, ie. '# type: int' or '# input granules'
+    :return: (str, str), the type comment (None if there's none) and the help
+    """
+    match = _COMMENT_RE.match(comment)
+    return match.group('type_comment') or None, match.group('help').strip()
+
+
+def _simple_assignment(line):
+    """
+    :param line: bytes, a line of the source
+    :return: re.Match, None if the line isn't a whole assignment of a literal (see _SIMPLE_ASSIGNMENT_RE)
+    """
+    match = _SIMPLE_ASSIGNMENT_RE.fullmatch(line)
+    if match is None or keyword.iskeyword(match.group('name').decode('ascii')):
+        return None
+    annotation = match.group('annotation')
+    if annotation and any(keyword.iskeyword(part) for part in annotation.decode('ascii').split('.')):
+        return None
+    return match
+
+
+def parse_parameters(source):
+    """
+    parses the parameters cell, the parameters are the top level assignments to a single name
+    type comments (# type: int) and annotations (a: int = 1) are read as the parameter's type, any other trailing
+    comment as its help
+    lines assigning a literal (a = 1, b: str = "x", c = [1, 2]) are read with a regex, same as papermill, only the
+    other statements (imports, multi-line values, expressions...) are parsed with ast
+    :param source: str, source of the cell tagged "parameters"
+    :return: Dict[str, Parameter], in the order of the cell
+    """
+    lines = source.encode('utf-8').split(b'\n')
+
+    params = OrderedDict()
+    pending = None  # index of the first line of the statements not parsed yet
+    for i, line in enumerate(lines):
+        match = _simple_assignment(line)
+        if match is None:
+            if pending is None and line.strip() and not line.lstrip().startswith(b'#'):
+                pending = i
+            continue
+
+        if pending is not None:
+            try:
+                _add_parameters(params, lines, pending, i)
+            except SyntaxError:
+                continue  # the pending statement isn't complete, the line is part of it (ie. in a string)
+            pending = None
+
+        type_comment, help_text = None, ''
+        if match.group('comment'):
+            type_comment, help_text = _parse_comment(match.group('comment').decode('utf-8').rstrip())
+        annotation = match.group('annotation')
+        if annotation:
+            annotation = annotation.decode('utf-8')
+            if annotation[0] in '\'"':
+                annotation = annotation[1:-1]  # g: "enum" = [...]
+        name = match.group('name').decode('ascii')
+        params[name] = Parameter(
+            name=name,
+            inferred_type_name=str(annotation or type_comment or None).strip(),
+            default=match.group('default').decode('utf-8'),
+            help=help_text,
+            lineno=i + 1,
+        )
+
+    if pending is not None:
+        try:
+            _add_parameters(params, lines, pending, len(lines))
+        except SyntaxError as e:
+            raise ParameterParseError(e.msg, lineno=(e.lineno or 1) + pending) from None
+    return params
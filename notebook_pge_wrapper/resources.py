@@ -0,0 +1,184 @@
+import os
+import json
+import time
+import logging
+import threading
+
+from notebook_pge_wrapper.engines import CellObserver
+from notebook_pge_wrapper.metrics import process_memory
+
+try:
+    import resource
+except ImportError:  # not available on windows
+    resource = None
+
+
+_SIZE_UNITS = {
+    'B': 1,
+    'KB': 1024,
+    'MB': 1024 ** 2,
+    'GB': 1024 ** 3,
+    'TB': 1024 ** 4,
+}
+
+
+def parse_size(size):
+    """
+    parses a size with its unit, same format as _disk_usage (ie. 10GB)
+    :param size: str or int, (int is in bytes)
+    :return: int, bytes
+    """
+    if size is None or isinstance(size, int):
+        return size
+    value = size.strip().upper()
+    for unit in sorted(_SIZE_UNITS, key=len, reverse=True):
+        if value.endswith(unit):
+            return int(float(value[:-len(unit)]) * _SIZE_UNITS[unit])
+    return int(value)
+
+
+def process_cpu_time(pid):
+    """
+    reads the user + system cpu time of a process from /proc (linux only)
+    :param pid: int
+    :return: float, seconds (None if unavailable)
+    """
+    try:
+        with open('/proc/%d/stat' % pid, 'r') as f:
+            fields = f.read().rsplit(')', 1)[1].split()
+        # utime and stime are the 14th and 15th fields, fields[0] being the 3rd (state)
+        return (int(fields[11]) + int(fields[12])) / float(os.sysconf('SC_CLK_TCK'))
+    except (OSError, TypeError, ValueError, IndexError):
+        return None
+
+
+class ResourceLimitExceeded(RuntimeError):
+    """raised when the notebook's kernel is killed for exceeding its time, memory or cpu budget"""
+    pass
+
+
+class ExecutionWatchdog(CellObserver):
+    """
+    Enforces a wall clock budget on the notebook and on each cell, and memory/cpu limits on the kernel
+    the kernel's resource use is sampled (written to _pge_resources.jsonl) by a background thread, on a breach the
+    partial output notebook and _alt_error.txt are written before the kernel is killed
+    """
+    def __init__(self, total_timeout=None, cell_timeout=None, max_rss=None, max_cpu=None, interval=1,
+                 samples_file='_pge_resources.jsonl', error_file='_alt_error.txt'):
+        """
+        :param total_timeout: int, (optional) wall clock seconds for the whole notebook
+        :param cell_timeout: int, (optional) wall clock seconds for a single cell
+        :param max_rss: int or str, (optional) resident memory of the kernel (ie. 4GB)
+        :param max_cpu: int, (optional) cpu seconds of the kernel, enforced with RLIMIT_CPU
+        :param interval: float, seconds between resource samples
+        :param samples_file: str, JSON lines file of the resource samples
+        :param error_file: str, written with the reason of the breach
+        """
+        self.total_timeout = total_timeout
+        self.cell_timeout = cell_timeout
+        self.max_rss = parse_size(max_rss)
+        self.max_cpu = max_cpu
+        self.interval = interval
+        self.samples_file = samples_file
+        self.error_file = error_file
+        self.breach = None
+
+        self._client = None
+        self._start = None
+        self._cell = None
+        self._stop = threading.Event()
+        self._thread = None
+        self._cpu_start = None
+        self._cpu_rlimit = None  # the kernel's previous RLIMIT_CPU, restored for kernels that outlive the notebook
+
+    def _apply_rlimits(self, pid):
+        if self.max_cpu is None:
+            return
+        if resource is None or not hasattr(resource, 'prlimit') or pid is None:
+            logging.warning('unable to apply the cpu limit to the kernel, prlimit is not supported')
+            return
+        # RLIMIT_CPU counts the kernel's total cpu time, the budget is added to what it already used
+        # it's a backstop in case the sampling thread falls behind: SIGXCPU 5 seconds past the budget, SIGKILL 10
+        limit = int(self._cpu_start or 0) + int(self.max_cpu)
+        self._cpu_rlimit = resource.prlimit(pid, resource.RLIMIT_CPU, (limit + 5, limit + 10))
+
+    def _restore_rlimits(self, pid):
+        if self._cpu_rlimit is None:
+            return
+        try:
+            resource.prlimit(pid, resource.RLIMIT_CPU, self._cpu_rlimit)
+        except (OSError, ValueError):  # the kernel is gone
+            pass
+        self._cpu_rlimit = None
+
+    def raise_for_breach(self, error=None):
+        """
+        raises ResourceLimitExceeded if the kernel was killed by the watchdog
+        :param error: Exception, (optional) the execution error caused by the kernel's death
+        """
+        if self.breach:
+            raise ResourceLimitExceeded(self.breach) from error
+
+    def _check(self, now, rss, cpu):
+        if self.total_timeout is not None and now - self._start > self.total_timeout:
+            return 'notebook exceeded its time limit of %ss' % self.total_timeout
+        if self.cell_timeout is not None and self._cell is not None and now - self._cell[1] > self.cell_timeout:
+            return 'cell %d exceeded its time limit of %ss' % (self._cell[0], self.cell_timeout)
+        if self.max_rss is not None and rss is not None and rss > self.max_rss:
+            return 'kernel exceeded its memory limit of %d bytes (rss: %d bytes)' % (self.max_rss, rss)
+        # checked before RLIMIT_CPU kills the kernel, so the partial output notebook can be saved
+        if self.max_cpu is not None and cpu is not None and cpu - (self._cpu_start or 0) > self.max_cpu:
+            return 'kernel exceeded its cpu limit of %ss' % self.max_cpu
+        return None
+
+    def _on_breach(self, reason):
+        self.breach = reason
+        logging.error(reason)
+        try:
+            self._client.nb_man.save()  # partial output notebook
+        except Exception as e:
+            logging.warning('unable to save the partial output notebook: %s' % e)
+        with open(self.error_file, 'w') as f:
+            f.write('%s\n' % reason)
+        self._client.kill_kernel()
+
+    def _monitor(self):
+        pid = self._client.kernel_pid
+        with open(self.samples_file, 'w') as f:
+            while not self._stop.wait(self.interval):
+                now = time.time()
+                rss, peak_rss = process_memory(pid)
+                cpu = process_cpu_time(pid)
+                f.write(json.dumps({
+                    'time': now - self._start,
+                    'cell': self._cell[0] if self._cell else None,
+                    'rss': rss,
+                    'peak_rss': peak_rss,
+                    'cpu': cpu,
+                }) + '\n')
+                f.flush()
+
+                reason = self._check(now, rss, cpu)
+                if reason:
+                    self._on_breach(reason)
+                    break
+
+    def notebook_start(self, client):
+        self._client = client
+        self._start = time.time()
+        self._cpu_start = process_cpu_time(client.kernel_pid) if client.kernel_pid else None
+        self._apply_rlimits(client.kernel_pid)
+        self._thread = threading.Thread(target=self._monitor, name='pge-watchdog', daemon=True)
+        self._thread.start()
+
+    def cell_start(self, client, cell, index):
+        self._cell = (index, time.time())
+
+    def cell_complete(self, client, cell, index):
+        self._cell = None
+
+    def notebook_complete(self, client):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self._restore_rlimits(client.kernel_pid)
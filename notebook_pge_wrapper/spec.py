@@ -0,0 +1,359 @@
+import re
+import json
+from datetime import date, datetime
+
+from notebook_pge_wrapper.parameters import ParameterParseError
+
+
+"""
+# https://wiki.jpl.nasa.gov/pages/viewpage.action?spaceKey=hysds&title=Job+and+HySDS-IO+Specifications
+text: A text srtring, will be kept as text
+number: A real number
+date: A date in ISO format. Will be treated as a "text" field for passing into the container.
+datetime: A date with time in YYYY-MM-DDTHH:mm:SS.SSS format. Will be treated as a "text" field.
+boolean: true or false in a drop down
+enum:  On of a set of options in a drop down.
+       Note: must specify "enumerables" field to specify the list of possible options. These will be "text" types in
+       the enumerables set.
+
+email: An e-mail address, will be treated as "text"
+textarea: Same as text, but displayed larger with the textarea HTML tag
+container_version: A version of an existing container registered in the Mozart API. Must define "version_substring"
+                   field.
+jobspec_version: A version of an existing job-sepcification registered in the Mozart API.
+                 Must define "version_substring" field.
+hysdsio_version: A version of an existing hysdsio version registered in the current UI.
+                 Must define "version_substring" field.
+region: Auto-populated from the facet view leaflet tool.
+"""
+
+TEXT = 'text'
+NUMBER = 'number'
+DATE = 'date'
+DATETIME = 'datetime'
+BOOLEAN = 'boolean'
+ENUM = 'enum'
+NOTE = 'note'
+EMAIL = 'email'
+TEXT_AREA = 'textarea'
+CONTAINER_VERSION = 'container_version'
+JOBSPEC_VERSION = 'jobspec_version'
+REGION = 'region'
+OBJECT = 'object'
+
+__MAPPER = {
+    'str': TEXT,
+    'string': TEXT,
+    'text': TEXT,
+    'float': NUMBER,
+    'num': NUMBER,
+    'int': NUMBER,
+    'integer': NUMBER,
+    'date': DATE,
+    'date_time': DATETIME,
+    'datetime': DATETIME,
+    'bool': BOOLEAN,
+    'boolean': BOOLEAN,
+    'enum': ENUM,
+    'email': EMAIL,
+    'textarea': TEXT_AREA,
+    'list': OBJECT,
+    'array': OBJECT,
+    'arr': OBJECT,
+    'dict': OBJECT,
+    'obj': OBJECT,
+    'object': OBJECT
+}
+
+
+_INT_TYPES = {'int', 'integer'}
+_FLOAT_TYPES = {'float'}
+_BOOLEANS = {'true': True, 'false': False}
+_EMAIL_RE = re.compile(r'^[^@\s]+@[^@\s]+$')
+
+
+class ContextValidationError(RuntimeError):
+    """
+    raised before the execution when values of _context.json don't match the type of their notebook parameter
+    """
+    def __init__(self, errors):
+        """
+        :param errors: List[str], one message per invalid parameter
+        """
+        self.errors = errors
+        super().__init__('invalid _context.json, %s' % '; '.join(errors))
+
+
+def hysdsio_type(t):
+    """
+    maps input to hysdsio type (using __MAPPER)
+    :param t: str
+    :return: str
+    """
+    t_lower = t.lower()
+    if t_lower.startswith('dict') or t_lower.startswith('list') or t_lower.startswith('arr') or \
+            t_lower.startswith('obj'):
+        return OBJECT
+
+    return __MAPPER.get(t_lower, TEXT)
+
+
+def filter_context(param_names, ctx):
+    """
+    filters _context.json down to the notebook's (user) parameters
+    :param param_names: Iterable[str]
+    :param ctx: Dict[str, <any>], _context.json
+    :return: Dict[str, <any>]
+    """
+    params = {}
+    for k in param_names:
+        if k.startswith('hysds_') or k.startswith('_'):
+            continue
+        if ctx.get(k) is not None:  # if key is found in _context.json then populate params dict with value
+            params[k] = ctx[k]
+    return params
+
+
+class NotebookParam(object):
+    """
+    A user parameter of the notebook, with its resolved hysds-io type
+    the default (and enumerables) are evaluated on first use, only the spec generation needs them
+    """
+    __slots__ = ('parameter', 'name', 'hysds_type', 'description')
+
+    def __init__(self, parameter):
+        """
+        :param parameter: Parameter, from the parameters cell
+        """
+        self.parameter = parameter
+        self.name = parameter.name
+        self.hysds_type = hysdsio_type(parameter.inferred_type_name)
+        self.description = parameter.help or None
+
+    @property
+    def enumerables(self):
+        """
+        example of enum type: {
+          "name": "processing_type",
+          "from": "submitter",
+          "type": "enum",
+          "enumerables": ["forward", "reprocessing", "urgent"],
+          "default": "forward"
+        },
+        :return: List[<any>], None if the parameter isn't an enum
+        """
+        if self.hysds_type != ENUM:
+            return None
+        enums = self.parameter.value
+        if type(enums) != list or not enums:
+            raise ParameterParseError("enum %s must be a list of values: %s" % (self.name, self.parameter.default),
+                                      lineno=self.parameter.lineno)
+        return enums
+
+    @property
+    def default(self):
+        """
+        default value in hysds-io, numbers are strings and an enum defaults to its first value
+        :return: <any>
+        """
+        if self.hysds_type == ENUM:
+            default_value = self.enumerables[0]
+            return default_value if type(default_value) == str else str(default_value)
+
+        default_value = self.parameter.value
+        if type(default_value) in (int, float):
+            default_value = str(default_value)  # NOTE: need to parse value as strings
+        return default_value
+
+    def coerce(self, value):
+        """
+        validates a value of _context.json against the hysds-io type of the parameter, converting the values hysds-io
+        submits as strings (numbers, booleans, objects)
+        text parameters (and untyped ones) are passed through, dates are validated but passed as strings
+        :param value: <any>
+        :return: <any>, value to inject in the notebook
+        """
+        if self.hysds_type == NUMBER:
+            return self._coerce_number(value)
+        if self.hysds_type == BOOLEAN:
+            if isinstance(value, bool):
+                return value
+            if isinstance(value, str) and value.strip().lower() in _BOOLEANS:
+                return _BOOLEANS[value.strip().lower()]
+            raise ValueError('expected true or false, got %r' % (value,))
+        if self.hysds_type == ENUM:
+            for enum in self.enumerables:
+                if value == enum or (isinstance(value, str) and not isinstance(enum, str) and value == str(enum)):
+                    return enum
+            raise ValueError('expected one of %s, got %r' % (self.enumerables, value))
+        if self.hysds_type in (DATE, DATETIME):
+            return self._validate_date(value)
+        if self.hysds_type == EMAIL:
+            if not isinstance(value, str) or not _EMAIL_RE.match(value):
+                raise ValueError('expected an email address, got %r' % (value,))
+            return value
+        if self.hysds_type == OBJECT:
+            return self._coerce_object(value)
+        return value
+
+    def _coerce_number(self, value):
+        type_name = self.parameter.inferred_type_name.lower()
+        number = value
+        if isinstance(value, str):
+            try:
+                number = int(value)
+            except ValueError:
+                try:
+                    number = float(value)
+                except ValueError:
+                    raise ValueError('expected a number, got %r' % (value,)) from None
+        if isinstance(number, bool) or not isinstance(number, (int, float)):
+            raise ValueError('expected a number, got %r' % (value,))
+
+        if type_name in _INT_TYPES:
+            if isinstance(number, float):
+                if not number.is_integer():
+                    raise ValueError('expected an integer, got %r' % (value,))
+                number = int(number)
+        elif type_name in _FLOAT_TYPES:
+            number = float(number)
+        return number
+
+    def _validate_date(self, value):
+        if not isinstance(value, str):
+            raise ValueError('expected a %s string, got %r' % (self.hysds_type, value))
+        try:
+            if self.hysds_type == DATE:
+                date.fromisoformat(value)
+            else:
+                datetime.fromisoformat(value[:-1] + '+00:00' if value.endswith('Z') else value)
+        except ValueError:
+            expected = 'YYYY-MM-DD' if self.hysds_type == DATE else 'YYYY-MM-DDTHH:mm:SS.SSS'
+            raise ValueError('expected a %s (%s), got %r' % (self.hysds_type, expected, value)) from None
+        return value
+
+    def _coerce_object(self, value):
+        obj = value
+        if isinstance(value, str):
+            try:
+                obj = json.loads(value)
+            except ValueError:
+                raise ValueError('expected a json list or object, got %r' % (value,)) from None
+
+        type_name = self.parameter.inferred_type_name.lower()
+        if type_name.startswith(('list', 'arr')):
+            expected = (list,)
+        elif type_name.startswith('dict'):
+            expected = (dict,)
+        else:
+            expected = (list, dict)
+        if not isinstance(obj, expected):
+            raise ValueError('expected a %s, got %r' % (' or '.join(t.__name__ for t in expected), value))
+        return obj
+
+    def to_hysdsio(self):
+        """
+        :return: Dict[str, <any>], entry of the hysds-io params
+        """
+        hysdsio_param = {
+            'name': self.name,
+            'from': 'submitter',
+            'type': self.hysds_type,
+        }
+        if self.description:
+            hysdsio_param['description'] = self.description
+        if self.hysds_type == ENUM:
+            hysdsio_param['enumerables'] = self.enumerables
+        hysdsio_param['default'] = self.default
+        return hysdsio_param
+
+    def to_job_spec(self):
+        """
+        :return: Dict[str, str], entry of the job-spec params
+        """
+        return {
+            'name': self.name,
+            'destination': 'context'
+        }
+
+    def __repr__(self):
+        return '%s(%r, %r)' % (self.__class__.__name__, self.name, self.hysds_type)
+
+
+class NotebookSpec(object):
+    """
+    The parameters of a notebook split into its user parameters (hysds-io, job-spec and _context.json) and its hysds
+    specs (parameters prefixed with '_' or 'hysds_'), built once per notebook (see NotebookInspection.spec)
+    """
+    __slots__ = ('nb_path', 'params', 'spec_params', '_hysds_specs')
+
+    def __init__(self, nb_path, parameters):
+        """
+        :param nb_path: str, path + notebook name
+        :param parameters: Dict[str, Parameter], from the parameters cell
+        """
+        self.nb_path = nb_path
+        self.params = [NotebookParam(p) for p in parameters.values() if not p.is_spec]
+        self.spec_params = [p for p in parameters.values() if p.is_spec]
+        self._hysds_specs = None
+
+    @property
+    def param_names(self):
+        """
+        :return: List[str], names of the user parameters
+        """
+        return [p.name for p in self.params]
+
+    @property
+    def hysds_specs(self):
+        """
+        :return: Dict[str, <any>], the hysds specs without their prefix (ie. time_limit, label)
+        """
+        if self._hysds_specs is None:
+            hysds_specs = {}
+            for p in self.spec_params:
+                if p.name.startswith('hysds_'):
+                    print("DEPRECATION WARNING: please prefix parameter (%s) with '_' instead of 'hysds_'" % p.spec_key)
+                hysds_specs[p.spec_key] = p.value
+            self._hysds_specs = hysds_specs
+        return self._hysds_specs
+
+    def hysdsio_params(self):
+        """
+        :return: List[Dict[str, <any>]], params of hysds-io
+        """
+        return [p.to_hysdsio() for p in self.params]
+
+    def job_spec_params(self):
+        """
+        :return: List[Dict[str, str]], params of the job-spec
+        """
+        return [p.to_job_spec() for p in self.params]
+
+    def filter_context(self, ctx):
+        """
+        :param ctx: Dict[str, <any>], _context.json
+        :return: Dict[str, <any>], the notebook parameters found in _context.json
+        """
+        return filter_context(self.param_names, ctx)
+
+    def validate_context(self, ctx):
+        """
+        pre-flight check of _context.json, run before the kernel starts so a bad submission fails right away
+        :param ctx: Dict[str, <any>], _context.json
+        :return: Dict[str, <any>], the notebook parameters found in _context.json, coerced to their type
+        """
+        params, errors = {}, []
+        for p in self.params:
+            if ctx.get(p.name) is None:
+                continue
+            try:
+                params[p.name] = p.coerce(ctx[p.name])
+            except ValueError as e:
+                errors.append('%s: %s' % (p.name, e))
+        if errors:
+            raise ContextValidationError(errors)
+        return params
+
+    def __repr__(self):
+        return '%s(%r)' % (self.__class__.__name__, self.nb_path)
@@ -1,178 +1,56 @@
 import os
 import json
-import ast
+import stat
+import hashlib
+import tempfile
 import traceback
 import argparse
+import contextlib
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+from notebook_pge_wrapper.inspection import inspect, read_parameters_cell
+from notebook_pge_wrapper.spec import hysdsio_type
+from notebook_pge_wrapper.version import __version__
 
-import papermill
-
-
-"""
-# https://wiki.jpl.nasa.gov/pages/viewpage.action?spaceKey=hysds&title=Job+and+HySDS-IO+Specifications
-text: A text srtring, will be kept as text
-number: A real number
-date: A date in ISO format. Will be treated as a "text" field for passing into the container.
-datetime: A date with time in YYYY-MM-DDTHH:mm:SS.SSS format. Will be treated as a "text" field.
-boolean: true or false in a drop down
-enum:  On of a set of options in a drop down.
-       Note: must specify "enumerables" field to specify the list of possible options. These will be "text" types in
-       the enumerables set.
-
-email: An e-mail address, will be treated as "text"
-textarea: Same as text, but displayed larger with the textarea HTML tag
-container_version: A version of an existing container registered in the Mozart API. Must define "version_substring"
-                   field.
-jobspec_version: A version of an existing job-sepcification registered in the Mozart API.
-                 Must define "version_substring" field.
-hysdsio_version: A version of an existing hysdsio version registered in the current UI.
-                 Must define "version_substring" field.
-region: Auto-populated from the facet view leaflet tool.
-"""
 
 __DEFAULT_DISK_USAGE = '1GB'
 __DEFAULT_TIME_LIMIT = 3600
 __DEFAULT_SOFT_TIME_LIMIT = 3600
 
-COMPONENT = 'tosca'  # default to
+__NOTEBOOK_DIR = 'notebook_pges'
+__DOCKER_DIR = 'docker'
+__SPECS_MANIFEST = '.specs-manifest.json'
+__SPECS_LOCK = '.specs.lock'
+__SPECS_BUNDLE = 'specs-bundle.jsonl'
+_BUNDLE_TAIL_CHUNK = 8192
 
-__TEXT = 'text'
-__NUMBER = 'number'
-__DATE = 'date'
-__DATETIME = 'datetime'
-__BOOLEAN = 'boolean'
-__ENUM = 'enum'
-__NOTE = 'note'
-__EMAIL = 'email'
-__TEXT_AREA = 'textarea'
-__CONTAINER_VERSION = 'container_version'
-__JOBSPEC_VERSION = 'jobspec_version'
-__REGION = 'region'
-__OBJECT = 'object'
-
-__MAPPER = {
-    'str': __TEXT,
-    'string': __TEXT,
-    'text': __TEXT,
-    'float': __NUMBER,
-    'num': __NUMBER,
-    'int': __NUMBER,
-    'integer': __NUMBER,
-    'date': __DATE,
-    'date_time': __DATETIME,
-    'datetime': __DATETIME,
-    'bool': __BOOLEAN,
-    'boolean': __BOOLEAN,
-    'enum': __ENUM,
-    'email': __EMAIL,
-    'textarea': __TEXT_AREA,
-    'list': __OBJECT,
-    'array': __OBJECT,
-    'arr': __OBJECT,
-    'dict': __OBJECT,
-    'obj': __OBJECT,
-    'object': __OBJECT
-}
-
-
-def _get_hysdsio_param_type(t):
-    """
-    maps input to hysdsio type (using __MAPPER)
-    :param t: str
-    :return: str
-    """
-    t_lower = t.lower()
-    if t_lower.startswith('dict') or t_lower.startswith('list') or t_lower.startswith('arr') or \
-            t_lower.startswith('obj'):
-        return __OBJECT
-
-    return __MAPPER.get(t_lower, __TEXT)
-
-
-def _extract_enumerable_values(param):
-    """
-    example of enum type: {
-      "name": "processing_type",
-      "from": "submitter",
-      "type": "enum",
-      "enumerables": ["forward", "reprocessing", "urgent"],
-      "default": "forward"
-    },
-    :param param: OrderedDict, keys: name, default, inferred_type_name, help
-    :return: List[<any>], str
-    """
-    value = param['default']
-    try:
-        enums = ast.literal_eval(value)
-    except Exception as e:
-        print(e)
-        raise RuntimeError("make sure your enum follows JSON standards: {}".format(value))
+GENERATED = 'generated'
+SKIPPED = 'skipped'
+FAILED = 'failed'
 
-    if type(enums) != list:
-        raise RuntimeError("list elements must be wrapped with double quotes")
+COMPONENT = 'tosca'  # default to
 
-    default_value = enums[0]
-    if type(default_value) != str:
-        default_value = str(default_value)
-    return enums, default_value
+# kept for backward compatibility, the hysds-io types are in notebook_pge_wrapper.spec
+_get_hysdsio_param_type = hysdsio_type
 
 
 def _generate_hysdsio_params(nb_name):  # private method
-    nb_params = papermill.inspect_notebook(nb_name)
-    params = []
-
-    for k, p in nb_params.items():
-        if k.startswith('hysds_') or k.startswith('_'):
-            continue
-
-        param_type = p['inferred_type_name']
-        description = p['help']
-
-        hysdsio_param = {
-            'name': k,
-            'from': 'submitter',
-            'type': _get_hysdsio_param_type(param_type)
-        }
-
-        if description:
-            hysdsio_param['description'] = description
-
-        if param_type.lower() == 'enum':
-            enums, default_value = _extract_enumerable_values(p)
-            hysdsio_param['enumerables'] = enums
-            hysdsio_param['default'] = default_value
-        else:
-            # NOTE: need to parse value as strings
-            default_value = ast.literal_eval(p['default'])
-            if type(default_value) in (int, float):
-                default_value = str(default_value)
-            hysdsio_param['default'] = default_value
-
-        params.append(hysdsio_param)
-    return params
+    return inspect(nb_name).spec.hysdsio_params()
 
 
 def extract_hysds_specs(nb_name):
-    nb_params = papermill.inspect_notebook(nb_name)
-
-    hysds_specs = {}
-    for k, p in nb_params.items():
-        if not k.startswith('hysds_') and not k.startswith('_'):
-            continue
-
-        if k.startswith('hysds_'):
-            k = k.replace('hysds_', '')
-            print("DEPRECATION WARNING: please prefix parameter (%s) with '_' instead of 'hysds_'" % k)
-        else:
-            k = k[1:]
-
-        default_value = p['default']
-        try:
-            hysds_specs[k] = ast.literal_eval(default_value)
-        except Exception as e:
-            print(default_value, e)
-            traceback.print_exc()
-            p['default'] = default_value[1:-1]
-    return hysds_specs
+    """
+    extracts the hysds specs (parameters prefixed with '_' or 'hysds_') from the notebook
+    :param nb_name: str (path + notebook name) or NotebookInspection
+    :return: Dict[str, <any>]
+    """
+    return dict(inspect(nb_name).spec.hysds_specs)
 
 
 def generate_hysdsio(job_label=None, sub_type=None, nb_name=None):
@@ -187,7 +65,7 @@ def generate_hysdsio(job_label=None, sub_type=None, nb_name=None):
     :param sub_type: {iteration, individual}
                      individual (1 job regardless of query)
                      or iteration (N jobs for however many records recorded by the Elasticsesrch query)
-    :param nb_name: str, path + notebook name
+    :param nb_name: str (path + notebook name) or NotebookInspection
     :return: Dict[str, <any>]
     """
     if not sub_type:
@@ -225,7 +103,7 @@ def generate_job_spec(time_limit=__DEFAULT_TIME_LIMIT, soft_time_limit=__DEFAULT
     :param soft_time_limit: int
     :param disk_usage: str (KB, MB, GB) ex. 10GB
     :param required_queue: str or List[str]
-    :param nb: str, path of Jupyter notebook
+    :param nb: str (path of Jupyter notebook) or NotebookInspection
     :param command: str, command field in job_specs json
     :param user: user/directory in the docker image
     :return: Dict[str, <any>]
@@ -238,19 +116,10 @@ def generate_job_spec(time_limit=__DEFAULT_TIME_LIMIT, soft_time_limit=__DEFAULT
     if isinstance(required_queue, str):
         required_queue = [required_queue]
 
-    nb_params = papermill.inspect_notebook(nb)
-    params = []
-
-    for key in nb_params:
-        if key.startswith('hysds_') or key.startswith('_'):
-            continue
-
-        params.append({
-            'name': key,
-            'destination': 'context'
-        })
+    inspection = inspect(nb)
+    params = inspection.spec.job_spec_params()
     repo = os.getcwd().split('/')[-1]
-    pge_verdi_path = os.path.join(repo, nb)
+    pge_verdi_path = os.path.join(repo, inspection.nb_path)
 
     output_job_spec = {
         'command': command or 'notebook-pge-wrapper execute /home/%s/%s' % (user, pge_verdi_path),
@@ -266,14 +135,160 @@ def generate_job_spec(time_limit=__DEFAULT_TIME_LIMIT, soft_time_limit=__DEFAULT
     return output_job_spec
 
 
-def generate_spec_files(nb, user):
-    nb_split = nb.split('.')
-    root_name = nb_split[0]
+def _spec_file_locations(nb):
+    """
+    :param nb: str, notebook name (in notebook_pges/)
+    :return: (str, str), location of the hysds-io and job-spec files in docker/
+    """
+    root_name = nb.split('.')[0]
+    hysdsio_file_location = os.path.join(__DOCKER_DIR, 'hysds-io.json.%s' % root_name)
+    job_spec_file_location = os.path.join(__DOCKER_DIR, 'job-spec.json.%s' % root_name)
+    return hysdsio_file_location, job_spec_file_location
+
+
+def spec_files_hash(nb, user):
+    """
+    hashes everything the spec files of a notebook are generated from: the notebook's parameters cell,
+    the settings, the repo name and the version of this library
+    :param nb: str, notebook name (in notebook_pges/)
+    :param user: str, user/directory in the docker image
+    :return: str, sha256 hex digest
+    """
+    parameters_cell = read_parameters_cell(os.path.join(__NOTEBOOK_DIR, nb))
+    content = json.dumps({
+        'parameters': parameters_cell,
+        'user': user,
+        'repo': os.getcwd().split('/')[-1],
+        'version': __version__,
+    }, sort_keys=True)
+    return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+
+def read_specs_manifest():
+    """
+    reads docker/.specs-manifest.json, mapping every notebook to the hash of its last generated spec files
+    :return: Dict[str, str]
+    """
+    manifest_location = os.path.join(__DOCKER_DIR, __SPECS_MANIFEST)
+    if not os.path.isfile(manifest_location):
+        return {}
+    try:
+        with open(manifest_location, 'r') as f:
+            return json.load(f).get('notebooks', {})
+    except (ValueError, AttributeError) as e:
+        print('unable to read %s, regenerating all spec files: %s' % (manifest_location, e))
+        return {}
+
+
+def write_specs_manifest(manifest):
+    """
+    :param manifest: Dict[str, str], notebook name -> hash of its spec files
+    """
+    commit_spec_files(_render_specs_manifest(manifest))
+
+
+def _render_specs_manifest(manifest):
+    """
+    :param manifest: Dict[str, str], notebook name -> hash of its spec files
+    :return: Dict[str, bytes], location of the manifest -> its content
+    """
+    content = json.dumps({'version': __version__, 'notebooks': manifest}, indent=2, sort_keys=True)
+    return {os.path.join(__DOCKER_DIR, __SPECS_MANIFEST): content.encode('utf-8')}
+
+
+def _file_mode(location):
+    """
+    :return: int, permissions of the file being replaced, or the default permissions of a new file (umask applied)
+    """
+    try:
+        return stat.S_IMODE(os.stat(location).st_mode)
+    except FileNotFoundError:
+        umask = os.umask(0)
+        os.umask(umask)
+        return 0o666 & ~umask
+
+
+def _is_unchanged(location, content):
+    """
+    :return: bool, True if the file on disk has exactly this content
+    """
+    try:
+        if os.path.getsize(location) != len(content):
+            return False
+        with open(location, 'rb') as f:
+            return f.read() == content
+    except OSError:
+        return False
+
+
+@contextlib.contextmanager
+def _specs_lock(directory):
+    """
+    exclusive lock on the spec files of the directory, concurrent runs commit one after the other
+    """
+    if fcntl is None:  # not available on windows, the renames are still atomic
+        yield
+        return
+    with open(os.path.join(directory, __SPECS_LOCK), 'a') as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def commit_spec_files(files):
+    """
+    writes the spec files as one transaction: every changed file is written to a temporary file next to it and they are
+    renamed over the spec files only once all of them are written, a failure leaves the spec files untouched
+    files with the exact same content as on disk are not rewritten (their mtime is kept)
+    :param files: Dict[str, bytes], location -> content, renamed in this order
+    :return: List[str], locations of the files written
+    """
+    directories = sorted({os.path.dirname(location) or '.' for location in files})
+    with contextlib.ExitStack() as stack:
+        for directory in directories:
+            stack.enter_context(_specs_lock(directory))
+
+        staged = []
+        try:
+            for location, content in files.items():
+                if _is_unchanged(location, content):
+                    continue
+                directory, name = os.path.split(location)
+                fd, tmp = tempfile.mkstemp(dir=directory or '.', prefix='.%s.' % name, suffix='.tmp')
+                staged.append((tmp, location))
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(content)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.chmod(tmp, _file_mode(location))
+        except BaseException:
+            for tmp, _ in staged:
+                if os.path.exists(tmp):
+                    os.remove(tmp)
+            raise
+
+        for tmp, location in staged:
+            os.replace(tmp, location)
+    return [location for _, location in staged]
+
+
+def render_spec_files(nb, user):
+    """
+    generates the hysds-io and job-spec of a notebook without writing them
+    :param nb: str, notebook name (in notebook_pges/)
+    :param user: str, user/directory in the docker image
+    :return: Dict[str, bytes], location of the spec file -> its content
+    """
+    nb_path = os.path.join(__NOTEBOOK_DIR, nb)
+    hysdsio_file_location, job_spec_file_location = _spec_file_locations(nb)
 
-    nb_path = os.path.join('notebook_pges', nb)
+    # parsing the notebook once, shared by all the generators below
+    inspection = inspect(nb_path)
 
     # extracting hysds_io and job_specs from notebook
-    hysds_specs = extract_hysds_specs(nb_path)
+    hysds_specs = extract_hysds_specs(inspection)
 
     time_limit = hysds_specs.get('time_limit', __DEFAULT_TIME_LIMIT)
     soft_time_limit = hysds_specs.get('soft_time_limit', __DEFAULT_SOFT_TIME_LIMIT)
@@ -284,24 +299,248 @@ def generate_spec_files(nb, user):
     command = hysds_specs.get('command')
 
     # generate hysds_io, copying hysds_io.json to docker/
-    hysdsio = generate_hysdsio(nb_name=nb_path, sub_type=submission_type, job_label=label)
-    hysdsio_file = 'hysds-io.json.%s' % root_name
-    hysdsio_file_location = os.path.join('docker', hysdsio_file)
+    hysdsio = generate_hysdsio(nb_name=inspection, sub_type=submission_type, job_label=label)
 
     # generate job_specs, copying job_specs.json to docker/
-    job_spec = generate_job_spec(nb=nb_path, soft_time_limit=soft_time_limit, time_limit=time_limit,
+    job_spec = generate_job_spec(nb=inspection, soft_time_limit=soft_time_limit, time_limit=time_limit,
                                  required_queue=required_queue, disk_usage=disk_usage, command=command, user=user)
-    job_spec_file = 'job-spec.json.%s' % root_name
-    job_spec_file_location = os.path.join('docker', job_spec_file)
 
-    # creating the spec json files after both checks are successful
-    with open(hysdsio_file_location, 'w+') as f:
-        json.dump(hysdsio, f, indent=2)
-    print('generated %s' % hysdsio_file_location)
+    return OrderedDict([
+        (hysdsio_file_location, json.dumps(hysdsio, indent=2).encode('utf-8')),
+        (job_spec_file_location, json.dumps(job_spec, indent=2).encode('utf-8')),
+    ])
+
+
+def _print_committed(files, written):
+    for location in files:
+        print('%s %s' % ('generated' if location in written else 'unchanged', location))
+
+
+def generate_spec_files(nb, user):
+    """
+    generates the hysds-io and job-spec of a notebook in docker/, both files are renamed in place once both are
+    generated (see commit_spec_files)
+    :param nb: str, notebook name (in notebook_pges/)
+    :param user: str, user/directory in the docker image
+    """
+    files = render_spec_files(nb, user)
+    _print_committed(files, commit_spec_files(files))
+
+
+def _generate_spec_files_task(nb, user):
+    """
+    runs render_spec_files for a single notebook, capturing the error instead of raising it
+    :param nb: str, notebook name (in notebook_pges/)
+    :param user: str, user/directory in the docker image
+    :return: (Dict[str, bytes], str), spec files and None if successful, None and the error message otherwise
+    """
+    try:
+        return render_spec_files(nb, user), None
+    except Exception as e:
+        traceback.print_exc()
+        return None, '%s: %s' % (type(e).__name__, e)
+
 
-    with open(job_spec_file_location, 'w+') as f:
-        json.dump(job_spec, f, indent=2)
-    print('generated %s' % job_spec_file_location)
+def generate_all_spec_files(notebooks, user, jobs=1, force=False):
+    """
+    generates the spec files for multiple notebooks, optionally across a process pool
+    the spec files are written once all the notebooks are processed, as one transaction (see commit_spec_files)
+    notebooks unchanged since the last run (according to docker/.specs-manifest.json) are skipped
+    a failing notebook does not stop the others from being generated
+    :param notebooks: List[str], notebook names (in notebook_pges/)
+    :param user: str, user/directory in the docker image
+    :param jobs: int, number of worker processes (1 runs the notebooks sequentially)
+    :param force: bool, regenerate the spec files even if the notebook is unchanged
+    :return: List[(str, str, str)], (notebook, status, error message or None) in the same order as notebooks
+             status is one of GENERATED, SKIPPED, FAILED
+    """
+    if jobs is None or jobs < 1:
+        raise RuntimeError("jobs must be a positive integer")
+
+    manifest = read_specs_manifest()
+    hashes = {}
+    pending = []
+    for nb in notebooks:
+        try:
+            hashes[nb] = spec_files_hash(nb, user)
+        except Exception:
+            hashes[nb] = None  # unreadable notebook, the error is reported by generate_spec_files
+
+        up_to_date = all(os.path.isfile(loc) for loc in _spec_file_locations(nb))
+        if not force and up_to_date and hashes[nb] is not None and manifest.get(nb) == hashes[nb]:
+            print('%s is unchanged, skipping...' % nb)
+            continue
+        pending.append(nb)
+
+    if jobs == 1 or len(pending) <= 1:
+        rendered = {nb: _generate_spec_files_task(nb, user) for nb in pending}
+    else:
+        rendered = {}
+        with ProcessPoolExecutor(max_workers=min(jobs, len(pending))) as executor:
+            futures = [executor.submit(_generate_spec_files_task, nb, user) for nb in pending]
+            for nb, future in zip(pending, futures):
+                try:
+                    rendered[nb] = future.result()
+                except Exception as e:  # worker process died
+                    rendered[nb] = None, '%s: %s' % (type(e).__name__, e)
+
+    results = []
+    files = OrderedDict()
+    for nb in notebooks:
+        if nb not in rendered:
+            results.append((nb, SKIPPED, None))
+            continue
+        nb_files, error = rendered[nb]
+        if error is not None:
+            manifest.pop(nb, None)
+            results.append((nb, FAILED, error))
+        else:
+            if hashes[nb] is not None:
+                manifest[nb] = hashes[nb]
+            files.update(nb_files)
+            results.append((nb, GENERATED, None))
+
+    if pending:
+        # the spec files of the whole batch and then the manifest are committed as one transaction
+        spec_files = list(files)
+        files.update(_render_specs_manifest(manifest))
+        _print_committed(spec_files, commit_spec_files(files))
+    return results
+
+
+def specs_bundle_location():
+    """
+    :return: str, default location of the specs bundle (docker/specs-bundle.jsonl)
+    """
+    return os.path.join(__DOCKER_DIR, __SPECS_BUNDLE)
+
+
+def _bundle_entries(notebooks):
+    """
+    reads the spec files of the notebooks from docker/, one notebook at a time
+    :param notebooks: List[str], notebook names (in notebook_pges/)
+    :return: Iterator[(str, Dict[str, <any>], Dict[str, <any>])], (name without .ipynb, hysds-io, job-spec)
+    """
+    for nb in notebooks:
+        hysdsio_file_location, job_spec_file_location = _spec_file_locations(nb)
+        with open(hysdsio_file_location, 'r') as f:
+            hysdsio = json.load(f)
+        with open(job_spec_file_location, 'r') as f:
+            job_spec = json.load(f)
+        yield nb.split('.')[0], hysdsio, job_spec
+
+
+def write_specs_bundle(notebooks, location=None):
+    """
+    writes the hysds-io and job-spec of every notebook (read from docker/) in a single JSON lines file, streamed one
+    notebook at a time:
+        {"name": "<name>", "hysds-io": {...}, "job-spec": {...}}      one line per notebook, the name comes first
+        {"version": "<version>", "index": {"<name>": [offset, length]}}  last line, byte range of every notebook's line
+    the bundle is written to a temporary file and renamed in place, see SpecsBundle to read it
+    :param notebooks: List[str], notebook names (in notebook_pges/), their spec files must have been generated
+    :param location: str, defaults to docker/specs-bundle.jsonl
+    :return: str, location of the bundle
+    """
+    location = location or specs_bundle_location()
+    directory, file_name = os.path.split(location)
+    index = OrderedDict()
+    with _specs_lock(directory or '.'):
+        fd, tmp = tempfile.mkstemp(dir=directory or '.', prefix='.%s.' % file_name, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                offset = 0
+                for name, hysdsio, job_spec in _bundle_entries(notebooks):
+                    entry = {'name': name, 'hysds-io': hysdsio, 'job-spec': job_spec}
+                    line = (json.dumps(entry, separators=(',', ':')) + '\n').encode('utf-8')
+                    f.write(line)
+                    index[name] = [offset, len(line)]
+                    offset += len(line)
+                trailer = {'version': __version__, 'index': index}
+                f.write((json.dumps(trailer, separators=(',', ':')) + '\n').encode('utf-8'))
+                f.flush()
+                os.fsync(f.fileno())
+            os.chmod(tmp, _file_mode(location))
+            os.replace(tmp, location)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+    return location
+
+
+class SpecsBundle(object):
+    """
+    Reads a bundle written by write_specs_bundle: only its last line (the index) is read when opened, a single
+    notebook's specs are then read with one seek
+    """
+    def __init__(self, location=None):
+        """
+        :param location: str, defaults to docker/specs-bundle.jsonl
+        """
+        self.location = location or specs_bundle_location()
+        trailer = self._read_trailer()
+        if not isinstance(trailer, dict) or not isinstance(trailer.get('index'), dict):
+            raise RuntimeError('%s is not a specs bundle (no index on its last line)' % self.location)
+        self.version = trailer.get('version')
+        self.index = trailer['index']
+
+    def _read_trailer(self):
+        with open(self.location, 'rb') as f:
+            f.seek(0, os.SEEK_END)
+            position = f.tell()
+            tail = b''
+            while position > 0:  # reading backwards until the newline ending the last notebook's line
+                step = min(_BUNDLE_TAIL_CHUNK, position)
+                position -= step
+                f.seek(position)
+                tail = f.read(step) + tail
+                start = tail.rfind(b'\n', 0, len(tail) - 1)
+                if start != -1:
+                    tail = tail[start + 1:]
+                    break
+        try:
+            return json.loads(tail.decode('utf-8'))
+        except ValueError:
+            raise RuntimeError('%s is not a specs bundle (no index on its last line)' % self.location) from None
+
+    @property
+    def names(self):
+        """
+        :return: List[str], names of the notebooks (without .ipynb), in the order of the bundle
+        """
+        return list(self.index)
+
+    def __contains__(self, name):
+        return name in self.index
+
+    def __len__(self):
+        return len(self.index)
+
+    def load(self, name):
+        """
+        :param name: str, notebook name (with or without .ipynb)
+        :return: Dict[str, <any>], keys: name, hysds-io, job-spec
+        """
+        if name.endswith('.ipynb'):
+            name = name[:-len('.ipynb')]
+        if name not in self.index:
+            raise RuntimeError('%s not found in %s' % (name, self.location))
+        offset, length = self.index[name]
+        with open(self.location, 'rb') as f:
+            f.seek(offset)
+            return json.loads(f.read(length).decode('utf-8'))
+
+    def __iter__(self):
+        """
+        streams the entries of the bundle in order, one line at a time
+        :return: Iterator[Dict[str, <any>]]
+        """
+        with open(self.location, 'rb') as f:
+            for _ in range(len(self.index)):
+                yield json.loads(f.readline().decode('utf-8'))
+
+    def __repr__(self):
+        return '%s(%r)' % (self.__class__.__name__, self.location)
 
 
 if __name__ == '__main__':
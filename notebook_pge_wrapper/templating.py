@@ -0,0 +1,78 @@
+import os
+import json
+
+import jinja2
+
+from notebook_pge_wrapper.cache import cache_dir
+
+
+TEMPLATES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'templates')
+
+_environments = {}  # templates directory -> jinja2.Environment, shared by every render of the process
+
+
+def template_cache_dir():
+    """
+    <cache_dir>/templates, see notebook_pge_wrapper.cache.cache_dir
+    :return: str
+    """
+    return os.path.join(cache_dir(), 'templates')
+
+
+def json_string(value):
+    """
+    jinja2 filter escaping a value to be rendered inside a JSON string (ie. in the source of a notebook's cell)
+    :param value: <any>
+    :return: str
+    """
+    return json.dumps(str(value))[1:-1]
+
+
+def _bytecode_cache():
+    """
+    :return: jinja2.FileSystemBytecodeCache, None if the cache directory can't be created (ie. read-only home)
+    """
+    directory = template_cache_dir()
+    try:
+        os.makedirs(directory, exist_ok=True)
+    except OSError:
+        return None
+    return jinja2.FileSystemBytecodeCache(directory)
+
+
+def template_environment(directory=TEMPLATES_DIR):
+    """
+    jinja2 environment of the templates directory, built once per process: every template is read and compiled once
+    (then kept by the environment) and its compiled bytecode is cached in <cache_dir>/templates so later invocations
+    of the CLI skip the compilation, a template whose source changed is recompiled
+    :param directory: str, defaults to notebook_pge_wrapper/templates
+    :return: jinja2.Environment
+    """
+    env = _environments.get(directory)
+    if env is None:
+        env = jinja2.Environment(loader=jinja2.FileSystemLoader(directory), bytecode_cache=_bytecode_cache(),
+                                 keep_trailing_newline=True, undefined=jinja2.StrictUndefined)
+        env.filters['json_string'] = json_string
+        _environments[directory] = env
+    return env
+
+
+def render_template(name, **context):
+    """
+    :param name: str, name of the template (in notebook_pge_wrapper/templates)
+    :param context: values of the template's variables (a missing variable raises jinja2.UndefinedError)
+    :return: str
+    """
+    return template_environment().get_template(name).render(**context)
+
+
+def write_template(name, destination, **context):
+    """
+    renders the template to a file
+    :param name: str, name of the template (in notebook_pge_wrapper/templates)
+    :param destination: str, path of the rendered file
+    :param context: values of the template's variables
+    """
+    content = render_template(name, **context)
+    with open(destination, 'w') as f:
+        f.write(content)
@@ -0,0 +1,161 @@
+import os
+import time
+import queue
+import threading
+
+try:
+    from watchdog.observers import Observer  # optional, inotify (or the platform's equivalent) instead of polling
+except ImportError:
+    Observer = None
+
+from notebook_pge_wrapper.spec_generator import generate_all_spec_files
+
+
+__NOTEBOOK_DIR = 'notebook_pges'
+
+DEFAULT_DEBOUNCE = 0.5  # seconds without a change before a saved notebook is processed
+DEFAULT_INTERVAL = 1.0  # seconds between two scans of the directory when polling
+
+
+def _is_notebook(name):
+    # Jupyter saves to a hidden temporary file (.~<name>.ipynb) renamed over the notebook
+    return name.endswith('.ipynb') and not name.startswith('.')
+
+
+class _PollingSource(threading.Thread):
+    """
+    reports the notebooks of the directory created or modified (mtime or size changed), scanned every interval seconds
+    """
+    def __init__(self, directory, changes, interval, stop):
+        """
+        :param directory: str
+        :param changes: queue.Queue, the names of the changed notebooks are put in it
+        :param interval: float, seconds between two scans
+        :param stop: threading.Event
+        """
+        super().__init__(daemon=True)
+        self.directory = directory
+        self.changes = changes
+        self.interval = interval
+        self.stop = stop
+        self._snapshot = self._scan()  # taken right away, saves made once watch_notebooks is called are reported
+
+    def _scan(self):
+        """
+        :return: Dict[str, (int, int)], notebook name -> (mtime_ns, size)
+        """
+        snapshot = {}
+        try:
+            entries = os.scandir(self.directory)
+        except FileNotFoundError:
+            return snapshot
+        with entries:
+            for entry in entries:
+                if not _is_notebook(entry.name):
+                    continue
+                try:
+                    st = entry.stat()
+                except FileNotFoundError:  # deleted since listed
+                    continue
+                snapshot[entry.name] = (st.st_mtime_ns, st.st_size)
+        return snapshot
+
+    def run(self):
+        while not self.stop.wait(self.interval):
+            snapshot = self._scan()
+            for name, state in snapshot.items():
+                if self._snapshot.get(name) != state:
+                    self.changes.put(name)
+            self._snapshot = snapshot
+
+
+class _EventHandler(object):
+    """
+    watchdog event handler (duck typed, watchdog isn't a dependency), reports the notebooks created, modified or
+    renamed into place, deleted notebooks are ignored
+    """
+    def __init__(self, changes):
+        """
+        :param changes: queue.Queue, the names of the changed notebooks are put in it
+        """
+        self.changes = changes
+
+    def dispatch(self, event):
+        if event.is_directory:
+            return
+        for path in (getattr(event, 'dest_path', None), event.src_path):
+            if not path:
+                continue
+            path = os.fsdecode(path)
+            name = os.path.basename(path)
+            if _is_notebook(name) and os.path.isfile(path):
+                self.changes.put(name)
+                return
+
+
+def watch_notebooks(callback, directory=__NOTEBOOK_DIR, debounce=DEFAULT_DEBOUNCE, interval=DEFAULT_INTERVAL,
+                    polling=False, stop=None):
+    """
+    calls back with every notebook of the directory saved, once its saves settle (no change for debounce seconds),
+    Jupyter (and editors) write a notebook several times per save
+    uses watchdog (inotify on linux) if it's installed, polls the directory otherwise
+    blocks until stop is set
+    :param callback: Callable[[str], None], called (from this thread) with the name of the saved notebook
+    :param directory: str, defaults to notebook_pges/
+    :param debounce: float, seconds
+    :param interval: float, seconds between two scans of the directory when polling
+    :param polling: bool, poll even if watchdog is installed (ie. network file systems, which don't notify changes)
+    :param stop: threading.Event, (optional) stops watching once set
+    """
+    stop = stop or threading.Event()
+    changes = queue.Queue()
+    if Observer is not None and not polling:
+        observer = Observer()
+        observer.schedule(_EventHandler(changes), directory, recursive=False)
+        observer.start()
+    else:
+        observer = None
+        _PollingSource(directory, changes, interval, stop).start()
+
+    pending = {}  # notebook name -> time of its last change
+    try:
+        while not stop.is_set():
+            if pending:
+                timeout = max(min(pending.values()) + debounce - time.monotonic(), 0)
+            else:
+                timeout = min(debounce, interval)  # checking stop regularly
+            try:
+                pending[changes.get(timeout=timeout)] = time.monotonic()
+            except queue.Empty:
+                pass
+
+            now = time.monotonic()
+            for nb, changed in sorted(pending.items()):
+                if now - changed >= debounce:
+                    del pending[nb]
+                    callback(nb)
+    finally:
+        stop.set()
+        if observer is not None:
+            observer.stop()
+            observer.join()
+
+
+def watch_spec_files(user, notebooks=None, on_results=None, **kwargs):
+    """
+    regenerates the spec files of the notebooks of notebook_pges/ as they are saved, only the saved notebook is
+    inspected and its spec files are only regenerated when its parameters cell changed (see generate_all_spec_files)
+    :param user: str, user/directory in the docker image
+    :param notebooks: List[str], (optional) names of the notebooks to watch, defaults to all
+    :param on_results: Callable[[List[(str, str, str)]], None], (optional) called with the results of
+                       generate_all_spec_files after every save
+    :param kwargs: arguments of watch_notebooks (debounce, interval, polling, stop)
+    """
+    def regenerate(nb):
+        if notebooks is not None and nb not in notebooks:
+            return
+        results = generate_all_spec_files([nb], user)
+        if on_results is not None:
+            on_results(results)
+
+    watch_notebooks(regenerate, **kwargs)
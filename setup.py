@@ -1,9 +1,18 @@
+import os
 from setuptools import setup, find_packages
 
+
+def read_version():
+    version = {}
+    with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'notebook_pge_wrapper', 'version.py')) as f:
+        exec(f.read(), version)
+    return version['__version__']
+
+
 def do_setup():
     setup(
         name='notebook_pge_wrapper',
-        version='1.0.3',
+        version=read_version(),
         long_description='Library to generate hysds_io and job_specs for Jupyter notebooks',
         packages=find_packages(),
         include_package_data=True,
@@ -14,11 +23,15 @@ def do_setup():
             ]
         },
         install_requires=[
-            'click>=7.1.2',
+            'click>=8.0',
             'Jinja2>=2.11.3',
             'PyYAML>=5.4.1',
             'papermill>=2.2.0',
         ],
+        extras_require={
+            'streaming': ['ijson>=3.1'],
+            'watch': ['watchdog>=2.1'],
+        },
         package_data={
             'notebook_pge_wrapper' : [
                 'templates/Dockerfile.template',
@@ -0,0 +1,116 @@
+import os
+import json
+import shutil
+import tempfile
+import unittest
+
+import nbformat
+from nbformat.v4 import new_notebook, new_code_cell
+
+from notebook_pge_wrapper.batch import execute_batch, execute_fanout, read_contexts, split_chunks
+
+
+class TestBatchExecution(unittest.TestCase):
+    def setUp(self):
+        self.test_loc = os.path.dirname(os.path.abspath(__file__))
+        self.notebook_dir = os.path.join(self.test_loc, "notebook_pges")
+        self.tmp = tempfile.mkdtemp()
+
+        self.contexts = os.path.join(self.tmp, 'contexts.jsonl')
+        with open(self.contexts, 'w') as f:
+            f.write(json.dumps({'a': 1, 'b': 'first'}) + '\n')
+            f.write(json.dumps({'a': 2, 'b': 'second'}) + '\n')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def test_read_contexts(self):
+        self.assertEqual(read_contexts(self.contexts), [('0', {'a': 1, 'b': 'first'}), ('1', {'a': 2, 'b': 'second'})])
+
+        ctx_dir = os.path.join(self.tmp, 'contexts')
+        os.mkdir(ctx_dir)
+        with open(os.path.join(ctx_dir, 'granule_1.json'), 'w') as f:
+            json.dump({'a': 3}, f)
+        self.assertEqual(read_contexts(ctx_dir), [('granule_1', {'a': 3})])
+
+    def test_execute_batch(self):
+        test_nb = os.path.join(self.notebook_dir, 'test.ipynb')
+        out_dir = os.path.join(self.tmp, 'runs')
+        cwd = os.getcwd()
+
+        report = execute_batch(test_nb, self.contexts, out_dir=out_dir, jobs=2)
+        self.assertEqual(os.getcwd(), cwd)
+        self.assertEqual((report['total'], report['succeeded'], report['failed']), (2, 2, 0))
+
+        for run_id in ('0', '1'):
+            run_dir = os.path.join(out_dir, run_id)
+            self.assertTrue(os.path.isfile(os.path.join(run_dir, 'test-output.ipynb')))
+            self.assertTrue(os.path.isfile(os.path.join(run_dir, '_alt_info.txt')))
+
+        with open(os.path.join(out_dir, '1', '_alt_info.txt')) as f:
+            self.assertIn('b: second', f.read())
+        with open(os.path.join(out_dir, 'batch_report.json')) as f:
+            self.assertEqual(json.load(f)['succeeded'], 2)
+
+    def test_invalid_context_never_runs(self):
+        test_nb = os.path.join(self.notebook_dir, 'test.ipynb')
+        out_dir = os.path.join(self.tmp, 'runs')
+        with open(self.contexts, 'a') as f:
+            f.write(json.dumps({'a': 'many', 'b': 'third'}) + '\n')
+
+        report = execute_batch(test_nb, self.contexts, out_dir=out_dir, jobs=2)
+        self.assertEqual((report['total'], report['succeeded'], report['failed']), (3, 2, 1))
+        failed = [r for r in report['runs'] if r['status'] == 'failed'][0]
+        self.assertEqual(failed['run_id'], '2')
+        self.assertIn("a: expected a number, got 'many'", failed['error'])
+        self.assertFalse(os.path.exists(os.path.join(out_dir, '2', 'test-output.ipynb')))
+
+
+def _write_notebook(path, parameters, source):
+    nb = new_notebook(cells=[new_code_cell(parameters, metadata={'tags': ['parameters']}), new_code_cell(source)])
+    nb.metadata['kernelspec'] = {'name': 'python3', 'display_name': 'Python 3', 'language': 'python'}
+    nbformat.write(nb, path)
+
+
+class TestFanOut(unittest.TestCase):
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.tmp = tempfile.mkdtemp()
+        os.chdir(self.tmp)
+
+        _write_notebook('granules.ipynb', 'from typing import List\ngranules: List = []\nfactor = 1  # type: int',
+                        'import json\nwith open("result.json", "w") as f:\n'
+                        '    json.dump({"total": sum(granules) * factor}, f)')
+        _write_notebook('reduce.ipynb', 'from typing import List\nfanout_dirs: List = []',
+                        'import json, os\nresults = [json.load(open(os.path.join(d, "result.json"))) '
+                        'for d in fanout_dirs]\nwith open("total.json", "w") as f:\n'
+                        '    json.dump([r["total"] for r in results], f)')
+        with open('_context.json', 'w') as f:
+            json.dump({'granules': list(range(10)), 'factor': 2}, f)
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        shutil.rmtree(self.tmp)
+
+    def test_split_chunks(self):
+        self.assertEqual(split_chunks(list(range(5)), chunks=2), [[0, 1], [2, 3, 4]])
+        self.assertEqual(split_chunks(list(range(5)), chunks=8), [[0], [1], [2], [3], [4]])
+        self.assertEqual(split_chunks(list(range(5)), chunk_size=2), [[0, 1], [2, 3], [4]])
+        self.assertEqual(split_chunks([], chunks=4), [])
+
+    def test_execute_fanout(self):
+        report = execute_fanout('granules.ipynb', '_context.json', 'granules', chunks=3, jobs=2,
+                                reducer='reduce.ipynb', execute_kwargs={'in_process': True})
+        self.assertEqual([r['run_id'] for r in report['runs']], ['chunk_0', 'chunk_1', 'chunk_2'])
+        self.assertEqual(report['succeeded'], 3)
+
+        with open('total.json') as f:
+            self.assertEqual(json.load(f), [0 + 2 + 4, 6 + 8 + 10, 12 + 14 + 16 + 18])
+        self.assertTrue(os.path.isfile('reduce-output.ipynb'))
+
+    def test_fanout_requires_a_list_parameter(self):
+        with self.assertRaises(RuntimeError) as e:
+            execute_fanout('granules.ipynb', '_context.json', 'factor')
+        self.assertIn('must be a list parameter', str(e.exception))
+        with open('_alt_error.txt') as f:
+            self.assertIn('factor must be a list parameter', f.read())
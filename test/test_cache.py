@@ -0,0 +1,107 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+from concurrent.futures import ProcessPoolExecutor
+
+from notebook_pge_wrapper.cache import InspectionCache
+from notebook_pge_wrapper.inspection import NotebookInspection, inspect_parameters_cell, read_parameters_cell
+
+
+def _inspect_in_process(cache_file, nb_path):
+    InspectionCache(cache_file=cache_file).get_or_inspect(nb_path, lambda p: inspect_parameters_cell(
+        read_parameters_cell(p)))
+
+
+class TestInspectionCache(unittest.TestCase):
+    def setUp(self):
+        self.notebook_dir = "test/notebook_pges"
+        self.tmp = tempfile.mkdtemp()
+        self.cache = InspectionCache(cache_file=os.path.join(self.tmp, 'cache.json'), max_entries=2)
+        self.calls = []
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def _inspect(self, nb_path):
+        self.calls.append(nb_path)
+        return inspect_parameters_cell(read_parameters_cell(nb_path))
+
+    def _copy(self, nb, name):
+        dest = os.path.join(self.tmp, name)
+        shutil.copy(os.path.join(self.notebook_dir, nb), dest)
+        return dest
+
+    def test_hit_and_miss(self):
+        nb_path = self._copy('test.ipynb', 'a.ipynb')
+
+        params = self.cache.get_or_inspect(nb_path, self._inspect)
+        self.assertEqual(self.cache.get_or_inspect(nb_path, self._inspect), params)
+        self.assertEqual(list(params), list(self._inspect(nb_path)))  # parameter order is kept
+        self.calls = []
+
+        # same content under a different path or mtime is still a hit
+        copy_path = self._copy('test.ipynb', 'b.ipynb')
+        self.cache.get_or_inspect(copy_path, self._inspect)
+        os.utime(nb_path, (0, 0))
+        self.cache.get_or_inspect(nb_path, self._inspect)
+        self.assertEqual(self.calls, [])
+
+        stats = self.cache.stats()
+        self.assertEqual(stats['hits'], 3)
+        self.assertEqual(stats['misses'], 1)
+        self.assertEqual(stats['entries'], 2)
+
+    def test_lru_eviction(self):
+        a = self._copy('test.ipynb', 'a.ipynb')
+        b = self._copy('test2.ipynb', 'b.ipynb')
+        c = self._copy('test2.ipynb', 'c.ipynb')
+        with open(c, 'a') as f:
+            f.write('\n')
+
+        self.cache.get_or_inspect(a, self._inspect)
+        self.cache.get_or_inspect(b, self._inspect)
+        self.cache.get_or_inspect(a, self._inspect)
+        self.cache.get_or_inspect(c, self._inspect)  # evicts b, the least recently used
+
+        entries = self.cache._load()['entries']
+        self.assertEqual(sorted(entries), sorted([os.path.abspath(a), os.path.abspath(c)]))
+
+        self.assertEqual(self.cache.clear(), 2)
+        self.assertEqual(self.cache.stats()['entries'], 0)
+
+    def test_hit_does_not_rewrite(self):
+        nb_path = self._copy('test.ipynb', 'a.ipynb')
+        self.cache.get_or_inspect(nb_path, self._inspect)
+        st = os.stat(self.cache.cache_file)
+
+        for _ in range(3):
+            self.cache.get_or_inspect(nb_path, self._inspect)
+        self.assertEqual(os.stat(self.cache.cache_file).st_ino, st.st_ino)  # never replaced
+        self.assertEqual(self.cache.stats()['hits'], 3)
+
+    def test_concurrent_updates(self):
+        nb_paths = [self._copy('test.ipynb', '%d.ipynb' % i) for i in range(8)]
+        for i, nb_path in enumerate(nb_paths):
+            with open(nb_path, 'a') as f:
+                f.write('\n' * i)  # different content, every notebook is a miss
+        with ProcessPoolExecutor(max_workers=4) as executor:
+            list(executor.map(_inspect_in_process, [self.cache.cache_file] * len(nb_paths), nb_paths))
+
+        cache = InspectionCache(cache_file=self.cache.cache_file)
+        self.assertEqual(sorted(cache._load()['entries']), sorted(os.path.abspath(p) for p in nb_paths))
+        self.assertEqual(cache.stats()['misses'], 8)
+
+    def test_cached_parameters_keep_their_line(self):
+        nb_path = self._copy('test.ipynb', 'a.ipynb')
+        env = {'NOTEBOOK_PGE_WRAPPER_CACHE': '1', 'XDG_CACHE_HOME': self.tmp}
+        with mock.patch.dict(os.environ, env):
+            NotebookInspection(nb_path)
+            cached = NotebookInspection(nb_path)
+        with mock.patch.dict(os.environ, {'NOTEBOOK_PGE_WRAPPER_CACHE': '0'}):
+            inspected = NotebookInspection(nb_path)
+        self.assertEqual([p.lineno for p in cached.parameters.values()],
+                         [p.lineno for p in inspected.parameters.values()])
+        self.assertIsNotNone(cached.parameters['a'].lineno)
+        self.assertEqual(cached.params, inspected.params)
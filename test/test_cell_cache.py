@@ -0,0 +1,130 @@
+import os
+import json
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+import nbformat
+from nbformat.v4 import new_notebook, new_code_cell
+
+from notebook_pge_wrapper.execute_notebook import execute
+from notebook_pge_wrapper.cell_cache import CellCache, CellDependencies, cell_keys
+
+
+class TestCellKeys(unittest.TestCase):
+    def test_dependencies(self):
+        deps = CellDependencies('\n'.join([
+            'import numpy as np',
+            'from os import path',
+            '@decorator',
+            'def f(x):',
+            '    local = x',
+            '    return local',
+            'table = sorted(data, key=lambda v: v)',
+            'for i in range(n):',
+            '    total += i',
+            'squares = [j * j for j in table]',
+        ]))
+        self.assertEqual(deps.stores, ['table', 'i', 'total', 'squares'])
+        self.assertEqual(deps.defines, ['np', 'path', 'f', 'table', 'i', 'total', 'squares'])
+        self.assertTrue({'data', 'n', 'decorator', 'x'}.issubset(deps.loads))
+        self.assertEqual(deps.prelude.splitlines(), ['import numpy as np', 'from os import path', '@decorator',
+                                                     'def f(x):', '    local = x', '    return local'])
+
+    def test_keys(self):
+        def keys(a, b, setup='table = [a] * 3'):
+            cells = [
+                new_code_cell('a = 1\nb = 2', metadata={'tags': ['parameters']}),
+                new_code_cell('a = %r\nb = %r' % (a, b), metadata={'tags': ['injected-parameters']}),
+                new_code_cell(setup),
+                new_code_cell('result = table + [b]'),
+            ]
+            return cell_keys(cells)[0]
+
+        reference = keys(1, 2)
+        self.assertEqual(sorted(reference), [2, 3])
+        self.assertEqual(keys(1, 3)[2], reference[2])  # b isn't read by the setup cell
+        self.assertNotEqual(keys(1, 3)[3], reference[3])
+        self.assertNotEqual(keys(2, 2)[2], reference[2])
+        self.assertNotEqual(keys(2, 2)[3], reference[3])  # depends on table, so on a
+        self.assertNotEqual(keys(1, 2, setup='table = [a] * 4')[3], reference[3])
+
+    def test_keys_of_mutated_names(self):
+        def keys(threshold, setup):
+            cells = [
+                new_code_cell('threshold = 1', metadata={'tags': ['parameters']}),
+                new_code_cell('threshold = %r' % threshold, metadata={'tags': ['injected-parameters']}),
+                new_code_cell('config = {}\nitems = []\nclass Obj:\n    pass\nobj = Obj()'),
+                new_code_cell(setup),
+                new_code_cell('result = (config, items, obj.__dict__)', metadata={'tags': ['cache']}),
+            ]
+            return cell_keys(cells)[0][4]
+
+        for setup in ('config["t"] = threshold', 'items.append(threshold)', 'obj.attr = threshold',
+                      'config["t"] = 0\nconfig["t"] += threshold'):
+            self.assertNotEqual(keys(1, setup), keys(5, setup), setup)
+
+
+class TestCellCache(unittest.TestCase):
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.tmp = tempfile.mkdtemp()
+        os.chdir(self.tmp)
+        self.env = mock.patch.dict(os.environ, {'XDG_CACHE_HOME': os.path.join(self.tmp, 'cache')})
+        self.env.start()
+
+        nb = new_notebook(cells=[
+            new_code_cell('scale = 1\nname = "a"', metadata={'tags': ['parameters']}),
+            new_code_cell('import math\nwith open("runs.txt", "a") as f:\n    f.write("run\\n")\n'
+                          'table = [i * scale for i in range(3)]\nprint("built")', metadata={'tags': ['cache']}),
+            new_code_cell('print(name, table, math.floor(2.5))'),
+        ])
+        nb.metadata['kernelspec'] = {'name': 'python3', 'display_name': 'Python 3', 'language': 'python'}
+        nbformat.write(nb, 'cached.ipynb')
+
+    def tearDown(self):
+        self.env.stop()
+        os.chdir(self.cwd)
+        shutil.rmtree(self.tmp)
+
+    def _execute(self, ctx, **kwargs):
+        with open('_context.json', 'w') as f:
+            json.dump(ctx, f)
+        execute('cached.ipynb', ctx_file='_context.json', in_process=True, **kwargs)
+        with open('runs.txt') as f:
+            runs = len(f.readlines())
+        code_cells = [c for c in nbformat.read('cached-output.ipynb', as_version=4).cells if c.cell_type == 'code']
+        return runs, code_cells
+
+    def test_cached_cell(self):
+        runs, cells = self._execute({'scale': 2, 'name': 'a'})
+        self.assertEqual(runs, 1)
+        self.assertNotIn('cache_hit', cells[2].metadata)
+        self.assertEqual(CellCache().stats()['entries'], 1)
+
+        # name isn't read by the cached cell
+        runs, cells = self._execute({'scale': 2, 'name': 'b'})
+        self.assertEqual(runs, 1)
+        self.assertTrue(cells[2].metadata['cache_hit'])
+        self.assertEqual(cells[2].outputs[0]['text'], 'built\n')
+        self.assertEqual(cells[3].outputs[0]['text'], 'b [0, 2, 4] 2\n')
+
+        runs, cells = self._execute({'scale': 3, 'name': 'b'})
+        self.assertEqual(runs, 2)
+        self.assertEqual(cells[3].outputs[0]['text'], 'b [0, 3, 6] 2\n')
+
+        runs, _ = self._execute({'scale': 3, 'name': 'b'}, cell_cache=False)
+        self.assertEqual(runs, 3)
+
+    def test_eviction(self):
+        self._execute({'scale': 2})
+        self._execute({'scale': 3})
+        cache = CellCache(max_size=1)
+        self.assertEqual(cache.stats()['entries'], 2)
+        self.assertEqual(cache.evict(), 2)
+        self.assertEqual(cache.stats()['entries'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
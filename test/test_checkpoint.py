@@ -0,0 +1,116 @@
+import os
+import json
+import shutil
+import tempfile
+import unittest
+
+import nbformat
+from nbformat.v4 import new_notebook, new_code_cell
+
+from notebook_pge_wrapper.checkpoint import has_checkpoint_cells
+from notebook_pge_wrapper.execute_notebook import execute
+
+
+class TestCheckpoint(unittest.TestCase):
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.tmp = tempfile.mkdtemp()
+        os.chdir(self.tmp)
+
+        self.nb = os.path.join(self.tmp, 'long.ipynb')
+        self._write_notebook('raise RuntimeError("preempted")')
+        self.ctx = os.path.join(self.tmp, '_context.json')
+        with open(self.ctx, 'w') as f:
+            json.dump({'a': 2}, f)
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        shutil.rmtree(self.tmp)
+
+    def _write_notebook(self, last_cell):
+        nb = new_notebook(cells=[
+            new_code_cell('a = 1', metadata={'tags': ['parameters']}),
+            new_code_cell('import os', metadata={'tags': ['resume-rerun']}),
+            new_code_cell('with open("runs.txt", "a") as f:\n    f.write("x")\nb = a * 10\nprint(b)',
+                          metadata={'tags': ['checkpoint'], 'checkpoint_variables': ['b']}),
+            new_code_cell(last_cell),
+        ])
+        nb.metadata['kernelspec'] = {'name': 'python3', 'display_name': 'Python 3', 'language': 'python'}
+        nbformat.write(nb, self.nb)
+
+    def _resume_notebook(self):
+        with open('fixed', 'w'):  # the cause of the failure is gone, the notebook and context are the same
+            pass
+
+    def test_checkpoint_and_resume(self):
+        self._write_notebook('import os\nif not os.path.exists("fixed"):\n    raise RuntimeError("preempted")\n'
+                             'print(b + 1)')
+        with self.assertRaises(Exception):
+            execute(self.nb, ctx_file=self.ctx)
+
+        with open('_pge_checkpoint.json') as f:
+            checkpoint = json.load(f)
+        self.assertEqual(checkpoint['cell'], 3)  # the injected-parameters cell is at 1
+        self.assertEqual(len(checkpoint['state']), 1)
+
+        self._resume_notebook()
+        execute(self.nb, ctx_file=self.ctx, resume=True)
+
+        with open('runs.txt') as f:
+            self.assertEqual(f.read(), 'x')  # the checkpoint cell wasn't executed again
+        out_nb = nbformat.read('long-output.ipynb', as_version=4)
+        self.assertEqual(out_nb.cells[3].outputs[0]['text'], '20\n')  # copied from the previous output notebook
+        self.assertEqual(out_nb.cells[4].outputs[0]['text'], '21\n')  # b restored from the checkpoint
+
+    def test_resume_with_other_context(self):
+        self._write_notebook('import os\nif not os.path.exists("fixed"):\n    raise RuntimeError("preempted")')
+        with self.assertRaises(Exception):
+            execute(self.nb, ctx_file=self.ctx)
+
+        with open(self.ctx, 'w') as f:
+            json.dump({'a': 3}, f)
+        self._resume_notebook()
+        execute(self.nb, ctx_file=self.ctx, resume=True)
+        with open('runs.txt') as f:
+            self.assertEqual(f.read(), 'xx')  # executed from the start
+
+    def test_no_resume_discards_checkpoint(self):
+        with self.assertRaises(Exception):
+            execute(self.nb, ctx_file=self.ctx)
+        self.assertTrue(os.path.isfile('_pge_checkpoint.json'))
+        self._write_notebook('pass')
+        execute(self.nb, ctx_file=self.ctx)
+        with open('runs.txt') as f:
+            self.assertEqual(f.read(), 'xx')
+
+    def test_has_checkpoint_cells(self):
+        self.assertTrue(has_checkpoint_cells(self.nb))
+        nb = nbformat.read(self.nb, as_version=4)
+        nb.cells[2].metadata['tags'] = []
+        nbformat.write(nb, self.nb)
+        self.assertFalse(has_checkpoint_cells(self.nb))
+
+        path = os.path.join(self.tmp, 'boundary.ipynb')
+        for padding in range((1 << 20) - 12, (1 << 20) + 1):  # the tag across the end of the first chunk
+            with open(path, 'wb') as f:
+                f.write(b' ' * padding + b'"checkpoint"')
+            self.assertTrue(has_checkpoint_cells(path), padding)
+
+    def test_no_checkpoint_cells(self):
+        self._write_notebook('print(a)')
+        nb = nbformat.read(self.nb, as_version=4)
+        nb.cells[2].metadata['tags'] = []
+        nbformat.write(nb, self.nb)
+        with open('_pge_checkpoint.json', 'w') as f:
+            json.dump({'hash': 'stale'}, f)
+
+        execute(self.nb, ctx_file=self.ctx)
+        self.assertTrue(os.path.isfile('_pge_checkpoint.json'))  # no checkpointer, nothing touched
+        with self.assertLogs(level='WARNING') as logs:
+            execute(self.nb, ctx_file=self.ctx, resume=True)
+        self.assertIn('executing the notebook from the start', '\n'.join(logs.output))
+        self.assertFalse(os.path.isfile('_pge_checkpoint.json'))
+
+
+if __name__ == '__main__':
+    unittest.main()
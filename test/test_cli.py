@@ -0,0 +1,68 @@
+import os
+import sys
+import subprocess
+import unittest
+from unittest import mock
+
+from click.testing import CliRunner
+
+from notebook_pge_wrapper.cli import cli
+
+
+class TestCliStartup(unittest.TestCase):
+    # cumulative import time budget (in microseconds) of the CLI entry point, without papermill it takes ~50ms
+    IMPORT_TIME_BUDGET = 300000
+    LAZY_MODULES = ('papermill', 'jinja2', 'yaml', 'nbformat', 'nbclient', 'jupyter_client')
+
+    def _import_times(self):
+        """
+        :return: Dict[str, int], module -> cumulative import time (us) reported by python -X importtime
+        """
+        output = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import notebook_pge_wrapper.cli'],
+                                stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True, check=True)
+        import_times = {}
+        for line in output.stderr.splitlines():
+            if not line.startswith('import time:') or 'cumulative' in line:
+                continue
+            _, cumulative, module = line[len('import time:'):].split('|')
+            import_times[module.strip()] = int(cumulative)
+        return import_times
+
+    def test_heavy_modules_are_not_imported(self):
+        import_times = self._import_times()
+        for module in self.LAZY_MODULES:
+            self.assertNotIn(module, import_times, '%s is imported with the CLI entry point' % module)
+
+    def test_import_time_budget(self):
+        # taking the best of 3 runs to smooth out the noise of a busy machine
+        import_time = min(self._import_times()['notebook_pge_wrapper.cli'] for _ in range(3))
+        self.assertLess(import_time, self.IMPORT_TIME_BUDGET)
+
+    def test_help(self):
+        result = CliRunner().invoke(cli, ['--help'])
+        self.assertEqual(result.exit_code, 0)
+        self.assertIn('specs', result.output)
+
+
+class TestExecuteOptions(unittest.TestCase):
+    def _usage_error(self, *args):
+        with mock.patch.dict(os.environ, {'NOTEBOOK_PGE_WRAPPER_DAEMON_SOCKET': '/tmp/pool.sock'}):
+            result = CliRunner().invoke(cli, ['execute', 'test/notebook_pges/test.ipynb'] + list(args))
+        self.assertEqual(result.exit_code, 2, result.output)  # click.UsageError, before anything is executed
+        return result.output
+
+    def test_in_process_refuses_process_limits(self):
+        self.assertIn('not supported with --in-process', self._usage_error('--in-process', '--max-cpu', '10'))
+        self.assertIn('not supported with --in-process', self._usage_error('--in-process', '--max-rss', '1GB'))
+
+    def test_fan_out_refuses_ignored_options(self):
+        self.assertIn('--params not supported with --fan-out',
+                      self._usage_error('--fan-out', 'd', '--params', 'docker/hysds-io.json.test'))
+        self.assertIn('--daemon-socket, --resume not supported with --fan-out',
+                      self._usage_error('--fan-out', 'd', '--daemon-socket', '/tmp/pool.sock', '--resume'))
+
+    def test_fan_out_options_require_fan_out(self):
+        self.assertIn('--chunk-size only supported with --fan-out', self._usage_error('--chunk-size', '2'))
+        self.assertIn('--reducer only supported with --fan-out', self._usage_error('--reducer', 'reducer.ipynb'))
+        self.assertIn('--fan-out-jobs, --fan-out-dir only supported with --fan-out',
+                      self._usage_error('--fan-out-jobs', '2', '--fan-out-dir', 'runs'))
@@ -1,7 +1,15 @@
 import os
+import json
+import shutil
+import tempfile
 import unittest
 from notebook_pge_wrapper.spec_generator import extract_hysds_specs, generate_job_spec, _get_hysdsio_param_type, \
-    _generate_hysdsio_params
+    _generate_hysdsio_params, generate_all_spec_files, commit_spec_files, write_specs_bundle, SpecsBundle, GENERATED, \
+    SKIPPED, FAILED
+import papermill
+
+from notebook_pge_wrapper import inspection as inspection_module
+from notebook_pge_wrapper.inspection import NotebookInspection, inspect, read_parameters_cell
 
 
 class TestInspection(unittest.TestCase):
@@ -134,3 +142,130 @@ class TestInspection(unittest.TestCase):
         command = hysds_specs.get('command')
 
         self.assertEqual(expected_command, command)
+
+    def test_shared_inspection(self):
+        nb_path = os.path.join(self.notebook_dir, self.test_nb)
+
+        inspection = inspect(nb_path)
+        self.assertIsInstance(inspection, NotebookInspection)
+        self.assertIs(inspect(inspection), inspection)
+
+        self.assertDictEqual(extract_hysds_specs(inspection), extract_hysds_specs(nb_path))
+        self.assertEqual(_generate_hysdsio_params(inspection), _generate_hysdsio_params(nb_path))
+
+    def test_streaming_inspection_matches_papermill(self):
+        for nb in (self.test_nb, self.test_nb_2):
+            nb_path = os.path.join(self.notebook_dir, nb)
+            self.assertDictEqual(inspect(nb_path).params, papermill.inspect_notebook(nb_path))
+
+    def test_parameters_cell_without_ijson(self):
+        nb_path = os.path.join(self.notebook_dir, self.test_nb)
+        streamed = read_parameters_cell(nb_path)
+
+        ijson = inspection_module.ijson
+        inspection_module.ijson = None
+        try:
+            self.assertEqual(read_parameters_cell(nb_path), streamed)
+        finally:
+            inspection_module.ijson = ijson
+        self.assertTrue(streamed.startswith('from typing import List, Dict'))
+
+
+class TestSpecFileGeneration(unittest.TestCase):
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.notebook_dir = os.path.join(self.cwd, "test/notebook_pges")
+        self.project = tempfile.mkdtemp()
+
+        os.mkdir(os.path.join(self.project, 'docker'))
+        os.mkdir(os.path.join(self.project, 'notebook_pges'))
+        shutil.copy(os.path.join(self.notebook_dir, 'test.ipynb'), os.path.join(self.project, 'notebook_pges'))
+        with open(os.path.join(self.project, 'notebook_pges', 'broken.ipynb'), 'w') as f:
+            f.write('{not a notebook')
+        os.chdir(self.project)
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        shutil.rmtree(self.project)
+
+    def test_generate_all_spec_files(self):
+        for jobs in (1, 2):
+            results = generate_all_spec_files(['broken.ipynb', 'test.ipynb'], 'ops', jobs=jobs, force=True)
+
+            self.assertEqual([(nb, status) for nb, status, _ in results],
+                             [('broken.ipynb', FAILED), ('test.ipynb', GENERATED)])
+            self.assertIsNotNone(results[0][2])
+            self.assertTrue(os.path.isfile(os.path.join('docker', 'hysds-io.json.test')))
+            self.assertTrue(os.path.isfile(os.path.join('docker', 'job-spec.json.test')))
+
+    def test_unchanged_notebooks_are_skipped(self):
+        hysdsio_file = os.path.join('docker', 'hysds-io.json.test')
+
+        results = generate_all_spec_files(['test.ipynb'], 'ops')
+        self.assertEqual(results, [('test.ipynb', GENERATED, None)])
+        mtime = os.stat(hysdsio_file).st_mtime_ns
+
+        results = generate_all_spec_files(['test.ipynb'], 'ops')
+        self.assertEqual(results, [('test.ipynb', SKIPPED, None)])
+        self.assertEqual(os.stat(hysdsio_file).st_mtime_ns, mtime)
+
+        # settings are part of the hash
+        results = generate_all_spec_files(['test.ipynb'], 'jovyan')
+        self.assertEqual(results, [('test.ipynb', GENERATED, None)])
+
+        results = generate_all_spec_files(['test.ipynb'], 'jovyan', force=True)
+        self.assertEqual(results, [('test.ipynb', GENERATED, None)])
+
+        os.remove(hysdsio_file)
+        results = generate_all_spec_files(['test.ipynb'], 'jovyan')
+        self.assertEqual(results, [('test.ipynb', GENERATED, None)])
+
+    def test_identical_spec_files_are_not_rewritten(self):
+        hysdsio_file = os.path.join('docker', 'hysds-io.json.test')
+
+        generate_all_spec_files(['test.ipynb'], 'ops')
+        mtime = os.stat(hysdsio_file).st_mtime_ns
+
+        results = generate_all_spec_files(['test.ipynb'], 'ops', force=True)
+        self.assertEqual(results, [('test.ipynb', GENERATED, None)])
+        self.assertEqual(os.stat(hysdsio_file).st_mtime_ns, mtime)
+        self.assertEqual(sorted(f for f in os.listdir('docker') if f.endswith('.tmp')), [])
+
+    def test_commit_spec_files_is_atomic(self):
+        spec_file = os.path.join('docker', 'hysds-io.json.a')
+        self.assertEqual(commit_spec_files({spec_file: b'{}'}), [spec_file])
+        self.assertEqual(commit_spec_files({spec_file: b'{}'}), [])
+
+        # the second file can't be staged, the first one is left untouched
+        with self.assertRaises(OSError):
+            commit_spec_files({spec_file: b'{"a": 1}', os.path.join('missing', 'job-spec.json.a'): b'{}'})
+        with open(spec_file, 'rb') as f:
+            self.assertEqual(f.read(), b'{}')
+        self.assertEqual(sorted(f for f in os.listdir('docker') if f.endswith('.tmp')), [])
+
+    def test_specs_bundle(self):
+        shutil.copy(os.path.join('notebook_pges', 'test.ipynb'), os.path.join('notebook_pges', 'other.ipynb'))
+        generate_all_spec_files(['other.ipynb', 'test.ipynb'], 'ops')
+        location = write_specs_bundle(['other.ipynb', 'test.ipynb'])
+        self.assertEqual(location, os.path.join('docker', 'specs-bundle.jsonl'))
+
+        bundle = SpecsBundle()
+        self.assertEqual(bundle.names, ['other', 'test'])
+        entry = bundle.load('test.ipynb')
+        with open(os.path.join('docker', 'job-spec.json.test')) as f:
+            self.assertEqual(entry['job-spec'], json.load(f))
+        with open(os.path.join('docker', 'hysds-io.json.test')) as f:
+            self.assertEqual(entry['hysds-io'], json.load(f))
+        self.assertEqual([e['name'] for e in bundle], ['other', 'test'])
+
+        with open(location, 'rb') as f:
+            lines = f.readlines()
+        self.assertEqual(len(lines), 3)
+        self.assertTrue(lines[1].startswith(b'{"name":"test",'))
+        self.assertEqual(bundle.index['test'], [len(lines[0]), len(lines[1])])
+
+        with self.assertRaises(RuntimeError):
+            bundle.load('missing')
+        with self.assertRaises(RuntimeError):
+            SpecsBundle(os.path.join('docker', 'job-spec.json.test'))
+
@@ -0,0 +1,66 @@
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+from notebook_pge_wrapper.kernel_pool import KernelPool, KernelPoolServer, submit
+
+
+class TestKernelPool(unittest.TestCase):
+    def setUp(self):
+        self.test_loc = os.path.dirname(os.path.abspath(__file__))
+        self.notebook_dir = os.path.join(self.test_loc, "notebook_pges")
+        self.tmp = tempfile.mkdtemp()
+        self.socket_path = os.path.join(self.tmp, 'pool.sock')
+
+        self.pool = KernelPool(size=1, preload=['json'], max_reuse=2)
+        self.pool.start()
+        self.server = KernelPoolServer(self.socket_path, self.pool)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.pool.shutdown()
+        shutil.rmtree(self.tmp)
+
+    def test_kernel_reuse_and_recycling(self):
+        test_nb = os.path.join(self.notebook_dir, 'test.ipynb')
+
+        pids = []
+        for i in range(3):
+            # waiting for the previous job's kernel to be handed back to the pool
+            kernel = self.pool._kernels.get(timeout=60)
+            pids.append(kernel.pid)
+            self.pool._kernels.put(kernel)
+
+            submit(self.socket_path, test_nb, 'test-output-%d.ipynb' % i, {'a': i}, cwd=self.tmp)
+            self.assertTrue(os.path.isfile(os.path.join(self.tmp, 'test-output-%d.ipynb' % i)))
+            self.assertTrue(os.path.isfile(os.path.join(self.tmp, '_alt_info.txt')))
+
+        # the kernel is reused by the second job and replaced after max_reuse (2) jobs
+        self.assertEqual(pids[0], pids[1])
+        self.assertNotEqual(pids[1], pids[2])
+
+    def test_jobs_do_not_leak(self):
+        test_nb = os.path.join(self.notebook_dir, 'test.ipynb')
+
+        def job(i):
+            submit(self.socket_path, test_nb, 'test-output.ipynb', {'a': i}, cwd=self.tmp)
+            kernel = self.pool._kernels.get(timeout=60)  # handed back (or recycled) once the response is sent
+            self.pool._kernels.put(kernel)
+            return len(os.listdir('/proc/self/fd')), threading.active_count()
+
+        fds, threads = job(0)
+        after = [job(i) for i in range(1, 5)]  # the kernel is recycled every max_reuse (2) jobs
+        self.assertEqual([t for _, t in after], [threads] * len(after))
+        # a leak is ~16 fds per job, recycling a kernel may leave a socket closing
+        self.assertLessEqual(max(f for f, _ in after), fds + 1)
+
+    def test_failed_job(self):
+        with self.assertRaises(RuntimeError):
+            submit(self.socket_path, os.path.join(self.tmp, 'missing.ipynb'), 'out.ipynb', {}, cwd=self.tmp)
+
+        # the kernel is still available for the next job
+        submit(self.socket_path, os.path.join(self.notebook_dir, 'test.ipynb'), 'out.ipynb', {}, cwd=self.tmp)
@@ -1,7 +1,19 @@
 import os
 import unittest
 
-from notebook_pge_wrapper.execute_notebook import execute, _create_nb_output_file_name
+import json
+import shutil
+import asyncio
+import tempfile
+
+import nbformat
+from nbformat.v4 import new_notebook, new_code_cell
+from papermill.exceptions import PapermillExecutionError
+
+from notebook_pge_wrapper.execute_notebook import execute, execute_async, _create_nb_output_file_name, \
+    _build_notebook_params, _read_params_file, _read_context
+from notebook_pge_wrapper.inspection import inspect
+from notebook_pge_wrapper.spec import ContextValidationError, filter_context
 
 
 class TestJobWorkerFuncs(unittest.TestCase):
@@ -11,6 +23,9 @@ class TestJobWorkerFuncs(unittest.TestCase):
 
         self.stdout_file = '_alt_info.txt'
         self.stderr_file = '_alt_error.txt'
+        self.metrics_file = '_pge_metrics.jsonl'
+        self.metrics_summary_file = '_pge_metrics.json'
+        self.resources_file = '_pge_resources.jsonl'
 
     def tearDown(self):
         stdout_file = os.path.join(os.curdir, self.stdout_file)
@@ -20,6 +35,9 @@ class TestJobWorkerFuncs(unittest.TestCase):
             os.remove(stdout_file)
         if os.path.exists(stderr_file):
             os.remove(stderr_file)
+        for f in (self.metrics_file, self.metrics_summary_file, self.resources_file, '_alt_traceback.txt'):
+            if os.path.exists(f):
+                os.remove(f)
 
         for nb in os.listdir(os.getcwd()):
             if nb.endswith('-output.ipynb'):
@@ -30,8 +48,203 @@ class TestJobWorkerFuncs(unittest.TestCase):
         test_context = os.path.join(self.test_loc, '_context.json')
         execute(test_nb, ctx_file=test_context)
 
+    def test_cell_metrics(self):
+        test_nb = os.path.join(self.notebook_dir, 'test.ipynb')
+        test_context = os.path.join(self.test_loc, '_context.json')
+        execute(test_nb, ctx_file=test_context)
+
+        with open(self.metrics_file) as f:
+            cells = [json.loads(line) for line in f]
+        self.assertEqual([c['tags'] for c in cells], [['parameters'], ['injected-parameters'], []])
+        for c in cells:
+            self.assertEqual(c['status'], 'ok')
+            self.assertGreaterEqual(c['duration'], 0)
+        self.assertGreater(cells[-1]['output_size'], len('[]'))  # the print statements
+
+        with open(self.metrics_summary_file) as f:
+            summary = json.load(f)
+        self.assertEqual(summary['executed_cells'], 3)
+        self.assertEqual(summary['failed_cells'], [])
+        self.assertEqual(len(summary['slowest_cells']), 3)
+
+    def test_in_process_execution(self):
+        test_nb = os.path.join(self.notebook_dir, 'test.ipynb')
+        test_context = os.path.join(self.test_loc, '_context.json')
+
+        execute(test_nb, ctx_file=test_context)
+        kernel_nb = nbformat.read('test-output.ipynb', as_version=4)
+        execute(test_nb, ctx_file=test_context, in_process=True)
+        in_process_nb = nbformat.read('test-output.ipynb', as_version=4)
+
+        self.assertEqual([c.get('outputs') for c in in_process_nb.cells], [c.get('outputs') for c in kernel_nb.cells])
+        self.assertEqual([c.get('execution_count') for c in in_process_nb.cells], [1, 2, 3])
+        with open(self.stdout_file) as f:
+            self.assertIn('hello world', f.read())
+
+    def test_in_process_cell_error(self):
+        tmp = tempfile.mkdtemp()
+        try:
+            nb = new_notebook(cells=[
+                new_code_cell('limit = 1', metadata={'tags': ['parameters']}),
+                new_code_cell('import sys\nprint("err", file=sys.stderr)\nlimit * 2'),
+                new_code_cell('def f():\n    return 1 / limit\nf()'),
+            ])
+            nb.metadata['kernelspec'] = {'name': 'python3', 'display_name': 'Python 3', 'language': 'python'}
+            nb_path = os.path.join(tmp, 'fails.ipynb')
+            nbformat.write(nb, nb_path)
+            ctx_file = os.path.join(tmp, '_context.json')
+            with open(ctx_file, 'w') as f:
+                json.dump({'limit': 0}, f)
+
+            out_nb = os.path.join(tmp, 'fails-output.ipynb')
+            with self.assertRaises(PapermillExecutionError) as e:
+                execute(nb_path, out_nb=out_nb, ctx_file=ctx_file, in_process=True)
+            self.assertEqual(e.exception.ename, 'ZeroDivisionError')
+            self.assertIn('return 1 / limit', '\n'.join(e.exception.traceback))
+
+            cells = nbformat.read(out_nb, as_version=4).cells
+            self.assertEqual(cells[3].outputs, [
+                {'output_type': 'stream', 'name': 'stderr', 'text': 'err\n'},
+                {'output_type': 'execute_result', 'data': {'text/plain': '0'}, 'metadata': {}, 'execution_count': 3},
+            ])
+        finally:
+            shutil.rmtree(tmp)
+
+    def test_in_process_refuses_process_limits(self):
+        test_nb = os.path.join(self.notebook_dir, 'test.ipynb')
+        test_context = os.path.join(self.test_loc, '_context.json')
+        with self.assertRaises(RuntimeError) as e:
+            execute(test_nb, ctx_file=test_context, in_process=True, limits={'max_cpu': 10})
+        self.assertIn("memory and cpu limits aren't supported", str(e.exception))
+        self.assertFalse(os.path.exists(self.stdout_file))  # refused before the execution
+
+    def test_invalid_context_fails_before_execution(self):
+        test_nb = os.path.join(self.notebook_dir, 'test.ipynb')
+        ctx = _read_context(os.path.join(self.test_loc, '_context.json'))
+        ctx.update({'a': 'many', 'g': 'perhaps', 'c': '1.5'})
+        with tempfile.NamedTemporaryFile('w', suffix='.json', delete=False) as f:
+            json.dump(ctx, f)
+        try:
+            with self.assertRaises(ContextValidationError):
+                execute(test_nb, ctx_file=f.name)
+        finally:
+            os.remove(f.name)
+
+        with open(self.stderr_file) as f:
+            error = f.read()
+        self.assertIn("a: expected a number, got 'many'", error)
+        self.assertIn("g: expected one of ['yes', 'no', 'maybe so'], got 'perhaps'", error)
+        self.assertNotIn('c:', error)
+        self.assertFalse(os.path.exists(self.stdout_file))  # the notebook never started
+
     def test_output_nb_name_generation(self):
         test_nb = os.path.join(self.notebook_dir, 'test.ipynb')
         output_nb = _create_nb_output_file_name(test_nb)
         expected_output_nb = 'test-output.ipynb'
         self.assertEqual(output_nb, expected_output_nb)
+
+    def test_params_from_job_spec(self):
+        ctx = _read_context(os.path.join(self.test_loc, '_context.json'))
+
+        job_spec = {'params': [{'name': k, 'destination': 'context'} for k in 'abcdefgh']}
+        with tempfile.NamedTemporaryFile('w', suffix='.json', delete=False) as f:
+            json.dump(job_spec, f)
+        try:
+            parameters = _read_params_file(f.name)
+        finally:
+            os.remove(f.name)
+
+        self.assertEqual(list(parameters), list('abcdefgh'))
+        self.assertDictEqual(_build_notebook_params('does-not-exist.ipynb', ctx, parameters=parameters),
+                             filter_context(list('abcdefgh'), ctx))  # untyped, passed through
+
+    def test_params_from_hysdsio(self):
+        test_nb = os.path.join(self.notebook_dir, 'test.ipynb')
+        ctx = _read_context(os.path.join(self.test_loc, '_context.json'))
+
+        with tempfile.NamedTemporaryFile('w', suffix='.json', delete=False) as f:
+            json.dump({'params': inspect(test_nb).spec.hysdsio_params()}, f)
+        try:
+            parameters = _read_params_file(f.name)
+        finally:
+            os.remove(f.name)
+
+        self.assertDictEqual(_build_notebook_params('does-not-exist.ipynb', ctx, parameters=parameters),
+                             _build_notebook_params(test_nb, ctx))
+        with self.assertRaises(ContextValidationError) as e:
+            _build_notebook_params('does-not-exist.ipynb', dict(ctx, a='many', g='perhaps'), parameters=parameters)
+        self.assertIn("a: expected a number, got 'many'", str(e.exception))
+        self.assertIn("g: expected one of ['yes', 'no', 'maybe so'], got 'perhaps'", str(e.exception))
+
+
+class TestExecuteAsync(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        nb = new_notebook(cells=[
+            new_code_cell('name = "a"', metadata={'tags': ['parameters']}),
+            new_code_cell('import os\nwith open("where.txt", "w") as f:\n    f.write(os.getcwd())\n'
+                          'assert name != "bad", "bad name"\nprint(name)'),
+        ])
+        nb.metadata['kernelspec'] = {'name': 'python3', 'display_name': 'Python 3', 'language': 'python'}
+        self.nb_path = os.path.join(self.tmp, 'where.ipynb')
+        nbformat.write(nb, self.nb_path)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def test_concurrent_executions(self):
+        cwd = os.getcwd()
+        workdirs = [os.path.join(self.tmp, 'run_%d' % i) for i in range(3)]
+
+        async def run_all():
+            return await asyncio.gather(*[execute_async(self.nb_path, {'name': name}, workdir=workdir)
+                                          for name, workdir in zip(['x', 'y', 'bad'], workdirs)])
+
+        results = asyncio.run(run_all())
+        self.assertEqual(os.getcwd(), cwd)
+        self.assertFalse(os.path.exists('_alt_info.txt'))
+        self.assertEqual([r.status for r in results], ['succeeded', 'succeeded', 'failed'])
+
+        for result, workdir, name in zip(results[:2], workdirs, ['x', 'y']):
+            self.assertEqual(result.workdir, workdir)
+            self.assertEqual(result.paths['output_nb'], os.path.join(workdir, 'where-output.ipynb'))
+            self.assertGreater(result.duration, 0)
+            with open(os.path.join(workdir, 'where.txt')) as f:
+                self.assertEqual(f.read(), workdir)  # the kernel ran in the workdir
+            with open(result.paths['info']) as f:
+                self.assertIn(name, f.read())
+            with open(os.path.join(workdir, '_context.json')) as f:
+                self.assertEqual(json.load(f), {'name': name})
+
+        failed = results[2]
+        self.assertIn('bad name', failed.error)
+        self.assertTrue({'output_nb', 'info', 'error', 'traceback'}.issubset(failed.paths))
+        with open(failed.paths['traceback']) as f:
+            self.assertIn('PapermillExecutionError', f.read())
+        self.assertEqual(failed.to_dict()['status'], 'failed')
+
+    def test_peak_rss_per_cell(self):
+        nb = new_notebook(cells=[
+            new_code_cell('size = 0', metadata={'tags': ['parameters']}),
+            new_code_cell('data = bytearray(size)\ndel data'),
+            new_code_cell('x = 1'),
+        ])
+        nb.metadata['kernelspec'] = {'name': 'python3', 'display_name': 'Python 3', 'language': 'python'}
+        nb_path = os.path.join(self.tmp, 'memory.ipynb')
+        nbformat.write(nb, nb_path)
+
+        size = 200 * 1024 * 1024
+        result = asyncio.run(execute_async(nb_path, {'size': size}, workdir=self.tmp))
+        self.assertEqual(result.status, 'succeeded', result.error)
+        with open(result.paths['metrics']) as f:
+            allocating, after = [json.loads(line) for line in f][-2:]
+        self.assertGreater(allocating['peak_rss'], size)
+        self.assertLess(after['peak_rss'], size)  # the peak of the previous cell isn't carried over
+        with open(result.paths['metrics_summary']) as f:
+            self.assertEqual(json.load(f)['peak_rss'], allocating['peak_rss'])
+
+    def test_in_process_not_supported(self):
+        result = asyncio.run(execute_async(self.nb_path, {'name': 'x'}, workdir=self.tmp, in_process=True))
+        self.assertEqual(result.status, 'failed')
+        self.assertIn("workdir isn't supported", result.error)
+        self.assertIn('error', result.paths)
@@ -0,0 +1,83 @@
+import os
+import gzip
+import json
+import base64
+import shutil
+import tempfile
+import unittest
+
+from nbformat.v4 import new_code_cell, new_output
+
+from notebook_pge_wrapper.outputs import OutputLimiter, compress_notebook
+
+
+class TestOutputLimiter(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.out_nb = os.path.join(self.tmp, 'test-output.ipynb')
+        self.png = b'\x89PNG\r\n\x1a\n' + b'0' * 1000
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def _cell(self):
+        return new_code_cell('', outputs=[
+            new_output('stream', name='stdout', text='x' * 500),
+            new_output('display_data', data={'image/png': base64.b64encode(self.png).decode(), 'text/plain': 'img'}),
+            new_output('execute_result', data={'text/plain': 'y' * 500}, execution_count=1),
+        ])
+
+    def test_truncate_stream(self):
+        cell = self._cell()
+        OutputLimiter(self.out_nb, stream_mode='truncate', max_stream_bytes=10).cell_complete(None, cell, 0)
+        self.assertEqual(cell.outputs[0]['text'], '[... 490 characters truncated ...]\n' + 'x' * 10)
+        self.assertEqual(len(cell.outputs), 3)
+
+    def test_drop_stream(self):
+        cell = self._cell()
+        OutputLimiter(self.out_nb, stream_mode='drop').cell_complete(None, cell, 0)
+        self.assertEqual([o['output_type'] for o in cell.outputs], ['display_data', 'execute_result'])
+
+    def test_externalize_binary_outputs(self):
+        cell = self._cell()
+        OutputLimiter(self.out_nb, externalize_bytes=100).cell_complete(None, cell, 3)
+
+        sidecar = os.path.join(self.tmp, 'test-output_files', 'cell3_output1.png')
+        with open(sidecar, 'rb') as f:
+            self.assertEqual(f.read(), self.png)
+        data = cell.outputs[1]['data']
+        self.assertNotIn('image/png', data)
+        self.assertIn('test-output_files/cell3_output1.png', data['text/markdown'])
+
+    def test_externalize_compares_decoded_size(self):
+        cell = self._cell()
+        limit = len(self.png) + 1  # below the size of the base64 encoded png
+        OutputLimiter(self.out_nb, externalize_bytes=limit).cell_complete(None, cell, 3)
+
+        self.assertIn('image/png', cell.outputs[1]['data'])
+        self.assertFalse(os.path.exists(os.path.join(self.tmp, 'test-output_files')))
+
+    def test_max_output_bytes(self):
+        cell = self._cell()
+        OutputLimiter(self.out_nb, max_output_bytes=600).cell_complete(None, cell, 0)
+        self.assertEqual(len(cell.outputs), 2)
+        self.assertIn('2 output(s) removed', cell.outputs[1]['text'])
+
+    def test_max_output_bytes_keeps_errors(self):
+        cell = new_code_cell('', outputs=[
+            new_output('stream', name='stdout', text='x' * 5000),
+            new_output('error', ename='ValueError', evalue='boom', traceback=['Traceback', 'ValueError: boom']),
+        ])
+        OutputLimiter(self.out_nb, max_output_bytes=100).cell_complete(None, cell, 0)
+        self.assertEqual([o['output_type'] for o in cell.outputs], ['stream', 'error'])
+        self.assertIn('1 output(s) removed', cell.outputs[0]['text'])
+        self.assertEqual((cell.outputs[1]['ename'], cell.outputs[1]['evalue']), ('ValueError', 'boom'))
+
+    def test_compress_notebook(self):
+        with open(self.out_nb, 'w') as f:
+            json.dump({'cells': []}, f)
+        gz_path = compress_notebook(self.out_nb)
+
+        self.assertFalse(os.path.exists(self.out_nb))
+        with gzip.open(gz_path, 'rt') as f:
+            self.assertEqual(json.load(f), {'cells': []})
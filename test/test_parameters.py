@@ -0,0 +1,84 @@
+import unittest
+
+from notebook_pge_wrapper.parameters import Parameter, ParameterParseError, parse_parameters
+
+
+class TestParameters(unittest.TestCase):
+    def test_parse_parameters(self):
+        params = parse_parameters('\n'.join([
+            'from typing import List',
+            '',
+            'a = 100  # type: int',
+            'b: List[str] = ["a", "b"]  # input granules',
+            'c = {',
+            '    "x": 1,  # not the help of c',
+            '    "y": 2,',
+            '}',
+            'g: "enum" = ["yes", "no"]',
+            'x, y = 1, 2',
+            '_time_limit = 60',
+            'hysds_label = "label"',
+        ]))
+        self.assertEqual(list(params), ['a', 'b', 'c', 'g', '_time_limit', 'hysds_label'])
+
+        self.assertEqual(params['a'].to_dict(), {'name': 'a', 'inferred_type_name': 'int', 'default': '100',
+                                                 'help': ''})
+        self.assertEqual(params['a'].value, 100)
+        self.assertEqual(params['b'].type_name, 'List[str]')
+        self.assertEqual(params['b'].help, 'input granules')
+        self.assertEqual(params['c'].value, {'x': 1, 'y': 2})
+        self.assertIsNone(params['c'].type_name)
+        self.assertEqual(params['c'].help, '')
+        self.assertEqual(params['c'].lineno, 5)
+        self.assertEqual(params['g'].inferred_type_name, 'enum')
+
+        self.assertFalse(params['a'].is_spec)
+        self.assertTrue(params['_time_limit'].is_spec)
+        self.assertEqual(params['_time_limit'].spec_key, 'time_limit')
+        self.assertEqual(params['hysds_label'].spec_key, 'label')
+
+    def test_non_literal_default(self):
+        params = parse_parameters('import os\n\ninput_dir = os.getcwd()  # type: str\n')
+        self.assertEqual(params['input_dir'].default, 'os.getcwd()')
+        with self.assertRaises(ParameterParseError) as e:
+            params['input_dir'].value
+        self.assertEqual(e.exception.lineno, 3)
+        self.assertIn('line 3', str(e.exception))
+
+    def test_syntax_error(self):
+        with self.assertRaises(ParameterParseError) as e:
+            parse_parameters('a = 1\nb = [1, 2\nc = 3\n')
+        self.assertIsNotNone(e.exception.lineno)
+        self.assertIsInstance(e.exception, RuntimeError)
+
+    def test_simple_lines_same_as_ast(self):
+        source = '\n'.join([
+            'a: "enum" = ["x", "y"]  # the options',
+            'b = (1)',
+            'doc = """',
+            'c = 1',
+            '"""',
+            'if True:',
+            '    d = 2',
+            'e = {"k": None,}',
+            'f = 01',
+        ])
+        with self.assertRaises(ParameterParseError) as e:
+            parse_parameters(source)
+        self.assertEqual(e.exception.lineno, 9)
+
+        params = parse_parameters(source.replace('01', '1.e5'))
+        self.assertEqual(list(params), ['a', 'b', 'doc', 'e', 'f'])  # c is in a string, d isn't top level
+        self.assertEqual(params['a'].to_dict(), {'name': 'a', 'inferred_type_name': 'enum', 'default': '["x", "y"]',
+                                                 'help': 'the options'})
+        self.assertEqual(params['b'].default, '1')
+        self.assertEqual([params[k].lineno for k in ('doc', 'e', 'f')], [3, 8, 9])
+        self.assertEqual(params['e'].value, {'k': None})
+
+    def test_from_dict(self):
+        param = Parameter('a', 'int', '100', 'help', lineno=1)
+        self.assertEqual(Parameter.from_dict(param.to_dict()).to_dict(), param.to_dict())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,102 @@
+import os
+import json
+import shutil
+import tempfile
+import unittest
+
+import nbformat
+from nbformat.v4 import new_notebook, new_code_cell
+
+from notebook_pge_wrapper.execute_notebook import execute
+from notebook_pge_wrapper.resources import parse_size, process_cpu_time, ResourceLimitExceeded
+
+
+class TestResources(unittest.TestCase):
+    def test_parse_size(self):
+        self.assertEqual(parse_size('10GB'), 10 * 1024 ** 3)
+        self.assertEqual(parse_size('1.5kb'), 1536)
+        self.assertEqual(parse_size('512'), 512)
+        self.assertEqual(parse_size(512), 512)
+        self.assertIsNone(parse_size(None))
+
+    def test_process_cpu_time(self):
+        self.assertIsNotNone(process_cpu_time(os.getpid()))
+        self.assertIsNone(process_cpu_time(-1))
+
+
+class TestExecutionWatchdog(unittest.TestCase):
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.tmp = tempfile.mkdtemp()
+        os.chdir(self.tmp)
+
+        nb = new_notebook(cells=[
+            new_code_cell('a = 1', metadata={'tags': ['parameters']}),
+            new_code_cell('print("started")'),
+            new_code_cell('import time\ntime.sleep(60)'),
+            new_code_cell('print("never reached")'),
+        ])
+        nb.metadata['kernelspec'] = {'name': 'python3', 'display_name': 'Python 3', 'language': 'python'}
+        self.nb = os.path.join(self.tmp, 'slow.ipynb')
+        nbformat.write(nb, self.nb)
+
+        self.ctx = os.path.join(self.tmp, '_context.json')
+        with open(self.ctx, 'w') as f:
+            json.dump({'a': 2}, f)
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        shutil.rmtree(self.tmp)
+
+    def test_cell_timeout(self):
+        with self.assertRaises(ResourceLimitExceeded):
+            execute(self.nb, ctx_file=self.ctx, limits={'cell_timeout': 2})
+
+        with open('_alt_error.txt') as f:
+            self.assertIn('cell 3 exceeded its time limit of 2s', f.read())
+        out_nb = nbformat.read('slow-output.ipynb', as_version=4)
+        self.assertIn('started', out_nb.cells[2].outputs[0]['text'])
+        self.assertFalse(out_nb.cells[4].get('outputs'))
+        with open('_pge_resources.jsonl') as f:
+            samples = [json.loads(line) for line in f]
+        self.assertTrue(samples)
+        self.assertIsNotNone(samples[0]['rss'])
+
+    def test_cell_timeout_in_process(self):
+        with self.assertRaises(ResourceLimitExceeded):
+            execute(self.nb, ctx_file=self.ctx, limits={'cell_timeout': 2}, in_process=True)
+
+        # the cell is interrupted, not the process running it
+        code_cells = [c for c in nbformat.read('slow-output.ipynb', as_version=4).cells if c.cell_type == 'code']
+        self.assertEqual(code_cells[3].outputs[-1]['ename'], 'KeyboardInterrupt')
+        self.assertFalse(code_cells[4].outputs)
+
+    def test_max_cpu(self):
+        nb = nbformat.read(self.nb, as_version=4)
+        nb.cells[2].source = 'while True:\n    pass'
+        nbformat.write(nb, self.nb)
+
+        with self.assertRaises(ResourceLimitExceeded) as e:
+            execute(self.nb, ctx_file=self.ctx, limits={'max_cpu': 2})
+        self.assertIn('cpu limit of 2s', str(e.exception))
+
+    def test_max_rss(self):
+        nb = nbformat.read(self.nb, as_version=4)
+        nb.cells[2].source = 'import time\nx = bytearray(200 * 1024 * 1024)\ntime.sleep(60)'
+        nbformat.write(nb, self.nb)
+
+        with self.assertRaises(ResourceLimitExceeded) as e:
+            execute(self.nb, ctx_file=self.ctx, limits={'max_rss': '100MB'})
+        self.assertIn('memory limit of %d bytes' % (100 * 1024 ** 2), str(e.exception))
+
+    def test_time_limit_from_context(self):
+        with open(self.ctx, 'w') as f:
+            json.dump({'a': 2, 'soft_time_limit': 3}, f)
+        with self.assertRaises(ResourceLimitExceeded):
+            execute(self.nb, ctx_file=self.ctx)
+        with open('_alt_error.txt') as f:
+            self.assertIn('notebook exceeded its time limit of 3s', f.read())
+
+
+if __name__ == '__main__':
+    unittest.main()
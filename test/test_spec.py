@@ -0,0 +1,87 @@
+import os
+import unittest
+
+from notebook_pge_wrapper.inspection import inspect
+from notebook_pge_wrapper.parameters import ParameterParseError, parse_parameters
+from notebook_pge_wrapper.spec import NotebookParam, NotebookSpec, ContextValidationError, ENUM, NUMBER, OBJECT
+
+
+class TestNotebookSpec(unittest.TestCase):
+    def setUp(self):
+        self.nb_path = os.path.join('test', 'notebook_pges', 'test.ipynb')
+
+    def test_spec(self):
+        inspection = inspect(self.nb_path)
+        spec = inspection.spec
+        self.assertIs(inspection.spec, spec)  # built once per notebook
+
+        self.assertEqual(spec.param_names, ['a', 'b', 'c', 'd', 'e', 'f', 'g', 'h'])
+        self.assertEqual(spec.hysds_specs['time_limit'], 57389)
+        self.assertEqual([p.hysds_type for p in spec.params[:5]], [NUMBER, 'text', NUMBER, OBJECT, OBJECT])
+        self.assertEqual(spec.params[6].enumerables, ['yes', 'no', 'maybe so'])
+        self.assertEqual(spec.params[6].default, 'yes')
+        self.assertEqual(spec.job_spec_params()[0], {'name': 'a', 'destination': 'context'})
+
+    def test_filter_context(self):
+        spec = inspect(self.nb_path).spec
+        ctx = {'a': 1, 'b': None, '_time_limit': 10, 'container_image_name': 'image', 'g': 'no'}
+        self.assertEqual(spec.filter_context(ctx), {'a': 1, 'g': 'no'})
+
+    def test_coerce(self):
+        params = NotebookSpec('nb.ipynb', parse_parameters('\n'.join([
+            'i = 1  # type: int',
+            'x: float = 1.5',
+            'flag: bool = True',
+            'day = "2020-01-01"  # type: date',
+            'start = "2020-01-01T00:00:00.000"  # type: datetime',
+            'items: List = []',
+            'mapping: Dict = {}',
+            'choice: "enum" = [1, 2, 3]',
+            's = "text"',
+        ]))).params
+        i, x, flag, day, start, items, mapping, choice, s = params
+
+        self.assertEqual(i.coerce('42'), 42)
+        self.assertEqual(i.coerce(42.0), 42)
+        self.assertEqual(x.coerce('2'), 2.0)
+        self.assertIsInstance(x.coerce('2'), float)
+        self.assertIs(flag.coerce('False'), False)
+        self.assertEqual(day.coerce('2021-03-04'), '2021-03-04')
+        self.assertEqual(start.coerce('2021-03-04T05:06:07.890Z'), '2021-03-04T05:06:07.890Z')
+        self.assertEqual(items.coerce('[1, 2]'), [1, 2])
+        self.assertEqual(mapping.coerce({'a': 1}), {'a': 1})
+        self.assertEqual(choice.coerce('2'), 2)
+        self.assertEqual(s.coerce(['anything']), ['anything'])
+
+        for param, value in [(i, '1.5'), (i, True), (x, 'abc'), (flag, 'maybe'), (day, '2021-13-01'),
+                             (start, 'yesterday'), (items, '{"a": 1}'), (mapping, '[1]'), (choice, 4)]:
+            with self.assertRaises(ValueError, msg='%s=%r' % (param.name, value)):
+                param.coerce(value)
+
+    def test_validate_context(self):
+        spec = inspect(self.nb_path).spec
+        ctx = {'a': '12', 'c': 'x', 'd': '[1, 2]', 'g': 'no', 'h': None, '_time_limit': 'ignored'}
+        with self.assertRaises(ContextValidationError) as e:
+            spec.validate_context(ctx)
+        self.assertEqual(e.exception.errors, ["c: expected a number, got 'x'"])
+
+        ctx['c'] = '10.5'
+        self.assertEqual(spec.validate_context(ctx), {'a': 12, 'c': 10.5, 'd': [1, 2], 'g': 'no'})
+
+    def test_slots(self):
+        spec = NotebookSpec('nb.ipynb', parse_parameters('a = 1'))
+        with self.assertRaises(AttributeError):
+            spec.extra = 1
+        with self.assertRaises(AttributeError):
+            spec.params[0].extra = 1
+
+    def test_invalid_enum(self):
+        param = NotebookParam(parse_parameters('\n\ng: "enum" = "yes"')['g'])
+        self.assertEqual(param.hysds_type, ENUM)
+        with self.assertRaises(ParameterParseError) as e:
+            param.to_hysdsio()
+        self.assertEqual(e.exception.lineno, 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,83 @@
+import os
+import json
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from click.testing import CliRunner
+
+from notebook_pge_wrapper.cli import cli
+from notebook_pge_wrapper.templating import template_environment, render_template, template_cache_dir
+
+
+class TestTemplating(unittest.TestCase):
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.tmp = tempfile.mkdtemp()
+        os.chdir(self.tmp)
+        self.env = mock.patch.dict(os.environ, {'XDG_CACHE_HOME': os.path.join(self.tmp, 'cache')})
+        self.env.start()
+        self.environments = mock.patch.dict('notebook_pge_wrapper.templating._environments', clear=True)
+        self.environments.start()  # built again with the bytecode cache in self.tmp
+
+        with open('settings.yml', 'w') as f:
+            f.write('base_image: base:latest\nuser: ops\nimages:\n  gpu: base-gpu:latest\n  cpu: base-cpu:1.0\n')
+        with open('projects.yml', 'w') as f:
+            f.write('projects:\n  - first_pge\n  - name: second_pge\n    path: repos/second\n    user: jovyan\n')
+
+    def tearDown(self):
+        self.environments.stop()
+        self.env.stop()
+        os.chdir(self.cwd)
+        shutil.rmtree(self.tmp)
+
+    def _invoke(self, *args):
+        result = CliRunner().invoke(cli, list(args) + ['--settings', 'settings.yml'])
+        self.assertEqual(result.exit_code, 0, result.output)
+        return result
+
+    def test_templates_are_compiled_once(self):
+        env = template_environment()
+        self.assertIs(env, template_environment())
+        self.assertIs(env.get_template('Dockerfile.template'), env.get_template('Dockerfile.template'))
+
+    def test_notebook_template(self):
+        nb = json.loads(render_template('pge_create.ipynb', project='my "pge"'))  # still valid json
+        source = ''.join(''.join(cell['source']) for cell in nb['cells'])
+        self.assertIn('cd ~/my "pge"\n', source)
+        self.assertNotIn('PGE_NAME_PLACEHOLDER', source)
+
+    def test_create_from_manifest(self):
+        self._invoke('create', '--from-manifest', 'projects.yml')
+
+        for name, path, user in (('first_pge', 'first_pge', 'ops'), ('second_pge', 'repos/second', 'jovyan')):
+            with open(os.path.join(path, 'docker', 'Dockerfile')) as f:
+                dockerfile = f.read()
+            self.assertIn('FROM base:latest\n', dockerfile)
+            self.assertIn('ENV HOME=/home/%s' % user, dockerfile)
+            self.assertIn('COPY . $HOME/%s\n' % name, dockerfile)
+            with open(os.path.join(path, 'pge_create.ipynb')) as f:
+                self.assertIn('cd ~/%s' % name, f.read())
+            self.assertTrue(os.path.isfile(os.path.join(path, 'notebook_pges', '%s_sample_pge.ipynb' % name)))
+        self.assertTrue(os.listdir(template_cache_dir()))  # compiled templates cached for the next invocation
+
+        result = CliRunner().invoke(cli, ['create', 'third_pge', '--from-manifest', 'projects.yml'])
+        self.assertNotEqual(result.exit_code, 0)
+
+    def test_dockerfile_all_images(self):
+        self._invoke('create', 'my_pge')
+        os.chdir('my_pge')
+        shutil.copy(os.path.join(self.tmp, 'settings.yml'), 'settings.yml')
+        self._invoke('dockerfile', '--all-images')
+
+        self.assertEqual(sorted(f for f in os.listdir('docker') if f.startswith('Dockerfile')),
+                         ['Dockerfile', 'Dockerfile.cpu', 'Dockerfile.gpu'])
+        with open(os.path.join('docker', 'Dockerfile.cpu')) as f:
+            dockerfile = f.read()
+        self.assertTrue(dockerfile.startswith('FROM base-cpu:1.0\n'))
+        self.assertIn('COPY . $HOME/my_pge\n', dockerfile)
+
+
+if __name__ == '__main__':
+    unittest.main()
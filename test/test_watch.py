@@ -0,0 +1,101 @@
+import os
+import time
+import shutil
+import tempfile
+import unittest
+import threading
+from types import SimpleNamespace
+from queue import Queue
+
+import nbformat
+
+from notebook_pge_wrapper.spec_generator import GENERATED, SKIPPED
+from notebook_pge_wrapper.watch import watch_notebooks, watch_spec_files, _EventHandler
+
+
+class TestWatch(unittest.TestCase):
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.project = tempfile.mkdtemp()
+        os.mkdir(os.path.join(self.project, 'docker'))
+        os.mkdir(os.path.join(self.project, 'notebook_pges'))
+        shutil.copy(os.path.join(self.cwd, 'test', 'notebook_pges', 'test.ipynb'),
+                    os.path.join(self.project, 'notebook_pges'))
+        os.chdir(self.project)
+        self.stop = threading.Event()
+        self.thread = None
+
+    def tearDown(self):
+        self.stop.set()
+        if self.thread is not None:
+            self.thread.join(5)
+        os.chdir(self.cwd)
+        shutil.rmtree(self.project)
+
+    def _start(self, func, **kwargs):
+        self.thread = threading.Thread(target=func, kwargs=dict(kwargs, polling=True, interval=0.05, debounce=0.3,
+                                                                 stop=self.stop), daemon=True)
+        self.thread.start()
+
+    def _wait(self, events, count, timeout=10):
+        deadline = time.time() + timeout
+        while len(events) < count and time.time() < deadline:
+            time.sleep(0.05)
+        time.sleep(0.5)  # nothing else is reported
+
+    def _save(self, nb_name, edit):
+        path = os.path.join('notebook_pges', nb_name)
+        nb = nbformat.read(path, as_version=4)
+        edit(nb)
+        tmp = os.path.join('notebook_pges', '.~%s' % nb_name)
+        nbformat.write(nb, tmp)
+        os.replace(tmp, path)  # same as Jupyter
+
+    def test_saves_are_debounced(self):
+        saved = []
+        self._start(watch_notebooks, callback=saved.append)
+        time.sleep(0.2)
+        for _ in range(3):
+            self._save('test.ipynb', lambda nb: nb.cells.append(nbformat.v4.new_markdown_cell('edit')))
+            time.sleep(0.05)
+        with open(os.path.join('notebook_pges', 'notes.txt'), 'w') as f:
+            f.write('not a notebook')
+        self._wait(saved, 1)
+        self.assertEqual(saved, ['test.ipynb'])
+
+    def test_specs_regenerated_when_parameters_change(self):
+        results = []
+        self._start(watch_spec_files, user='ops', on_results=results.extend)
+        time.sleep(0.2)
+
+        self._save('test.ipynb', lambda nb: nb.cells.append(nbformat.v4.new_markdown_cell('edit')))
+        self._wait(results, 1)
+        self.assertEqual(results, [('test.ipynb', GENERATED, None)])  # no spec files yet
+
+        self._save('test.ipynb', lambda nb: nb.cells.append(nbformat.v4.new_markdown_cell('edit')))
+        self._wait(results, 2)
+        self.assertEqual(results[1], ('test.ipynb', SKIPPED, None))
+
+        def edit_parameters(nb):
+            cell = [c for c in nb.cells if 'parameters' in c.metadata.get('tags', [])][0]
+            cell.source += '\nz = 1'
+        self._save('test.ipynb', edit_parameters)
+        self._wait(results, 3)
+        self.assertEqual(results[2], ('test.ipynb', GENERATED, None))
+        with open(os.path.join('docker', 'hysds-io.json.test')) as f:
+            self.assertIn('"z"', f.read())
+
+    def test_watchdog_events(self):
+        changes = Queue()
+        handler = _EventHandler(changes)
+        nb_path = os.path.join(self.project, 'notebook_pges', 'test.ipynb')
+        tmp_path = os.path.join(self.project, 'notebook_pges', '.~test.ipynb')
+        handler.dispatch(SimpleNamespace(is_directory=False, src_path=tmp_path))  # Jupyter's temporary file
+        handler.dispatch(SimpleNamespace(is_directory=False, src_path=tmp_path, dest_path=nb_path))
+        handler.dispatch(SimpleNamespace(is_directory=False, src_path=nb_path.replace('test', 'deleted')))
+        handler.dispatch(SimpleNamespace(is_directory=True, src_path=os.path.join(self.project, 'notebook_pges')))
+        self.assertEqual([changes.get_nowait() for _ in range(changes.qsize())], ['test.ipynb'])
+
+
+if __name__ == '__main__':
+    unittest.main()